@@ -1,2 +1 @@
 default_app_config = 'apps.chat.apps.ChatConfig'
-print("apps.chat package initialized with default_app_config")
\ No newline at end of file
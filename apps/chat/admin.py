@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversation, Message, Reaction
+from .models import Conversation, Message, Reaction, Attachment
 
 
 @admin.register(Conversation)
@@ -30,3 +30,9 @@ class ReactionAdmin(admin.ModelAdmin):
     search_fields = ('user__email', 'emoji', 'message__content')
     list_filter = ('emoji',)
 
+
+@admin.register(Attachment)
+class AttachmentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'filename', 'uploader', 'message', 'size', 'status', 'created_at')
+    search_fields = ('filename', 'uploader__email')
+    list_filter = ('status', 'created_at')
@@ -5,6 +5,4 @@ class ChatConfig(AppConfig):
     name = 'apps.chat'
 
     def ready(self):
-        print("ChatConfig ready method called - importing signals")
-        import apps.chat.signals
-        print("Signals imported successfully")
\ No newline at end of file
+        import apps.chat.signals
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Helpers for loading (and purging) large volumes of chat rows without going
+through Model.save() and per-row signals, used by the history import and
+purge commands.
+"""
+import io
+import json
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+
+from apps.chat.models import Message, Reaction
+from apps.chat import signals as chat_signals
+
+
+MUTED_HANDLERS = [
+    (post_save, chat_signals.handle_new_message, Message),
+    (post_save, chat_signals.handle_reaction, Reaction),
+    (post_save, chat_signals.update_reaction_counts, Reaction),
+    (post_delete, chat_signals.remove_reaction_count, Reaction),
+]
+
+
+@contextmanager
+def muted_signals():
+    """
+    Disconnect the chat signal handlers so that bulk loads do not create a
+    Notification and a real-time push for every row, and bulk deletes of
+    reactions can run as a single DELETE.
+    """
+    for signal, handler, sender in MUTED_HANDLERS:
+        signal.disconnect(handler, sender=sender)
+    try:
+        yield
+    finally:
+        for signal, handler, sender in MUTED_HANDLERS:
+            signal.connect(handler, sender=sender)
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create keep the timestamps set on the instances instead of
+    overwriting auto_now_add/auto_now fields with the current time.
+    """
+    fields = [
+        (field, field.auto_now_add, field.auto_now) for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False) or getattr(field, 'auto_now', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now_add = field.auto_now = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add, auto_now in fields:
+            field.auto_now_add, field.auto_now = auto_now_add, auto_now
+
+
+def supports_copy(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def allocate_ids(model, count, using='default'):
+    """
+    Reserve `count` primary keys from the table's sequence so rows can be
+    written with COPY (which cannot return generated ids).
+    """
+    if not count:
+        return []
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [model._meta.db_table, model._meta.pk.column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _copy_text(value):
+    if value is None:
+        return r'\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    else:
+        value = str(value)
+    return (
+        value.replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def copy_insert(model, objs, using='default'):
+    """
+    Write model instances with PostgreSQL COPY. Every instance must already
+    have its primary key set (see allocate_ids).
+    """
+    if not objs:
+        return 0
+    fields = model._meta.concrete_fields
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write('\t'.join(_copy_text(getattr(obj, f.attname)) for f in fields))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = "COPY {} ({}) FROM STDIN".format(
+        quote(model._meta.db_table),
+        ', '.join(quote(f.column) for f in fields),
+    )
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):
+            # psycopg2
+            raw.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with raw.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    return len(objs)
@@ -0,0 +1,227 @@
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from apps.chat.bulk import allocate_ids, copy_insert, explicit_timestamps, muted_signals, supports_copy
+from apps.chat.models import Conversation, Message, Reaction
+from apps.chat.reactions import summarize
+from apps.notifications.models import Notification
+from apps.users.cache import bump_version
+from apps.users.models import CustomUser
+
+FIRST_NAMES = ['Amina', 'Brian', 'Chen', 'Daniela', 'Emeka', 'Fatima', 'George', 'Hana', 'Ivan', 'Jade',
+               'Kofi', 'Lena', 'Mateo', 'Nia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sami', 'Wanjiru']
+LAST_NAMES = ['Achieng', 'Baker', 'Castro', 'Dlamini', 'Evans', 'Fischer', 'Gupta', 'Hoang', 'Ito', 'Kamau',
+              'Larsen', 'Mensah', 'Novak', 'Okafor', 'Petrov', 'Rossi', 'Silva', 'Tanaka', 'Wu', 'Zulu']
+WORDS = ('the a to and you I it is for on that of in we are be have this with at can not just so do '
+         'meeting lunch tomorrow today later call send file thanks ok sure great see now when where '
+         'project deadline weekend coffee review done yes no maybe soon check update news').split()
+EMOJIS = ['👍', '❤️', '😂', '🎉', '😮', '😢', '🔥', '🙏']
+
+
+def zipf_cum_weights(count, exponent):
+    """
+    Cumulative weights where item i is drawn proportionally to 1 / (i + 1) ** exponent.
+    """
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate deterministic synthetic users, 1:1 and group conversations, messages, reactions "
+        "and notifications for load testing. Activity per user and per conversation follows a Zipf "
+        "distribution. The same --seed and volumes always produce the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--conversations', type=int, default=2000)
+        parser.add_argument('--messages', type=int, default=100000)
+        parser.add_argument('--group-ratio', type=float, default=0.1,
+                            help="Fraction of conversations with more than two participants")
+        parser.add_argument('--max-group-size', type=int, default=8)
+        parser.add_argument('--reaction-rate', type=float, default=0.2,
+                            help="Fraction of messages that get reactions")
+        parser.add_argument('--no-notifications', action='store_true',
+                            help="Skip the new_message notification per message")
+        parser.add_argument('--zipf', type=float, default=1.1, help="Zipf exponent for activity")
+        parser.add_argument('--days', type=int, default=90, help="Spread messages over this many days")
+        parser.add_argument('--end', default='2025-01-01T00:00:00Z',
+                            help="Timestamp of the newest possible message")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--copy', action='store_true',
+                            help="Write messages, reactions and notifications with PostgreSQL COPY")
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError("At least two users are needed.")
+        end = parse_datetime(options['end'])
+        if end is None:
+            raise CommandError(f"Invalid --end timestamp: {options['end']}")
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=dt_timezone.utc)
+
+        if CustomUser.objects.filter(email__endswith=f".s{options['seed']}@synthetic.test").exists():
+            raise CommandError(f"Data for seed {options['seed']} already exists, pick another --seed.")
+
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.use_copy = options['copy'] and supports_copy()
+        self.end = end
+        self.started = time.monotonic()
+        self.rows = 0
+
+        with muted_signals(), explicit_timestamps(Message, Reaction, Notification):
+            user_ids = self.create_users(options['users'])
+            conversations = self.create_conversations(user_ids, options['conversations'])
+            self.create_messages(conversations, options['messages'])
+        bump_version()
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {self.rows} rows in {elapsed:.1f}s ({self.rows / elapsed if elapsed else self.rows:.0f} rows/s)"
+        ))
+
+    def progress(self, label, count):
+        self.rows += count
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f"{label}: {self.rows} rows ({self.rows / elapsed if elapsed else self.rows:.0f} rows/s)")
+
+    def insert(self, model, objs):
+        if self.use_copy:
+            for obj, pk in zip(objs, allocate_ids(model, len(objs))):
+                obj.pk = pk
+            copy_insert(model, objs)
+        else:
+            model.objects.bulk_create(objs, batch_size=2000)
+
+    def create_users(self, count):
+        seed = self.options['seed']
+        # hashing is slow, every synthetic user shares one password
+        password = make_password('synthetic')
+        joined = self.end - timedelta(days=self.options['days'])
+        ids = []
+        for start in range(0, count, self.chunk_size):
+            users = [
+                CustomUser(
+                    email=f"user{i}.s{seed}@synthetic.test",
+                    full_name=f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}",
+                    password=password,
+                    date_joined=joined,
+                )
+                for i in range(start, min(start + self.chunk_size, count))
+            ]
+            with transaction.atomic():
+                ids.extend(user.pk for user in CustomUser.objects.bulk_create(users, batch_size=2000))
+            self.progress("users", len(users))
+        return ids
+
+    def create_conversations(self, user_ids, count):
+        """
+        Return a list of participant id lists; the most active users (by
+        Zipf rank) take part in the most conversations.
+        """
+        options = self.options
+        weights = zipf_cum_weights(len(user_ids), options['zipf'])
+        seen_pairs = set()
+        participants = []
+        attempts = 0
+        while len(participants) < count and attempts < count * 10:
+            attempts += 1
+            if self.rng.random() < options['group_ratio'] and len(user_ids) > 2:
+                size = self.rng.randint(3, max(3, min(options['max_group_size'], len(user_ids))))
+                members = set()
+                while len(members) < size:
+                    members.update(self.rng.choices(user_ids, cum_weights=weights, k=size - len(members)))
+                participants.append(sorted(members))
+            else:
+                pair = tuple(sorted(set(self.rng.choices(user_ids, cum_weights=weights, k=2))))
+                if len(pair) < 2 or pair in seen_pairs:
+                    continue
+                seen_pairs.add(pair)
+                participants.append(list(pair))
+
+        Through = Conversation.participants.through
+        conversations = []
+        for start in range(0, len(participants), self.chunk_size):
+            chunk = participants[start:start + self.chunk_size]
+            with transaction.atomic():
+                created = Conversation.objects.bulk_create([Conversation() for _ in chunk])
+                Through.objects.bulk_create(
+                    [
+                        Through(conversation_id=conversation.pk, customuser_id=user_id)
+                        for conversation, members in zip(created, chunk)
+                        for user_id in members
+                    ],
+                    batch_size=5000,
+                )
+            conversations.extend(zip((c.pk for c in created), chunk))
+            self.progress("conversations", len(chunk))
+        return conversations
+
+    def create_messages(self, conversations, count):
+        if not conversations:
+            return
+        options = self.options
+        weights = zipf_cum_weights(len(conversations), options['zipf'])
+        emoji_weights = zipf_cum_weights(len(EMOJIS), 1.5)
+        window = options['days'] * 86400
+        read_before = self.end - timedelta(days=1)
+
+        for start in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - start)
+            messages, reactions_per_message = [], []
+            for conversation_id, members in self.rng.choices(conversations, cum_weights=weights, k=size):
+                sender_id, receiver_id = self.rng.sample(members, 2)
+                timestamp = self.end - timedelta(seconds=self.rng.randrange(window))
+                reactions = []
+                if self.rng.random() < options['reaction_rate']:
+                    reactors = self.rng.sample(members, self.rng.randint(1, len(members)))
+                    reactions = [
+                        (user_id, self.rng.choices(EMOJIS, cum_weights=emoji_weights)[0])
+                        for user_id in reactors
+                    ]
+                words = self.rng.choices(WORDS, k=self.rng.randint(2, 20))
+                messages.append(Message(
+                    conversation_id=conversation_id,
+                    sender_id=sender_id,
+                    receiver_id=receiver_id,
+                    content=' '.join(words).capitalize(),
+                    timestamp=timestamp,
+                    is_read=timestamp < read_before,
+                    reaction_counts=summarize(emoji for _, emoji in reactions),
+                ))
+                reactions_per_message.append(reactions)
+
+            with transaction.atomic():
+                self.insert(Message, messages)
+                reactions = [
+                    Reaction(message_id=message.pk, user_id=user_id, emoji=emoji, created_at=message.timestamp)
+                    for message, items in zip(messages, reactions_per_message)
+                    for user_id, emoji in items
+                ]
+                if reactions:
+                    self.insert(Reaction, reactions)
+                notifications = []
+                if not options['no_notifications']:
+                    notifications = [
+                        Notification(
+                            user_id=message.receiver_id,
+                            message_id=message.pk,
+                            notification_type='new_message',
+                            created_at=message.timestamp,
+                            updated_at=message.timestamp,
+                            is_seen=message.is_read,
+                        )
+                        for message in messages
+                    ]
+                    self.insert(Notification, notifications)
+            self.progress("messages", len(messages) + len(reactions) + len(notifications))
@@ -0,0 +1,266 @@
+import json
+import os
+import time
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.chat.bulk import (
+    allocate_ids, copy_insert, explicit_timestamps, muted_signals, supports_copy,
+)
+from apps.chat.models import Conversation, Message, Reaction
+from apps.chat.reactions import summarize
+from apps.users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Import chat history from an NDJSON file. Each line is one message:\n"
+        '{"sender": "a@x.com", "receiver": "b@x.com", "content": "hi", '
+        '"timestamp": "2024-01-01T10:00:00Z", "is_read": true, '
+        '"reactions": [{"user": "b@x.com", "emoji": "👍"}]}\n'
+        "Users are matched by email, conversations are created per participant "
+        "pair, and no notifications are generated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON file to import")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help="Checkpoint file (defaults to <path>.checkpoint)",
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help="Skip lines already imported according to the checkpoint file",
+        )
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help="Use bulk_create even when PostgreSQL COPY is available",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+
+        self.batch_size = options['batch_size']
+        self.checkpoint_path = options['checkpoint'] or f"{path}.checkpoint"
+        self.use_copy = not options['no_copy'] and supports_copy()
+        self.user_ids = {}
+        self.conversation_ids = {}
+        self.stats = {'messages': 0, 'reactions': 0, 'conversations': 0, 'skipped': 0}
+
+        self.checkpoint = self.read_checkpoint() if options['resume'] else {'line': 0}
+        start_line = self.checkpoint.get('line', 0)
+        if start_line:
+            self.stdout.write(f"Resuming after line {start_line}")
+
+        started = time.monotonic()
+        line_no = 0
+        with muted_signals(), open(path, encoding='utf-8') as source:
+            batch = []
+            for line_no, line in enumerate(source, start=1):
+                if line_no <= start_line or not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict):
+                    self.skip(line_no, "invalid JSON")
+                    continue
+                batch.append((line_no, record))
+                if len(batch) >= self.batch_size:
+                    self.load_batch(batch, line_no, started)
+                    batch = []
+            if batch:
+                self.load_batch(batch, line_no, started)
+
+        elapsed = time.monotonic() - started
+        rows = self.stats['messages'] + self.stats['reactions']
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.stats['messages']} messages, {self.stats['reactions']} reactions "
+            f"and {self.stats['conversations']} conversations in {elapsed:.1f}s "
+            f"({rows / elapsed if elapsed else rows:.0f} rows/s, {self.stats['skipped']} skipped)"
+        ))
+
+    def skip(self, line_no, reason):
+        self.stderr.write(f"Line {line_no}: {reason}, skipped")
+        self.stats['skipped'] += 1
+
+    def load_batch(self, records, line_no, started):
+        self.resolve_users([record for _, record in records])
+
+        rows = []
+        for record_line, record in records:
+            sender_id = self.user_ids.get(self.normalize(record.get('sender')))
+            receiver_id = self.user_ids.get(self.normalize(record.get('receiver')))
+            if not sender_id or not receiver_id or record.get('content') is None:
+                self.skip(record_line, "unknown sender/receiver or missing content")
+                continue
+            timestamp = self.parse_time(record.get('timestamp'))
+            if timestamp is None:
+                self.skip(record_line, f"invalid timestamp {record.get('timestamp')!r}")
+                continue
+            rows.append((record_line, record, sender_id, receiver_id, timestamp))
+
+        checkpoint = dict(self.checkpoint)
+        try:
+            with transaction.atomic():
+                self.import_rows(rows, line_no)
+        except BaseException:
+            # the batch was rolled back, and so is its checkpoint
+            self.write_checkpoint(checkpoint)
+            raise
+
+        elapsed = time.monotonic() - started
+        rows_done = self.stats['messages'] + self.stats['reactions']
+        self.stdout.write(
+            f"line {line_no}: {self.stats['messages']} messages, "
+            f"{self.stats['reactions']} reactions ({rows_done / elapsed if elapsed else rows_done:.0f} rows/s)"
+        )
+
+    def import_rows(self, rows, line_no):
+        """
+        Insert one batch and advance the checkpoint to `line_no`; runs in the
+        batch transaction, so the checkpoint is written before it commits.
+        """
+        self.resolve_conversations({frozenset((s, r)) for _, _, s, r, _ in rows})
+
+        # one reaction per user per message, the last one wins
+        latest_reactions = []
+        for record_line, record, _, _, timestamp in rows:
+            latest = {}
+            for item in record.get('reactions') or []:
+                user_id = self.user_ids.get(self.normalize(item.get('user')))
+                if not user_id or not item.get('emoji'):
+                    continue
+                created_at = self.parse_time(item['created_at']) if item.get('created_at') else timestamp
+                if created_at is None:
+                    self.skip(record_line, f"reaction with invalid timestamp {item['created_at']!r}")
+                    continue
+                latest[user_id] = (item['emoji'], created_at)
+            latest_reactions.append(latest)
+
+        messages = [
+            Message(
+                conversation_id=self.conversation_ids[frozenset((sender_id, receiver_id))],
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                content=record['content'],
+                timestamp=timestamp,
+                is_read=bool(record.get('is_read', False)),
+                reaction_counts=summarize(emoji for emoji, _ in latest.values()),
+            )
+            for (_, record, sender_id, receiver_id, timestamp), latest in zip(rows, latest_reactions)
+        ]
+        self.insert(Message, messages)
+
+        reactions = []
+        for message, latest in zip(messages, latest_reactions):
+            reactions.extend(
+                Reaction(message_id=message.pk, user_id=user_id, emoji=emoji, created_at=created_at)
+                for user_id, (emoji, created_at) in latest.items()
+            )
+        self.insert(Reaction, reactions)
+
+        self.stats['messages'] += len(messages)
+        self.stats['reactions'] += len(reactions)
+        self.write_checkpoint({'line': line_no, **self.stats})
+
+    def insert(self, model, objs):
+        if not objs:
+            return
+        if self.use_copy:
+            for obj, pk in zip(objs, allocate_ids(model, len(objs))):
+                obj.pk = pk
+            copy_insert(model, objs)
+        else:
+            with explicit_timestamps(model):
+                model.objects.bulk_create(objs, batch_size=1000)
+
+    def resolve_users(self, records):
+        emails = set()
+        for record in records:
+            emails.add(self.normalize(record.get('sender')))
+            emails.add(self.normalize(record.get('receiver')))
+            for item in record.get('reactions') or []:
+                emails.add(self.normalize(item.get('user')))
+        missing = {email for email in emails if email and email not in self.user_ids}
+        if missing:
+            self.user_ids.update(
+                CustomUser.objects.filter(email__in=missing).values_list('email', 'id')
+            )
+
+    def resolve_conversations(self, pairs):
+        """
+        Map each participant pair to a 1:1 conversation, reusing existing ones
+        and creating the rest in bulk.
+        """
+        missing = {pair for pair in pairs if pair not in self.conversation_ids}
+        if not missing:
+            return
+
+        Through = Conversation.participants.through
+        user_ids = set().union(*missing)
+        candidates = Through.objects.filter(customuser_id__in=user_ids).values_list('conversation_id', flat=True)
+        members = {}
+        for conversation_id, user_id in Through.objects.filter(
+            conversation_id__in=candidates
+        ).values_list('conversation_id', 'customuser_id'):
+            members.setdefault(conversation_id, set()).add(user_id)
+        for conversation_id, participants in members.items():
+            pair = frozenset(participants)
+            if pair in missing:
+                self.conversation_ids.setdefault(pair, conversation_id)
+
+        to_create = [pair for pair in missing if pair not in self.conversation_ids]
+        if not to_create:
+            return
+        conversations = Conversation.objects.bulk_create([Conversation() for _ in to_create])
+        links = []
+        for pair, conversation in zip(to_create, conversations):
+            self.conversation_ids[pair] = conversation.pk
+            links.extend(Through(conversation_id=conversation.pk, customuser_id=user_id) for user_id in pair)
+        Through.objects.bulk_create(links)
+        self.stats['conversations'] += len(conversations)
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {'line': 0}
+
+    def write_checkpoint(self, checkpoint):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(checkpoint, fh)
+        os.replace(tmp_path, self.checkpoint_path)
+        self.checkpoint = checkpoint
+
+    @staticmethod
+    def normalize(email):
+        return CustomUser.objects.normalize_email(email) if email else None
+
+    @staticmethod
+    def parse_time(value):
+        """
+        Parse an ISO 8601 timestamp (now when missing), or return None when
+        it is not one.
+        """
+        if not value:
+            return timezone.now()
+        try:
+            parsed = parse_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if parsed is None:
+            return None
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
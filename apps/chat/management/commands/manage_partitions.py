@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.chat.models import Message
+from apps.chat.partitioning import (
+    PARTITIONED_TABLES, add_months, drop_partitions_before, ensure_partitions, is_partitioned, month_start,
+    purge_default_before,
+)
+from apps.notifications.models import Notification
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly partitions and drop partitions past the retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=settings.PARTITION_PREMAKE_MONTHS,
+            help="Number of future months to create partitions for",
+        )
+        parser.add_argument(
+            '--retention-months', type=int, default=settings.PARTITION_RETENTION_MONTHS,
+            help="Drop partitions older than this many months (0 keeps everything)",
+        )
+
+    def handle(self, *args, **options):
+        models = [Message, Notification]
+        if not all(is_partitioned(model._meta.db_table) for model in models):
+            raise CommandError(
+                "Tables are not partitioned. Set MESSAGE_PARTITIONING=True and run migrations first."
+            )
+
+        for model in models:
+            table = model._meta.db_table
+            for name in ensure_partitions(table, months_ahead=options['months_ahead']):
+                self.stdout.write(f"Created partition {name}")
+
+        if options['retention_months'] > 0:
+            cutoff = add_months(month_start(timezone.now()), -options['retention_months'])
+            # notifications first, they reference messages
+            for model in reversed(models):
+                for name in drop_partitions_before(model, cutoff):
+                    self.stdout.write(f"Dropped partition {name}")
+                purged = purge_default_before(model, cutoff)
+                if purged:
+                    self.stdout.write(f"Purged {purged} rows from {model._meta.db_table}_default")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Partitions up to date for {', '.join(PARTITIONED_TABLES)}"
+        ))
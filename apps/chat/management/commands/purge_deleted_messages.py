@@ -0,0 +1,48 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.chat.bulk import muted_signals
+from apps.chat.models import Message
+
+
+class Command(BaseCommand):
+    help = (
+        "Physically delete soft-deleted messages (with their reactions, notifications "
+        "and attachments) in small batches. Run it periodically, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=settings.MESSAGE_PURGE_AFTER_DAYS,
+            help="Only purge messages deleted at least this many days ago",
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help="Seconds to pause between batches to spread the load",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        tombstones = Message.all_objects.filter(deleted_at__lt=cutoff).order_by('deleted_at')
+
+        purged = 0
+        with muted_signals():
+            while True:
+                ids = list(tombstones.values_list('pk', flat=True)[:options['batch_size']])
+                if not ids:
+                    break
+                # short transactions keep row locks brief
+                with transaction.atomic():
+                    Message.all_objects.filter(pk__in=ids).delete()
+                purged += len(ids)
+                self.stdout.write(f"Purged {purged} messages")
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} deleted messages"))
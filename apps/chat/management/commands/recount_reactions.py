@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.chat.models import Message
+from apps.chat.reactions import count_reactions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Message.reaction_counts from the reactions table, e.g. after "
+        "reactions were changed with signals muted. Counts are normally kept up "
+        "to date incrementally, so this is only needed for repairs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--message', type=int, action='append', dest='messages', help="Only recount this message (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        messages = Message.all_objects.order_by('pk')
+        if options['messages']:
+            messages = messages.filter(pk__in=options['messages'])
+
+        checked = fixed = last = 0
+        while True:
+            ids = list(messages.filter(pk__gt=last).values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            last = ids[-1]
+            # lock the batch so reactions added meanwhile wait for the new counts
+            with transaction.atomic():
+                list(Message.all_objects.select_for_update(no_key=True).filter(pk__in=ids).values_list('pk', flat=True))
+                counts = count_reactions(ids)
+                stored = dict(Message.all_objects.filter(pk__in=ids).values_list('pk', 'reaction_counts'))
+                for pk in ids:
+                    actual = counts.get(pk, {})
+                    if stored[pk] != actual:
+                        Message.all_objects.filter(pk=pk).update(reaction_counts=actual)
+                        fixed += 1
+            checked += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} messages, fixed {fixed} reaction summaries"))
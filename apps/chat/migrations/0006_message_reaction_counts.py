@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-19 13:27
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_reaction_counts(apps, schema_editor):
+    Message = apps.get_model('chat', 'Message')
+    Reaction = apps.get_model('chat', 'Reaction')
+    db = schema_editor.connection.alias
+
+    rows = (
+        Reaction.objects.using(db)
+        .values_list('message_id', 'emoji')
+        .annotate(total=Count('id'))
+        .order_by('message_id')
+    )
+    batch, current = [], None
+    for message_id, emoji, total in rows.iterator(chunk_size=5000):
+        if current is None or current.pk != message_id:
+            current = Message(pk=message_id, reaction_counts={})
+            batch.append(current)
+        current.reaction_counts[emoji] = total
+        if len(batch) >= 1000:
+            Message.objects.using(db).bulk_update(batch[:-1], ['reaction_counts'])
+            batch = batch[-1:]
+    if batch:
+        Message.objects.using(db).bulk_update(batch, ['reaction_counts'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_attachment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='reaction_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_reaction_counts, migrations.RunPython.noop),
+    ]
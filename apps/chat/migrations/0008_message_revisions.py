@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 13:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_message_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='edited_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='MessageRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('diff', models.JSONField()),
+                ('edited_at', models.DateTimeField()),
+                ('message', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='chat.message')),
+            ],
+            options={
+                'ordering': ['-edited_at', '-id'],
+            },
+        ),
+    ]
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.conf import settings
 from apps.users.models import CustomUser
@@ -15,6 +16,15 @@ class Conversation(models.Model):
         return self.participants.filter(id=user1.id).exists() and self.participants.filter(id=user2.id).exists()
 
 
+class LiveMessageManager(models.Manager):
+    """
+    Hides soft-deleted messages (tombstones); use Message.all_objects to see them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -22,12 +32,25 @@ class Message(models.Model):
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    # emoji -> count, maintained by apps.chat.reactions
+    reaction_counts = models.JSONField(default=dict, blank=True)
+    edited_at = models.DateTimeField(null=True, blank=True)
+    # set when the message is deleted; the row is purged later by purge_deleted_messages
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveMessageManager()
+    all_objects = models.Manager()
     
     def __str__(self):
         return f"Message from {self.sender} to {self.receiver} at {self.timestamp}"
 
     class Meta:
         ordering = ['timestamp']
+        # related objects (e.g. a notification's message) still resolve to tombstones
+        base_manager_name = 'all_objects'
+        indexes = [
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name='chat_message_deleted_idx'),
+        ]
 
 
 class Reaction(models.Model):
@@ -39,5 +62,66 @@ class Reaction(models.Model):
     class Meta:
         unique_together = ('message', 'user')  # Prevent duplicate reactions by the same user
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the emoji as loaded, so saves can tell which count to move
+        if 'emoji' in field_names:
+            instance._loaded_values = {'emoji': instance.emoji}
+        return instance
+
     def __str__(self):
         return f"{self.user.email} reacted with {self.emoji}"
+
+
+
+class Attachment(models.Model):
+    STATUS_CHOICES = [
+        ("uploading", "Uploading"),
+        ("complete", "Complete"),
+    ]
+
+    uploader = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='attachments')
+    # chat_message may be partitioned (see apps/chat/partitioning.py), where
+    # id alone is not unique and cannot be the target of a database-level
+    # foreign key
+    message = models.ForeignKey(
+        Message, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='attachments', db_constraint=False,
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, default='application/octet-stream')
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    storage_key = models.CharField(max_length=255, unique=True)
+    received = models.BigIntegerField(default=0)  # bytes stored so far
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="uploading")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def new_storage_key():
+        key = uuid.uuid4().hex
+        return f"{key[:2]}/{key[2:4]}/{key}"
+
+    def __str__(self):
+        return f"{self.filename} ({self.size} bytes)"
+
+
+
+class MessageRevision(models.Model):
+    """
+    One edit of a message. `diff` turns the content written by this edit
+    back into the content before it (see apps.chat.revisions), so only the
+    changed spans are stored.
+    """
+    # db_constraint=False: chat_message may be partitioned
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='revisions', db_constraint=False)
+    diff = models.JSONField()
+    edited_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-edited_at', '-id']
+
+    def __str__(self):
+        return f"Revision of message {self.message_id} at {self.edited_at}"
+
@@ -0,0 +1,261 @@
+"""
+Optional PostgreSQL declarative range partitioning (by month) for the
+message and notification tables.
+
+Enable with MESSAGE_PARTITIONING=True before running migrations, then run
+`python manage.py manage_partitions` periodically (e.g. daily from cron) to
+create upcoming partitions and apply retention.
+
+The primary key of a partitioned table has to include the partition key, so
+it becomes (id, <partition column>) and id is no longer unique on its own.
+A foreign key needs a unique target, so converting chat_message drops the
+database-level constraints pointing at it. Django still enforces on_delete
+in Python, so ORM behaviour is unchanged. For the same reason, unique
+constraints that leave out the partition key (such as the one on unseen
+reaction notifications) cannot exist on a partitioned table.
+
+Rows outside every monthly partition land in the <table>_default partition.
+ensure_partitions moves them into the monthly partition it creates for them,
+and drop_partitions_before purges the ones past the retention cutoff.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+# table -> partition key column
+PARTITIONED_TABLES = {
+    'chat_message': 'timestamp',
+    'notifications_notification': 'created_at',
+}
+
+PARTITION_SUFFIX = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(table, using='default'):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(table, using='default'):
+    """
+    Return {month: partition_name} for the monthly partitions of `table`.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [table],
+        )
+        partitions = {}
+        for (name,) in cursor.fetchall():
+            match = PARTITION_SUFFIX.search(name)
+            if match:
+                month = datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+                partitions[month] = name
+        return partitions
+
+
+def default_partition(table, using='default'):
+    """
+    Name of the default partition of `table`, or None when it has none.
+    """
+    name = f"{table}_default"
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+        return name if cursor.fetchone()[0] else None
+
+
+def ensure_partitions(table, start=None, months_ahead=3, using='default'):
+    """
+    Create monthly partitions from `start` (default: current month) up to
+    `months_ahead` months in the future. Returns the names created.
+
+    A partition cannot be created while the default partition holds rows of
+    its month, so those are moved into the new partition: the default is
+    detached, the partition created, the rows moved over and the default
+    attached again, all in one transaction.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    column = PARTITIONED_TABLES[table]
+    now = month_start(timezone.now())
+    month = month_start(start) if start else now
+    last = add_months(now, months_ahead)
+    existing = list_partitions(table, using)
+    default = default_partition(table, using)
+
+    created = []
+    while month <= last:
+        if month not in existing:
+            name = partition_name(table, month)
+            bounds = [month, add_months(month, 1)]
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                stranded = False
+                if default:
+                    cursor.execute(
+                        f"SELECT EXISTS (SELECT 1 FROM {quote(default)} "
+                        f"WHERE {quote(column)} >= %s AND {quote(column)} < %s)",
+                        bounds,
+                    )
+                    stranded = cursor.fetchone()[0]
+                if stranded:
+                    cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(default)}")
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} "
+                    f"FOR VALUES FROM (%s) TO (%s)",
+                    bounds,
+                )
+                if stranded:
+                    cursor.execute(
+                        f"WITH moved AS (DELETE FROM {quote(default)} "
+                        f"WHERE {quote(column)} >= %s AND {quote(column)} < %s RETURNING *) "
+                        f"INSERT INTO {quote(name)} SELECT * FROM moved",
+                        bounds,
+                    )
+                    cursor.execute(f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(default)} DEFAULT")
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def convert_to_partitioned(table, column, months_ahead=3, using='default'):
+    """
+    Rebuild `table` as a table partitioned by month on `column`, copying the
+    existing rows and recreating its indexes and outgoing foreign keys.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    legacy = f"{table}_unpartitioned"
+    # the old identity sequence keeps the <table>_id_seq name until the legacy table is dropped
+    sequence = f"{table}_pk_seq"
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+        indexes = [
+            (name, info['columns']) for name, info in constraints.items()
+            if info['index'] and not info['unique'] and not info['primary_key'] and info['columns']
+        ]
+        foreign_keys = [
+            (name, info['columns'][0], info['foreign_key']) for name, info in constraints.items()
+            if info['foreign_key'] and not is_partitioned(info['foreign_key'][0], using)
+        ]
+        cursor.execute(f"SELECT min({quote(column)}) FROM {quote(table)}")
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({quote(column)})"
+        )
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, {quote(column)})")
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id")
+        cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval(%s)", [sequence])
+        ensure_partitions(table, start=oldest, months_ahead=months_ahead, using=using)
+        cursor.execute(
+            f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT"
+        )
+
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)}")
+        cursor.execute(
+            f"SELECT setval(%s, COALESCE((SELECT max(id) FROM {quote(table)}), 0) + 1, false)",
+            [sequence],
+        )
+        # CASCADE drops the foreign keys other tables had on the old table
+        cursor.execute(f"DROP TABLE {quote(legacy)} CASCADE")
+
+        for name, columns in indexes:
+            cursor.execute(
+                f"CREATE INDEX {quote(name)} ON {quote(table)} ({', '.join(quote(c) for c in columns)})"
+            )
+        for name, column_name, (target_table, target_column) in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} FOREIGN KEY ({quote(column_name)}) "
+                f"REFERENCES {quote(target_table)} ({quote(target_column)}) DEFERRABLE INITIALLY DEFERRED"
+            )
+
+
+def delete_dependents(model, filters, using='default'):
+    """
+    Delete the rows of other tables pointing at the rows of `model` that
+    match `filters` (on `model`'s fields), through the ORM so on_delete
+    rules still apply.
+    """
+    for relation in model._meta.related_objects:
+        if relation.many_to_many:
+            continue
+        relation.related_model._base_manager.using(using).filter(**{
+            f"{relation.field.name}__{lookup}": value for lookup, value in filters.items()
+        }).delete()
+
+
+def drop_partitions_before(model, cutoff, using='default'):
+    """
+    Drop the monthly partitions of `model`'s table that end on or before
+    `cutoff`. Rows in other tables that point at the dropped rows are removed
+    first through the ORM so on_delete rules still apply.
+    """
+    table = model._meta.db_table
+    column = PARTITIONED_TABLES[table]
+    connection = connections[using]
+    quote = connection.ops.quote_name
+
+    dropped = []
+    for month, name in sorted(list_partitions(table, using).items()):
+        end = add_months(month, 1)
+        if end > cutoff:
+            continue
+        with transaction.atomic(using=using):
+            delete_dependents(model, {f"{column}__gte": month, f"{column}__lt": end}, using)
+            # run the deferred foreign key checks queued by those deletes, a
+            # table with pending trigger events cannot be dropped
+            connection.check_constraints()
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+        dropped.append(name)
+    return dropped
+
+
+def purge_default_before(model, cutoff, using='default'):
+    """
+    Delete the rows of the default partition of `model`'s table older than
+    `cutoff`, which dropping monthly partitions never reaches, with the rows
+    pointing at them. Returns the number of rows deleted.
+    """
+    table = model._meta.db_table
+    column = PARTITIONED_TABLES[table]
+    default = default_partition(table, using)
+    if default is None:
+        return 0
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        delete_dependents(model, {f"{column}__lt": cutoff}, using)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(default)} WHERE {connection.ops.quote_name(column)} < %s",
+                [cutoff],
+            )
+            return cursor.rowcount
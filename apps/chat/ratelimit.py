@@ -0,0 +1,185 @@
+"""
+Token bucket rate limiting.
+
+Buckets live in Redis (when REDIS_URL is set) and are updated by a Lua
+script, so checking and taking a token is a single atomic round trip shared
+by every worker. A request checked against several buckets takes a token
+from each of them or from none. Without Redis, or while it is unreachable, buckets are kept
+in process memory instead; after a failed call Redis is left alone for
+RATE_LIMIT_REDIS_RETRY_SECONDS so an outage does not add its socket timeout
+to every request.
+
+Limits are configured in settings.RATE_LIMITS as "<tokens>/<period>", e.g.
+"30/min": a bucket holds at most 30 tokens and refills at 30 per minute.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit'
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+# KEYS: buckets, ARGV: capacity, refill per second and cost for each bucket in turn.
+# Returns {allowed, seconds to wait as a string} (Lua numbers are truncated to integers on return).
+TOKEN_BUCKET_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local tokens = {}
+local allowed = 1
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 2])
+    local rate = tonumber(ARGV[i * 3 - 1])
+    local cost = tonumber(ARGV[i * 3])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local ts = tonumber(bucket[2]) or now
+    tokens[i] = math.min(capacity, (tonumber(bucket[1]) or capacity) + math.max(0, now - ts) * rate)
+    if tokens[i] < cost then
+        allowed = 0
+        wait = math.max(wait, (cost - tokens[i]) / rate)
+    end
+end
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 2])
+    local rate = tonumber(ARGV[i * 3 - 1])
+    if allowed == 1 then
+        tokens[i] = tokens[i] - tonumber(ARGV[i * 3])
+    end
+    redis.call('HSET', key, 'tokens', tokens[i], 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+end
+return {allowed, tostring(wait)}
+"""
+
+
+def parse_rate(rate):
+    """
+    Turn "30/min" into (capacity, tokens per second).
+    """
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period.strip().lower()]
+
+
+class LocalBuckets:
+    """
+    In-process buckets; the least recently used ones are evicted past
+    `max_buckets` so memory stays bounded.
+    """
+
+    def __init__(self, max_buckets=10000):
+        self.max_buckets = max_buckets
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, cost=1):
+        return self.consume_all([(key, capacity, rate, cost)])
+
+    def consume_all(self, limits):
+        """
+        Take tokens from every (key, capacity, rate, cost) bucket, or from
+        none of them if any is short.
+        """
+        now = time.monotonic()
+        with self.lock:
+            levels = []
+            for key, capacity, rate, cost in limits:
+                tokens, ts = self.buckets.pop(key, (capacity, now))
+                levels.append(min(capacity, tokens + (now - ts) * rate))
+            waits = [
+                (cost - tokens) / rate for tokens, (_, _, rate, cost) in zip(levels, limits) if tokens < cost
+            ]
+            allowed = not waits
+            for tokens, (key, _, _, cost) in zip(levels, limits):
+                self.buckets[key] = (tokens - cost if allowed else tokens, now)
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+        return allowed, max(waits, default=0.0)
+
+
+class RedisBuckets:
+    def __init__(self, url, retry_after=5):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+        self.retry_after = retry_after
+        self.down_until = 0.0
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self):
+        self.down_until = time.monotonic() + self.retry_after
+
+    def consume(self, key, capacity, rate, cost=1):
+        return self.consume_all([(key, capacity, rate, cost)])
+
+    def consume_all(self, limits):
+        args = [arg for _, capacity, rate, cost in limits for arg in (capacity, rate, cost)]
+        allowed, wait = self.script(keys=[key for key, *_ in limits], args=args)
+        return bool(allowed), float(wait)
+
+
+_local = LocalBuckets()
+_redis = None
+_redis_lock = threading.Lock()
+
+
+def get_redis_buckets():
+    global _redis
+    if not settings.REDIS_URL:
+        return None
+    if _redis is None:
+        with _redis_lock:
+            if _redis is None:
+                _redis = RedisBuckets(settings.REDIS_URL, settings.RATE_LIMIT_REDIS_RETRY_SECONDS)
+    return _redis
+
+
+def consume(scope, ident, cost=1):
+    """
+    Take `cost` tokens from the `scope` bucket of `ident`.
+
+    Returns (allowed, retry_after_seconds). Scopes without a configured
+    limit are always allowed.
+    """
+    return consume_all([(scope, ident)], cost)
+
+
+def consume_all(scopes, cost=1):
+    """
+    Take `cost` tokens from the bucket of each (scope, ident) pair if all
+    of them have enough; otherwise take nothing, so a request rejected by
+    one bucket does not use up the others.
+
+    Returns (allowed, retry_after_seconds).
+    """
+    limits = []
+    for scope, ident in scopes:
+        rate = settings.RATE_LIMITS.get(scope)
+        if rate:
+            capacity, refill = parse_rate(rate)
+            limits.append((f"{KEY_PREFIX}:{scope}:{ident}", capacity, refill, cost))
+    if not limits:
+        return True, 0.0
+
+    buckets = get_redis_buckets()
+    if buckets is not None and buckets.available:
+        try:
+            return buckets.consume_all(limits)
+        except Exception as exc:
+            # keep limiting per process rather than failing requests
+            buckets.mark_down()
+            logger.warning(
+                "Rate limit store unavailable, using local buckets for %ss: %s", buckets.retry_after, exc,
+            )
+    return _local.consume_all(limits)
@@ -0,0 +1,147 @@
+"""
+Per-message reaction summaries.
+
+Message.reaction_counts holds {emoji: count} so message payloads stay
+bounded by the number of distinct emoji instead of the number of reactions.
+Each reaction change adjusts the counts of the emoji it removes and adds in
+a single UPDATE (in the same statement as the upsert for the reaction
+endpoint); the full recount is only used for repairs (see the
+recount_reactions command).
+"""
+from collections import Counter, defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Message, Reaction
+
+
+def count_reactions(message_ids):
+    """
+    Return {message_id: {emoji: count}} for the given messages.
+    """
+    counts = defaultdict(dict)
+    rows = (
+        Reaction.objects.filter(message_id__in=message_ids)
+        .values_list('message_id', 'emoji')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for message_id, emoji, total in rows:
+        counts[message_id][emoji] = total
+    return counts
+
+
+def counts_expression(removed=None, added=None):
+    """
+    SQL for reaction_counts with one `removed` reaction taken away and one
+    `added` reaction put in. Both are SQL text expressions (placeholders or
+    subqueries); a NULL `removed` takes nothing away, and an emoji whose
+    count drops to zero is removed from the summary.
+    """
+    counts = 'reaction_counts'
+    if removed:
+        counts = (
+            f"CASE WHEN {removed} IS NULL THEN {counts}"
+            f" WHEN ({counts} ->> {removed})::int > 1"
+            f" THEN {counts} || jsonb_build_object({removed}, ({counts} ->> {removed})::int - 1)"
+            f" ELSE {counts} - {removed} END"
+        )
+    if added:
+        counts = f"{counts} || jsonb_build_object({added}, COALESCE(({counts} ->> {added})::int, 0) + 1)"
+    return counts
+
+
+def adjust_reaction_counts(message_id, removed=None, added=None):
+    """
+    Move one reaction of a message from emoji `removed` to emoji `added`
+    (either may be None) without recounting. The UPDATE works on the latest
+    version of the row, so concurrent adjustments do not lose each other.
+    """
+    if removed == added:
+        return
+    expression = counts_expression(
+        '%(removed)s::text' if removed is not None else None,
+        '%(added)s::text' if added is not None else None,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Message._meta.db_table} SET reaction_counts = {expression} WHERE id = %(message)s",
+            {'message': message_id, 'removed': removed, 'added': added},
+        )
+
+
+UPSERT_REACTION = """
+WITH previous AS (
+    SELECT emoji FROM {reaction} WHERE message_id = %(message)s AND user_id = %(user)s
+), upsert AS (
+    INSERT INTO {reaction} (message_id, user_id, emoji, created_at)
+    SELECT %(message)s, %(user)s, %(emoji)s, %(now)s
+    WHERE EXISTS (SELECT 1 FROM {message} WHERE id = %(message)s AND deleted_at IS NULL)
+    ON CONFLICT (message_id, user_id) DO UPDATE SET emoji = EXCLUDED.emoji
+    WHERE {reaction}.emoji IS NOT DISTINCT FROM (SELECT emoji FROM previous)
+    RETURNING id
+), counts AS (
+    UPDATE {message} SET reaction_counts = {counts}
+    WHERE id = %(message)s AND EXISTS (SELECT 1 FROM upsert)
+)
+SELECT
+    (SELECT id FROM upsert),
+    (SELECT emoji FROM previous),
+    EXISTS (SELECT 1 FROM {message} WHERE id = %(message)s AND deleted_at IS NULL)
+"""
+
+
+def upsert_reaction(message_id, user_id, emoji):
+    """
+    Set a user's reaction on a live message and move its count, in one
+    statement. Returns (reaction id, previous emoji or None); raises
+    Message.DoesNotExist when there is no such message.
+
+    The count change is taken from the reaction as this statement's snapshot
+    saw it, so the update only applies while the row still holds that emoji.
+    When a concurrent request changed it first, the conflicting row is left
+    locked and the statement runs again on a fresh snapshot, which then
+    sees the latest emoji.
+    """
+    sql = UPSERT_REACTION.format(
+        reaction=Reaction._meta.db_table,
+        message=Message._meta.db_table,
+        counts=counts_expression('(SELECT emoji FROM previous)', '%(emoji)s::text'),
+    )
+    params = {'message': message_id, 'user': user_id, 'emoji': emoji, 'now': timezone.now()}
+    with transaction.atomic(), connection.cursor() as cursor:
+        while True:
+            cursor.execute(sql, params)
+            reaction_id, previous, exists = cursor.fetchone()
+            if reaction_id is not None:
+                return reaction_id, previous
+            if not exists:
+                raise Message.DoesNotExist
+
+
+def refresh_reaction_counts(message_id):
+    """
+    Recompute the summary for one message from its reactions.
+
+    The message row is locked first so concurrent reactions on the same
+    message apply one after another and each count sees the previous
+    commits. FOR NO KEY UPDATE does not conflict with the key share locks
+    taken by inserting reactions that reference the message.
+    """
+    with transaction.atomic():
+        locked = Message.objects.select_for_update(no_key=True).filter(pk=message_id).values_list('pk', flat=True)
+        if not list(locked):
+            return None
+        counts = count_reactions([message_id]).get(message_id, {})
+        Message.objects.filter(pk=message_id).update(reaction_counts=counts)
+    return counts
+
+
+def summarize(emojis):
+    """
+    Build a summary from emoji strings, e.g. for rows that are about to be
+    inserted in bulk.
+    """
+    return dict(Counter(emojis))
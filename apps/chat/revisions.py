@@ -0,0 +1,79 @@
+"""
+Compact edit history for messages.
+
+Each MessageRevision stores a reverse diff: the spans that turn the content
+written by that edit back into the previous content, as
+[[start, end, replacement], ...] against the newer text. Walking the
+revisions newest first from the current content rebuilds every version.
+"""
+import json
+import os
+import re
+from difflib import SequenceMatcher
+
+# a word with the whitespace after it, or leading whitespace
+TOKEN = re.compile(r'\S+\s*|\s+')
+# token pairs SequenceMatcher may compare (it is quadratic on repetitive
+# input); larger edits store the whole old text instead
+DIFF_BUDGET = 250_000
+
+
+def common_affix(new, old):
+    """
+    Lengths of the common prefix and of the common suffix after it.
+    """
+    prefix = len(os.path.commonprefix([new, old]))
+    limit = min(len(new), len(old)) - prefix
+    suffix = len(os.path.commonprefix([new[::-1][:limit], old[::-1][:limit]]))
+    return prefix, suffix
+
+
+def reverse_diff(new, old):
+    """
+    Return the ops that turn `new` back into `old`, diffed by word within the
+    changed middle. When the ops would not be smaller than `old` itself, a
+    single op replacing everything is returned.
+    """
+    if new == old:
+        return []
+    whole = [[0, len(new), old]]
+    prefix, suffix = common_affix(new, old)
+    new_tokens = TOKEN.findall(new[prefix:len(new) - suffix])
+    old_tokens = TOKEN.findall(old[prefix:len(old) - suffix])
+    if len(new_tokens) * len(old_tokens) > DIFF_BUDGET:
+        return whole
+
+    offsets = [prefix]
+    for token in new_tokens:
+        offsets.append(offsets[-1] + len(token))
+    matcher = SequenceMatcher(None, new_tokens, old_tokens, autojunk=False)
+    diff = [
+        [offsets[i1], offsets[i2], ''.join(old_tokens[j1:j2])]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+    if len(json.dumps(diff)) >= len(json.dumps(whole)):
+        return whole
+    return diff
+
+
+def apply_diff(text, diff):
+    # apply from the end so earlier offsets stay valid
+    for start, end, replacement in reversed(diff):
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+def versions(message):
+    """
+    Return the message's versions newest first as dicts with `content` and
+    `edited_at` (None for the original).
+    """
+    revisions = list(message.revisions.all())
+    content = message.content
+    history = []
+    for revision in revisions:
+        history.append({'content': content, 'edited_at': revision.edited_at})
+        content = apply_diff(content, revision.diff)
+    history.append({'content': content, 'edited_at': None})
+    return history
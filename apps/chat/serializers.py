@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Conversation, Message, Reaction
+from django.conf import settings
+from django.urls import reverse
+from .models import Attachment, Conversation, Message, Reaction
 from apps.users.models import CustomUser
 from rest_framework.pagination import PageNumberPagination
 
@@ -10,7 +12,22 @@ class ReactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Reaction
-        fields = ['user', 'emoji']
+        fields = ['user_id', 'user', 'emoji', 'created_at']
+
+
+
+class AttachmentSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Attachment
+        fields = ['id', 'filename', 'content_type', 'size', 'sha256', 'received', 'status', 'download_url']
+        read_only_fields = ['id', 'received', 'status']
+
+    def get_download_url(self, obj):
+        url = reverse('attachment-download', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
 
@@ -18,12 +35,42 @@ class MessageSerializer(serializers.ModelSerializer):
     sender = serializers.SlugRelatedField(slug_field='id', read_only=True)
     receiver = serializers.SlugRelatedField(slug_field='id', read_only=True)
     conversation = serializers.PrimaryKeyRelatedField(read_only=True)
-    reactions = ReactionSerializer(many=True, read_only=True)
+    attachments = AttachmentSerializer(many=True, read_only=True)
+    # completed uploads to attach when sending
+    attachment_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, write_only=True,
+    )
+    my_reaction = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
-        fields = ['id', 'conversation', 'sender', 'receiver', 'content', 'reactions', 'timestamp', 'is_read']
-        read_only_fields = ['id', 'timestamp', 'sender']
+        fields = [
+            'id', 'conversation', 'sender', 'receiver', 'content', 'reaction_counts', 'my_reaction',
+            'attachments', 'attachment_ids', 'timestamp', 'edited_at', 'is_read'
+        ]
+        read_only_fields = ['id', 'timestamp', 'sender', 'reaction_counts', 'edited_at']
+        # a message may consist of attachments only
+        extra_kwargs = {'content': {'required': False, 'allow_blank': True}}
+
+    def validate_attachment_ids(self, value):
+        if len(value) > settings.MESSAGE_MAX_ATTACHMENTS:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {settings.MESSAGE_MAX_ATTACHMENTS} elements."
+            )
+        return value
+
+    def get_my_reaction(self, obj):
+        """
+        The requesting user's emoji; views listing many messages prefetch it
+        into `my_reactions`.
+        """
+        request = self.context.get('request')
+        if not request or not request.user.is_authenticated:
+            return None
+        mine = getattr(obj, 'my_reactions', None)
+        if mine is None:
+            mine = obj.reactions.filter(user=request.user)
+        return next((reaction.emoji for reaction in mine), None)
 
 
 
@@ -1,13 +1,30 @@
+import logging
+
 from stream_chat import StreamChat
 from django.conf import settings
 from stream_chat.base.exceptions import StreamAPIException
+from apps.monitoring.metrics import Counter, Histogram, timed
+from apps.monitoring.tracing import traced
 from .models import CustomUser
 
+logger = logging.getLogger(__name__)
+
+GETSTREAM_SECONDS = Histogram('getstream_request_duration_seconds', "GetStream API call latency", ['method'])
+GETSTREAM_ERRORS = Counter('getstream_errors_total', "GetStream API calls that raised", ['method'])
+
+
+def instrumented(method):
+    def decorator(func):
+        return traced(f"getstream.{method}")(timed(GETSTREAM_SECONDS, errors=GETSTREAM_ERRORS, method=method)(func))
+    return decorator
+
+
 class GetStreamService:
     def __init__(self):
         self.client = StreamChat(api_key=settings.GETSTREAM_API_KEY, api_secret=settings.GETSTREAM_API_SECRET)
 
 
+    @instrumented('create_or_get_channel')
     def create_or_get_channel(self, user_1, user_2):
         members = sorted([str(user_1.id), str(user_2.id)])
         channel_id = f"{members[0]}-{members[1]}"
@@ -37,11 +54,12 @@ class GetStreamService:
         return channel
 
 
+    @instrumented('send_message')
     def send_message(self, channel, sender, receiver, content):
         """
         Send a message to the specified channel.
         """
-        print(f'The gotten user ID is: {str(sender.id)}')
+        logger.debug("Sending GetStream message", extra={'sender_id': sender.id, 'channel_id': channel.id})
 
         message_payload = {
             "text": content
@@ -51,6 +69,7 @@ class GetStreamService:
         message = channel.send_message(message_payload, user_id=str(sender.id))
         return message
 
+    @instrumented('get_channel')
     def get_channel(self, user_1, user_2):
         """
         Retrieve the channel for the two users.
@@ -60,6 +79,7 @@ class GetStreamService:
 
 
 
+    @instrumented('create_user_in_streamchat')
     def create_user_in_streamchat(self, user):
         """Create a user in StreamChat if they don't exist."""
         user_data = {
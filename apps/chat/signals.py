@@ -1,17 +1,18 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from apps.chat.models import Message, Reaction
+from apps.chat.models import Message, Reaction, Attachment
+from apps.chat.reactions import adjust_reaction_counts, refresh_reaction_counts
+from apps.chat.storage import get_attachment_storage
+from apps.monitoring.tracing import traced
 from apps.notifications.models import Notification
-from apps.notifications.utils import notify_user
+from apps.notifications.utils import notify_user, notify_reaction
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Define signal handlers
+@traced('signal.handle_new_message')
 def handle_new_message(sender, instance, created, **kwargs):
-    print(f"Signal handle_new_message fired. Message ID: {instance.id}, Created: {created}")
-    logger.info(f"Signal handle_new_message fired. Message ID: {instance.id}, Created: {created}")
-    
     if created:
         try:
             # Create database notification
@@ -21,8 +22,10 @@ def handle_new_message(sender, instance, created, **kwargs):
                 notification_type='new_message'
             )
             
-            print(f"Notification created: {notification.id} for message {instance.id}")
-            logger.info(f"Notification created: {notification.id} for message {instance.id}")
+            logger.info(
+                "Message notification created",
+                extra={'message_id': instance.id, 'notification_id': notification.id, 'sample': True},
+            )
             
             # Send real-time notification
             notify_user(
@@ -37,46 +40,43 @@ def handle_new_message(sender, instance, created, **kwargs):
                     "conversation_id": instance.conversation.id if instance.conversation else None
                 }
             )
-        except Exception as e:
-            print(f"Error in handle_new_message signal: {str(e)}")
-            logger.error(f"Error in handle_new_message signal: {str(e)}")
+        except Exception:
+            logger.exception("handle_new_message failed", extra={'message_id': instance.id})
 
+@traced('signal.handle_reaction')
 def handle_reaction(sender, instance, created, **kwargs):
-    print(f"Signal handle_reaction fired. Reaction ID: {instance.id}, Created: {created}")
-    logger.info(f"Signal handle_reaction fired. Reaction ID: {instance.id}, Created: {created}")
-    
     # Only notify if it's a new reaction
     if created or getattr(instance, '_loaded_values', {}).get('emoji') != instance.emoji:
         try:
-            # Create database notification
-            notification = Notification.objects.create(
-                user=instance.message.sender if instance.message.sender != instance.user else instance.message.receiver,
-                message=instance.message,
-                reaction=instance,
-                notification_type="reaction"
+            notification = notify_reaction(instance)
+            logger.info(
+                "Reaction notification updated",
+                extra={'reaction_id': instance.id, 'notification_id': notification.id, 'sample': True},
             )
-            
-            logger.info(f"Reaction notification created: {notification.id}")
-            
-            # Send real-time notification
-            notify_user(
-                notification.user.id,  # Send to the appropriate user (not the reactor)
-                "reaction",
-                {
-                    "notification_id": notification.id,
-                    "message_id": instance.message.id,
-                    "user_id": instance.user.id,  # Who reacted
-                    "emoji": instance.emoji,
-                    "timestamp": str(instance.message.timestamp)
-                }
-            )
-        except Exception as e:
-            print(f"Error in handle_reaction signal: {str(e)}")
-            logger.error(f"Error in handle_reaction signal: {str(e)}")
+        except Exception:
+            logger.exception("handle_reaction failed", extra={'reaction_id': instance.id})
+
+def update_reaction_counts(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None)
+    if created:
+        adjust_reaction_counts(instance.message_id, added=instance.emoji)
+    elif loaded is None:
+        # saved without being loaded first, so the previous emoji is unknown
+        refresh_reaction_counts(instance.message_id)
+    else:
+        adjust_reaction_counts(instance.message_id, removed=loaded['emoji'], added=instance.emoji)
+    instance._loaded_values = {'emoji': instance.emoji}
+
+def remove_reaction_count(sender, instance, **kwargs):
+    adjust_reaction_counts(instance.message_id, removed=instance.emoji)
+
+def delete_attachment_file(sender, instance, **kwargs):
+    get_attachment_storage().delete(instance.storage_key)
 
 # Explicitly connect the signals
 # This will be called when this module is imported
-print("Connecting signal handlers for Message and Reaction models...")
 post_save.connect(handle_new_message, sender=Message)
 post_save.connect(handle_reaction, sender=Reaction)
-print("Signal handlers connected successfully")
\ No newline at end of file
+post_save.connect(update_reaction_counts, sender=Reaction)
+post_delete.connect(remove_reaction_count, sender=Reaction)
+post_delete.connect(delete_attachment_file, sender=Attachment)
@@ -0,0 +1,88 @@
+"""
+Storage backends for message attachments.
+
+Backends only deal with opaque keys and byte streams so uploads can be
+written chunk by chunk and downloads read piece by piece, without a whole
+file ever being held in memory. Select one with
+settings.ATTACHMENT_STORAGE_BACKEND.
+"""
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class AttachmentStorage:
+    def append(self, key, chunks):
+        """
+        Append every bytes object from `chunks` to `key` (created if
+        missing) and return the new size.
+        """
+        raise NotImplementedError
+
+    def size(self, key):
+        raise NotImplementedError
+
+    def truncate(self, key, size):
+        """
+        Drop anything past `size` bytes, e.g. the tail of an interrupted chunk.
+        """
+        raise NotImplementedError
+
+    def open(self, key):
+        """
+        Return a seekable binary file object for reading `key`.
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class LocalAttachmentStorage(AttachmentStorage):
+    """
+    Keeps attachments under settings.ATTACHMENT_ROOT, outside MEDIA_ROOT so
+    they are only reachable through the permission-checked download view.
+    """
+
+    def path(self, key):
+        root = Path(settings.ATTACHMENT_ROOT).resolve()
+        path = (root / key).resolve()
+        if root not in path.parents:
+            raise ValueError(f"Invalid attachment key: {key}")
+        return path
+
+    def append(self, key, chunks):
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'ab') as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+            fh.flush()
+            os.fsync(fh.fileno())
+            return fh.tell()
+
+    def size(self, key):
+        try:
+            return self.path(key).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def truncate(self, key, size):
+        path = self.path(key)
+        if path.exists():
+            os.truncate(path, size)
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def delete(self, key):
+        try:
+            self.path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def get_attachment_storage():
+    return import_string(settings.ATTACHMENT_STORAGE_BACKEND)()
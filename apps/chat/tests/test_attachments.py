@@ -0,0 +1,213 @@
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.chat.models import Attachment, Conversation, Message
+from apps.chat.storage import get_attachment_storage
+from apps.chat.views import upload_digests
+from apps.users.models import CustomUser
+
+User = get_user_model()
+
+CONTENT = b'0123456789' * 1000
+
+
+class AttachmentTests(APITestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        settings_override = override_settings(ATTACHMENT_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+        self.sender = User.objects.create_user(email='sender@example.com', password='pass1234')
+        self.receiver = User.objects.create_user(email='receiver@example.com', password='pass1234')
+        self.outsider = User.objects.create_user(email='outsider@example.com', password='pass1234')
+        self.client.force_authenticate(user=self.sender)
+
+    def create_upload(self, content=CONTENT, sha256=None):
+        response = self.client.post(reverse('attachment-create'), {
+            'filename': 'report.txt',
+            'content_type': 'text/plain',
+            'size': len(content),
+            'sha256': sha256 or hashlib.sha256(content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['data']['id']
+
+    def send_chunk(self, pk, offset, chunk):
+        return self.client.generic(
+            'PATCH', reverse('attachment-upload', kwargs={'pk': pk}), chunk,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def upload(self, content=CONTENT, chunk_size=4000):
+        pk = self.create_upload(content)
+        for offset in range(0, len(content), chunk_size):
+            response = self.send_chunk(pk, offset, content[offset:offset + chunk_size])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return pk
+
+    def test_chunked_upload_completes(self):
+        pk = self.upload()
+        attachment = Attachment.objects.get(pk=pk)
+        self.assertEqual(attachment.status, 'complete')
+        self.assertEqual(attachment.received, len(CONTENT))
+
+    def test_resume_reports_offset_and_rejects_wrong_offset(self):
+        pk = self.create_upload()
+        self.send_chunk(pk, 0, CONTENT[:3000])
+
+        response = self.client.get(reverse('attachment-upload', kwargs={'pk': pk}))
+        self.assertEqual(response['Upload-Offset'], '3000')
+
+        response = self.send_chunk(pk, 0, CONTENT[:3000])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 3000)
+
+        response = self.send_chunk(pk, 3000, CONTENT[3000:])
+        self.assertEqual(response.data['status'], 'complete')
+
+    def test_chunks_are_hashed_as_they_arrive(self):
+        pk = self.create_upload()
+        # nothing stored is hashed again while the running digest is at hand
+        def hash_stored(digest, storage, key, start, end):
+            self.assertEqual(start, end)
+            return digest
+
+        with patch('apps.chat.views.hash_stored', hash_stored):
+            for offset in range(0, len(CONTENT), 4000):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.send_chunk(pk, offset, CONTENT[offset:offset + 4000])
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Attachment.objects.get(pk=pk).status, 'complete')
+
+    def test_lost_digest_is_rebuilt_from_stored_bytes(self):
+        pk = self.create_upload()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.send_chunk(pk, 0, CONTENT[:4000])
+        upload_digests.discard(pk)
+
+        response = self.send_chunk(pk, 4000, CONTENT[4000:])
+        self.assertEqual(response.data['status'], 'complete')
+
+    def test_checksum_mismatch_restarts_upload(self):
+        pk = self.create_upload(sha256='0' * 64)
+        response = self.send_chunk(pk, 0, CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        attachment = Attachment.objects.get(pk=pk)
+        self.assertEqual(attachment.received, 0)
+        self.assertEqual(get_attachment_storage().size(attachment.storage_key), 0)
+
+    def test_rejects_oversized_file(self):
+        with override_settings(ATTACHMENT_MAX_SIZE=10):
+            response = self.client.post(reverse('attachment-create'), {
+                'filename': 'big.bin', 'size': 11, 'sha256': '0' * 64,
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_full_and_range_download(self):
+        pk = self.upload()
+        url = reverse('attachment-download', kwargs={'pk': pk})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(CONTENT)}')
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[10:20])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[-5:])
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    @patch('apps.chat.views.GetStreamService')
+    def test_attach_to_message_and_participant_access(self, mock_stream_service):
+        pk = self.upload()
+        response = self.client.post(reverse('message-send'), {
+            'receiver': self.receiver.id, 'attachment_ids': [pk],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['attachments'][0]['id'], pk)
+        self.assertEqual(Attachment.objects.get(pk=pk).message, Message.objects.get())
+
+        url = reverse('attachment-download', kwargs={'pk': pk})
+        self.client.force_authenticate(user=self.receiver)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.outsider)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch('apps.chat.views.GetStreamService')
+    def test_attachment_ids_are_validated(self, mock_stream_service):
+        url = reverse('message-send')
+        for attachment_ids in (['x'], list(range(1, 12))):
+            response = self.client.post(url, {
+                'receiver': self.receiver.id, 'attachment_ids': attachment_ids,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('attachment_ids', response.data)
+        self.assertFalse(Conversation.objects.exists())
+
+    @patch('apps.chat.views.GetStreamService')
+    def test_cannot_attach_incomplete_upload(self, mock_stream_service):
+        pk = self.create_upload()
+        response = self.client.post(reverse('message-send'), {
+            'receiver': self.receiver.id, 'attachment_ids': [pk],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Conversation.objects.exists())
+
+    @patch('apps.chat.views.GetStreamService')
+    def test_attachment_claimed_meanwhile_is_rejected(self, mock_stream_service):
+        pk = self.upload()
+        conversation = Conversation.objects.create()
+        other = Message.objects.create(
+            conversation=conversation, sender=self.sender, receiver=self.receiver, content='first'
+        )
+        get_receiver = CustomUser.objects.get
+
+        def claim_meanwhile(**lookup):
+            # another send claims the upload between the check and the lock
+            Attachment.objects.filter(pk=pk).update(message=other)
+            return get_receiver(**lookup)
+
+        with patch.object(CustomUser.objects, 'get', claim_meanwhile):
+            response = self.client.post(reverse('message-send'), {
+                'receiver': self.receiver.id, 'attachment_ids': [pk],
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(Message.objects.all()), [other])
+        mock_stream_service.return_value.send_message.assert_not_called()
+
+    @override_settings(MESSAGE_MAX_ATTACHMENTS=1)
+    @patch('apps.chat.views.GetStreamService')
+    def test_attachment_limit_follows_the_setting(self, mock_stream_service):
+        response = self.client.post(reverse('message-send'), {
+            'receiver': self.receiver.id, 'attachment_ids': [1, 2],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('attachment_ids', response.data)
+
+    def test_chunks_leave_no_part_files(self):
+        self.upload()
+        self.assertEqual([path.name for path in Path(self.root).rglob('*.part')], [])
+
+    def test_deleting_attachment_removes_file(self):
+        pk = self.upload()
+        attachment = Attachment.objects.get(pk=pk)
+        attachment.delete()
+        self.assertEqual(get_attachment_storage().size(attachment.storage_key), 0)
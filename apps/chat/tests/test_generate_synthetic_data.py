@@ -0,0 +1,55 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from apps.chat.models import Conversation, Message, Reaction
+from apps.notifications.models import Notification
+from apps.users.models import CustomUser
+
+
+class GenerateSyntheticDataTests(TestCase):
+    def generate(self, *args):
+        call_command(
+            'generate_synthetic_data', '--users', '20', '--conversations', '15', '--messages', '300',
+            '--chunk-size', '100', '--reaction-rate', '0.5', *args, stdout=StringIO()
+        )
+
+    def snapshot(self):
+        return [
+            (m.sender.email, m.receiver.email, m.content, m.timestamp, m.reaction_counts)
+            for m in Message.objects.select_related('sender', 'receiver').order_by('timestamp', 'content')
+        ]
+
+    def test_generates_requested_volumes(self):
+        self.generate('--group-ratio', '0.3')
+
+        self.assertEqual(CustomUser.objects.count(), 20)
+        self.assertEqual(Conversation.objects.count(), 15)
+        self.assertEqual(Message.objects.count(), 300)
+        self.assertEqual(Notification.objects.count(), 300)
+        self.assertTrue(Reaction.objects.exists())
+        self.assertTrue(any(c.participants.count() > 2 for c in Conversation.objects.all()))
+
+        message = Message.objects.exclude(reaction_counts={}).first()
+        self.assertEqual(sum(message.reaction_counts.values()), message.reactions.count())
+
+    def test_same_seed_gives_same_data(self):
+        self.generate('--seed', '7')
+        first = self.snapshot()
+        CustomUser.objects.all().delete()
+        Conversation.objects.all().delete()
+
+        self.generate('--seed', '7')
+        self.assertEqual(self.snapshot(), first)
+
+    def test_rejects_existing_seed(self):
+        self.generate('--seed', '3')
+        with self.assertRaises(CommandError):
+            self.generate('--seed', '3')
+
+    def test_copy_path(self):
+        self.generate('--copy', '--no-notifications')
+        self.assertEqual(Message.objects.count(), 300)
+        self.assertFalse(Notification.objects.exists())
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+
+from apps.chat.management.commands.import_history import Command
+from apps.chat.models import Conversation, Message, Reaction
+from apps.notifications.models import Notification
+
+User = get_user_model()
+
+
+class ImportHistoryTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email='alice@example.com', password='pass1234')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pass1234')
+
+        records = [
+            {'sender': 'alice@example.com', 'receiver': 'bob@example.com', 'content': 'Hi\tBob\nline two',
+             'timestamp': '2023-01-01T10:00:00Z', 'is_read': True,
+             'reactions': [{'user': 'bob@example.com', 'emoji': '👍'}]},
+            {'sender': 'bob@example.com', 'receiver': 'alice@example.com', 'content': 'Hello back',
+             'timestamp': '2023-01-01T10:05:00Z'},
+            {'sender': 'ghost@example.com', 'receiver': 'alice@example.com', 'content': 'unknown sender'},
+        ]
+        handle, self.path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(handle, 'w', encoding='utf-8') as fh:
+            for record in records:
+                fh.write(json.dumps(record) + '\n')
+
+    def tearDown(self):
+        for path in (self.path, f"{self.path}.checkpoint"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run_import(self, *args):
+        call_command('import_history', self.path, *args, stdout=StringIO())
+
+    def assert_imported(self):
+        self.assertEqual(Conversation.objects.count(), 1)
+        messages = list(Message.objects.order_by('timestamp'))
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[0].content, 'Hi\tBob\nline two')
+        self.assertEqual(messages[0].timestamp.year, 2023)
+        self.assertTrue(messages[0].is_read)
+        self.assertEqual(Reaction.objects.get().user, self.bob)
+        self.assertEqual(messages[0].reaction_counts, {'👍': 1})
+        self.assertFalse(Notification.objects.exists())
+
+    def test_import_with_copy(self):
+        self.run_import()
+        self.assert_imported()
+
+    def test_import_with_bulk_create_fallback(self):
+        self.run_import('--no-copy')
+        self.assert_imported()
+
+    def test_reuses_existing_conversation(self):
+        conversation = Conversation.objects.create()
+        conversation.participants.set([self.alice, self.bob])
+        self.run_import()
+        self.assertEqual(Conversation.objects.count(), 1)
+        self.assertEqual(conversation.messages.count(), 2)
+
+    def test_resume_skips_checkpointed_lines(self):
+        self.run_import('--batch-size', '1')
+        with open(f"{self.path}.checkpoint", encoding='utf-8') as fh:
+            self.assertEqual(json.load(fh)['line'], 3)
+
+        self.run_import('--resume')
+        self.assertEqual(Message.objects.count(), 2)
+
+    def test_checkpoint_is_not_advanced_by_a_failed_batch(self):
+        original = Command.insert
+
+        def insert(command, model, objs):
+            if model is Message and Message.objects.exists():
+                raise DatabaseError("connection lost")
+            original(command, model, objs)
+
+        with patch.object(Command, 'insert', insert), self.assertRaises(DatabaseError):
+            self.run_import('--batch-size', '1')
+        with open(f"{self.path}.checkpoint", encoding='utf-8') as fh:
+            self.assertEqual(json.load(fh)['line'], 1)
+
+        self.run_import('--resume')
+        self.assert_imported()
+
+    def test_bad_lines_are_skipped_and_reported(self):
+        with open(self.path, 'a', encoding='utf-8') as fh:
+            fh.write('{not json\n')
+            fh.write(json.dumps({'sender': 'alice@example.com', 'receiver': 'bob@example.com',
+                                 'content': 'when?', 'timestamp': 'yesterday'}) + '\n')
+            fh.write(json.dumps({'sender': 'alice@example.com', 'receiver': 'bob@example.com',
+                                 'content': 'late reaction', 'timestamp': '2023-01-02T10:00:00Z',
+                                 'reactions': [{'user': 'bob@example.com', 'emoji': '🎉',
+                                                'created_at': '2023-13-40T00:00:00Z'}]}) + '\n')
+        out, err = StringIO(), StringIO()
+        call_command('import_history', self.path, stdout=out, stderr=err)
+
+        self.assertIn('Line 3: unknown sender/receiver or missing content, skipped', err.getvalue())
+        self.assertIn('Line 4: invalid JSON, skipped', err.getvalue())
+        self.assertIn("Line 5: invalid timestamp 'yesterday', skipped", err.getvalue())
+        self.assertIn('Line 6: reaction with invalid timestamp', err.getvalue())
+        self.assertIn('4 skipped', out.getvalue())
+        late = Message.objects.get(content='late reaction')
+        self.assertEqual(late.reaction_counts, {})
+        self.assertEqual(Message.objects.count(), 3)
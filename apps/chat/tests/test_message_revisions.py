@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.chat.models import Conversation, Message, MessageRevision
+from apps.chat.revisions import apply_diff, reverse_diff
+
+User = get_user_model()
+
+
+class ReverseDiffTests(SimpleTestCase):
+    def test_round_trip(self):
+        cases = [
+            ('', 'hello'),
+            ('hello world', 'hello there world'),
+            ('see you at 5pm tomorrow', 'see you at 6pm on friday'),
+            ('abc', ''),
+        ]
+        for old, new in cases:
+            self.assertEqual(apply_diff(new, reverse_diff(new, old)), old)
+
+    def test_small_edit_stores_only_changed_span(self):
+        old = 'x' * 500 + ' typo ' + 'y' * 500
+        new = 'x' * 500 + ' type ' + 'y' * 500
+        self.assertLess(len(str(reverse_diff(new, old))), 30)
+
+    def test_rewrites_store_the_old_text(self):
+        old, new = 'a b ' * 2500, 'b a ' * 2500
+        # past the budget the quadratic matcher is not even started
+        with patch('apps.chat.revisions.SequenceMatcher') as matcher:
+            diff = reverse_diff(new, old)
+        matcher.assert_not_called()
+        self.assertEqual(diff, [[0, len(new), old]])
+
+
+@patch('apps.notifications.utils.notify_user')
+class MessageEditTests(APITestCase):
+    def setUp(self):
+        self.sender = User.objects.create_user(email='sender@example.com', password='pass1234')
+        self.receiver = User.objects.create_user(email='receiver@example.com', password='pass1234')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set([self.sender, self.receiver])
+        with patch('apps.chat.signals.notify_user'):
+            self.message = Message.objects.create(
+                conversation=self.conversation, sender=self.sender, receiver=self.receiver, content='first draft'
+            )
+        self.url = reverse('message-update', kwargs={'pk': self.message.id})
+
+    def edit(self, content):
+        self.client.force_authenticate(user=self.sender)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(self.url, {'content': content})
+
+    def test_edits_are_recorded_and_broadcast(self, mock_notify):
+        with patch('apps.chat.views.notify_conversation') as notify_conversation:
+            response = self.edit('second draft')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIsNotNone(response.data['data']['edited_at'])
+            self.edit('final text')
+
+        edited = [c for c in notify_conversation.call_args_list if c.args[1] == 'message_edited']
+        self.assertEqual({c.args[0] for c in edited}, {self.conversation.id})
+        self.assertEqual(edited[-1].args[2]['content'], 'final text')
+
+        self.client.force_authenticate(user=self.receiver)
+        response = self.client.get(reverse('message-revisions', kwargs={'pk': self.message.id}))
+        contents = [version['content'] for version in response.data['data']]
+        self.assertEqual(contents, ['final text', 'second draft', 'first draft'])
+        self.assertIsNone(response.data['data'][-1]['edited_at'])
+
+    @override_settings(MESSAGE_MAX_LENGTH=20)
+    def test_content_length_is_capped(self, mock_notify):
+        response = self.edit('x' * 21)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(MessageRevision.objects.exists())
+
+    def test_unchanged_content_is_not_a_revision(self, mock_notify):
+        self.edit('first draft')
+        self.assertFalse(MessageRevision.objects.exists())
+        mock_notify.assert_not_called()
+
+    def test_outsider_cannot_see_revisions(self, mock_notify):
+        outsider = User.objects.create_user(email='outsider@example.com', password='pass1234')
+        self.client.force_authenticate(user=outsider)
+        response = self.client.get(reverse('message-revisions', kwargs={'pk': self.message.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
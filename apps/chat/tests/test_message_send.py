@@ -2,8 +2,10 @@ from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from unittest.mock import patch
 from apps.chat.models import Message, Conversation
+from apps.monitoring.tracing import get_exporter
 
 User = get_user_model()
 
@@ -33,6 +35,20 @@ class MessageSendTests(APITestCase):
         self.assertEqual(response.data['data']['receiver'], self.receiver.id)
         self.assertEqual(response.data['data']['content'], 'Hello there!')
 
+    @override_settings(TRACING_EXPORTER='apps.monitoring.tracing.InMemoryExporter')
+    @patch('apps.chat.views.GetStreamService')
+    def test_send_is_traced_from_request_to_publish(self, mock_stream_service):
+        exporter = get_exporter()
+        exporter.clear()
+        self.client.force_authenticate(user=self.sender)
+        self.client.post(self.url, {'receiver': self.receiver.id, 'content': 'Traced'})
+
+        spans = exporter.get_finished_spans()
+        request_span = next(span for span in spans if span.name == 'HTTP POST message-send')
+        for name in ('signal.handle_new_message', 'notify_user'):
+            span = next(span for span in spans if span.name == name)
+            self.assertEqual(span.context.trace_id, request_span.context.trace_id)
+
     def test_missing_content_or_receiver(self):
         self.client.force_authenticate(user=self.sender)
 
@@ -0,0 +1,99 @@
+from datetime import datetime, timezone as dt_timezone
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from apps.chat.bulk import explicit_timestamps
+from apps.chat.models import Conversation, Message, Reaction
+from apps.chat.partitioning import (
+    convert_to_partitioned, drop_partitions_before, ensure_partitions, is_partitioned, list_partitions,
+    purge_default_before,
+)
+from apps.notifications.models import Notification
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'postgresql', "Partitioning requires PostgreSQL")
+class MessagePartitioningTests(TestCase):
+    def setUp(self):
+        self.sender = User.objects.create_user(email='sender@example.com', password='pass1234')
+        self.receiver = User.objects.create_user(email='receiver@example.com', password='pass1234')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set([self.sender, self.receiver])
+
+        # DDL below must not run with deferred constraint checks pending
+        connection.check_constraints()
+        # already done by the migrations when MESSAGE_PARTITIONING is on
+        for table, column in (('chat_message', 'timestamp'), ('notifications_notification', 'created_at')):
+            if not is_partitioned(table):
+                convert_to_partitioned(table, column)
+
+    def create_message(self, year, month):
+        with explicit_timestamps(Message):
+            return Message.objects.create(
+                conversation=self.conversation, sender=self.sender, receiver=self.receiver,
+                content='hello', timestamp=datetime(year, month, 15, tzinfo=dt_timezone.utc),
+            )
+
+    def test_tables_are_partitioned(self):
+        self.assertTrue(is_partitioned('chat_message'))
+        self.assertTrue(is_partitioned('notifications_notification'))
+        self.assertTrue(list_partitions('chat_message'))
+
+    def test_time_scoped_queries_prune_partitions(self):
+        ensure_partitions('chat_message', start=datetime(2023, 1, 1, tzinfo=dt_timezone.utc))
+        self.create_message(2023, 1)
+        self.create_message(2023, 2)
+
+        queryset = Message.objects.filter(
+            timestamp__gte=datetime(2023, 2, 1, tzinfo=dt_timezone.utc),
+            timestamp__lt=datetime(2023, 3, 1, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(queryset.count(), 1)
+        plan = queryset.explain()
+        self.assertIn('chat_message_p202302', plan)
+        self.assertNotIn('chat_message_p202301', plan)
+
+    def test_drop_partitions_removes_old_rows_and_dependents(self):
+        ensure_partitions('chat_message', start=datetime(2023, 1, 1, tzinfo=dt_timezone.utc))
+        old = self.create_message(2023, 1)
+        kept = self.create_message(2023, 2)
+        Reaction.objects.create(message=old, user=self.receiver, emoji='👍')
+        connection.check_constraints()
+
+        dropped = drop_partitions_before(Message, datetime(2023, 2, 1, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(dropped, ['chat_message_p202301'])
+        self.assertEqual(list(Message.objects.all()), [kept])
+        self.assertFalse(Reaction.objects.exists())
+        self.assertFalse(Notification.objects.filter(message_id=old.id).exists())
+
+    def test_partition_takes_over_rows_from_default(self):
+        # no partition for 2022 yet, so these land in the default partition
+        stranded = self.create_message(2022, 6)
+        self.create_message(2022, 7)
+
+        created = ensure_partitions('chat_message', start=datetime(2022, 6, 1, tzinfo=dt_timezone.utc))
+
+        self.assertIn('chat_message_p202206', created)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM chat_message_p202206")
+            self.assertEqual(cursor.fetchall(), [(stranded.id,)])
+            cursor.execute("SELECT count(*) FROM chat_message_default")
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(Message.objects.count(), 2)
+
+    def test_old_rows_in_default_are_purged(self):
+        old = self.create_message(2022, 6)
+        kept = self.create_message(2030, 6)
+        Reaction.objects.create(message=old, user=self.receiver, emoji='👍')
+        connection.check_constraints()
+
+        purged = purge_default_before(Message, datetime(2023, 1, 1, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(purged, 1)
+        self.assertEqual(list(Message.objects.all()), [kept])
+        self.assertFalse(Reaction.objects.exists())
@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
+
+import redis
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from apps.chat import ratelimit
+from apps.chat.models import Conversation, Message
+from apps.chat.ratelimit import LocalBuckets, RedisBuckets, parse_rate
+from apps.chat.throttles import ReactionThrottle
+
+User = get_user_model()
+
+REDIS_URL = 'redis://127.0.0.1:6379/15'
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(REDIS_URL, socket_connect_timeout=0.2).ping()
+    except redis.RedisError:
+        return False
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('30/min'), (30, 0.5))
+        self.assertEqual(parse_rate('2/s'), (2, 2.0))
+
+    def test_local_bucket_refills_over_time(self):
+        buckets = LocalBuckets()
+        with patch('apps.chat.ratelimit.time.monotonic', return_value=100.0):
+            self.assertTrue(buckets.consume('k', 2, 1.0)[0])
+            self.assertTrue(buckets.consume('k', 2, 1.0)[0])
+            allowed, retry_after = buckets.consume('k', 2, 1.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 1.0)
+        with patch('apps.chat.ratelimit.time.monotonic', return_value=101.0):
+            self.assertTrue(buckets.consume('k', 2, 1.0)[0])
+
+    def test_local_buckets_are_bounded(self):
+        buckets = LocalBuckets(max_buckets=2)
+        for key in 'abc':
+            buckets.consume(key, 1, 1.0)
+        self.assertEqual(list(buckets.buckets), ['b', 'c'])
+
+    @skipUnless(redis_available(), "Redis is not running")
+    def test_redis_bucket(self):
+        buckets = RedisBuckets(REDIS_URL)
+        buckets.client.delete('ratelimit:test')
+        self.assertTrue(buckets.consume('ratelimit:test', 1, 0.5)[0])
+        allowed, retry_after = buckets.consume('ratelimit:test', 1, 0.5)
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 1.5)
+        buckets.client.delete('ratelimit:test')
+
+    def test_rejected_request_takes_no_tokens(self):
+        buckets = LocalBuckets()
+        with patch('apps.chat.ratelimit.time.monotonic', return_value=100.0):
+            self.assertTrue(buckets.consume('full', 1, 1.0)[0])
+            allowed, retry_after = buckets.consume_all([('spare', 1, 1.0, 1), ('full', 1, 1.0, 1)])
+            self.assertFalse(allowed)
+            self.assertAlmostEqual(retry_after, 1.0)
+            self.assertTrue(buckets.consume('spare', 1, 1.0)[0])
+
+    @skipUnless(redis_available(), "Redis is not running")
+    def test_redis_rejected_request_takes_no_tokens(self):
+        buckets = RedisBuckets(REDIS_URL)
+        buckets.client.delete('ratelimit:spare', 'ratelimit:full')
+        self.assertTrue(buckets.consume('ratelimit:full', 1, 0.5)[0])
+        allowed, retry_after = buckets.consume_all([('ratelimit:spare', 1, 0.5, 1), ('ratelimit:full', 1, 0.5, 1)])
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 1.5)
+        self.assertTrue(buckets.consume('ratelimit:spare', 1, 0.5)[0])
+        buckets.client.delete('ratelimit:spare', 'ratelimit:full')
+
+    @override_settings(REDIS_URL='redis://127.0.0.1:1/0', RATE_LIMITS={'test': '1/min'})
+    def test_falls_back_to_local_buckets_without_redis(self):
+        with patch.object(ratelimit, '_redis', None), patch.object(ratelimit, '_local', LocalBuckets()):
+            self.assertTrue(ratelimit.consume('test', 'user')[0])
+            self.assertFalse(ratelimit.consume('test', 'user')[0])
+
+    @override_settings(REDIS_URL='redis://127.0.0.1:1/0', RATE_LIMITS={'test': '5/min'})
+    def test_unreachable_redis_is_skipped_until_retry(self):
+        buckets = RedisBuckets('redis://127.0.0.1:1/0', retry_after=30)
+        with patch.object(ratelimit, '_redis', buckets), patch.object(ratelimit, '_local', LocalBuckets()), \
+                patch.object(buckets, 'script', side_effect=ConnectionError) as script:
+            ratelimit.consume('test', 'user')
+            ratelimit.consume('test', 'user')
+            self.assertEqual(script.call_count, 1)
+            buckets.down_until -= 30
+            ratelimit.consume('test', 'user')
+            self.assertEqual(script.call_count, 2)
+
+
+@override_settings(RATE_LIMITS={'message_send': '2/min', 'reaction': '1/min'})
+class ThrottledViewTests(APITestCase):
+    def setUp(self):
+        patcher = patch.object(ratelimit, '_local', LocalBuckets())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.sender = User.objects.create_user(email='sender@example.com', password='pass1234')
+        self.receiver = User.objects.create_user(email='receiver@example.com', password='pass1234')
+        self.client.force_authenticate(user=self.sender)
+
+    @patch('apps.chat.views.GetStreamService')
+    def test_message_send_is_throttled_per_user(self, mock_stream_service):
+        url = reverse('message-send')
+        for _ in range(2):
+            response = self.client.post(url, {'receiver': self.receiver.id, 'content': 'hi'})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(url, {'receiver': self.receiver.id, 'content': 'hi'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(Message.objects.count(), 2)
+
+    def test_reaction_is_throttled(self):
+        conversation = Conversation.objects.create()
+        conversation.participants.set([self.sender, self.receiver])
+        message = Message.objects.create(
+            conversation=conversation, sender=self.receiver, receiver=self.sender, content='hello'
+        )
+        url = reverse('add-reaction', kwargs={'message_id': message.id})
+
+        self.assertEqual(self.client.post(url, {'emoji': '👍'}).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(url, {'emoji': '❤️'}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(RATE_LIMITS={'reaction': '5/min', 'reaction_message': '1/min'})
+    def test_reaction_throttle_needs_no_query(self):
+        conversation = Conversation.objects.create()
+        conversation.participants.set([self.sender, self.receiver])
+        message = Message.objects.create(
+            conversation=conversation, sender=self.receiver, receiver=self.sender, content='hello'
+        )
+        request = APIRequestFactory().post('/')
+        request.user = self.sender
+        view = SimpleNamespace(kwargs={'message_id': message.id})
+
+        with self.assertNumQueries(0):
+            self.assertTrue(ReactionThrottle().allow_request(request, view))
+            self.assertFalse(ReactionThrottle().allow_request(request, view))
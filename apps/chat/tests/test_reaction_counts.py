@@ -0,0 +1,97 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.chat.models import Conversation, Message, Reaction
+
+User = get_user_model()
+
+
+@patch('apps.notifications.utils.notify_user')
+class ReactionCountTests(APITestCase):
+    def setUp(self):
+        self.sender = User.objects.create_user(email='sender@example.com', password='pass1234')
+        self.receiver = User.objects.create_user(email='receiver@example.com', password='pass1234')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set([self.sender, self.receiver])
+        with patch('apps.chat.signals.notify_user'):
+            self.message = Message.objects.create(
+                conversation=self.conversation, sender=self.sender, receiver=self.receiver, content='hello'
+            )
+
+    def react(self, user, emoji):
+        self.client.force_authenticate(user=user)
+        url = reverse('add-reaction', kwargs={'message_id': self.message.id})
+        return self.client.post(url, {'emoji': emoji})
+
+    def test_counts_follow_adds_changes_and_removals(self, mock_notify):
+        self.react(self.receiver, '👍')
+        self.react(self.sender, '👍')
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.reaction_counts, {'👍': 2})
+
+        self.react(self.sender, '❤️')
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.reaction_counts, {'👍': 1, '❤️': 1})
+
+        self.client.post(reverse('remove-reaction', kwargs={'message_id': self.message.id}))
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.reaction_counts, {'👍': 1})
+
+    def test_model_saves_adjust_counts(self, mock_notify):
+        reaction = Reaction.objects.create(message=self.message, user=self.sender, emoji='👍')
+        Reaction.objects.create(message=self.message, user=self.receiver, emoji='👍')
+
+        reaction = Reaction.objects.get(pk=reaction.pk)
+        reaction.emoji = '🎉'
+        reaction.save()
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.reaction_counts, {'👍': 1, '🎉': 1})
+
+        reaction.delete()
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.reaction_counts, {'👍': 1})
+
+    def test_recount_repairs_summaries(self, mock_notify):
+        Reaction.objects.create(message=self.message, user=self.sender, emoji='👍')
+        Message.objects.filter(pk=self.message.pk).update(reaction_counts={'👍': 5, '🎉': 1})
+
+        out = StringIO()
+        call_command('recount_reactions', stdout=out)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.reaction_counts, {'👍': 1})
+        self.assertIn('fixed 1', out.getvalue())
+
+    def test_conversation_returns_counts_and_own_reaction(self, mock_notify):
+        self.react(self.receiver, '👍')
+        self.client.force_authenticate(user=self.receiver)
+        response = self.client.get(reverse('conversation-detail', kwargs={'pk': self.conversation.id}))
+
+        message = response.data['messages'][0]
+        self.assertEqual(message['reaction_counts'], {'👍': 1})
+        self.assertEqual(message['my_reaction'], '👍')
+        self.assertNotIn('reactions', message)
+
+    def test_list_who_reacted(self, mock_notify):
+        for i in range(3):
+            user = User.objects.create_user(email=f'user{i}@example.com', password='pass1234')
+            Reaction.objects.create(message=self.message, user=user, emoji='👍' if i else '🎉')
+
+        self.client.force_authenticate(user=self.sender)
+        url = reverse('message-reactions', kwargs={'message_id': self.message.id})
+        response = self.client.get(url, {'emoji': '👍', 'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['emoji'], '👍')
+
+    def test_outsider_cannot_list_reactions(self, mock_notify):
+        outsider = User.objects.create_user(email='outsider@example.com', password='pass1234')
+        self.client.force_authenticate(user=outsider)
+        url = reverse('message-reactions', kwargs={'message_id': self.message.id})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
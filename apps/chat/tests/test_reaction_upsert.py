@@ -0,0 +1,119 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from apps.chat import ratelimit
+from apps.chat.models import Conversation, Message, Reaction
+from apps.chat.ratelimit import LocalBuckets
+from apps.notifications.models import Notification
+
+User = get_user_model()
+
+
+def create_message():
+    sender = User.objects.create_user(email='sender@example.com', password='pass1234')
+    receiver = User.objects.create_user(email='receiver@example.com', password='pass1234')
+    conversation = Conversation.objects.create()
+    conversation.participants.set([sender, receiver])
+    with patch('apps.chat.signals.notify_user'):
+        return Message.objects.create(conversation=conversation, sender=sender, receiver=receiver, content='hi')
+
+
+@patch('apps.notifications.utils.notify_user')
+class AddReactionTests(APITestCase):
+    def setUp(self):
+        self.message = create_message()
+        self.client.force_authenticate(user=self.message.receiver)
+        self.url = reverse('add-reaction', kwargs={'message_id': self.message.id})
+
+    def test_second_reaction_updates_emoji(self, mock_notify):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.post(self.url, {'emoji': '👍'})
+            self.client.post(self.url, {'emoji': '🎉'})
+
+        self.assertEqual(Reaction.objects.get().emoji, '🎉')
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(Notification.objects.get(notification_type='reaction').user, self.message.sender)
+
+    def test_same_reaction_again_is_a_no_op(self, mock_notify):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.post(self.url, {'emoji': '👍'})
+            response = self.client.post(self.url, {'emoji': '👍'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(callbacks), 1)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.reaction_counts, {'👍': 1})
+
+    def test_deleted_message(self, mock_notify):
+        Message.objects.filter(pk=self.message.pk).update(deleted_at=timezone.now())
+        response = self.client.post(self.url, {'emoji': '👍'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Reaction.objects.exists())
+
+    def test_missing_message(self, mock_notify):
+        url = reverse('add-reaction', kwargs={'message_id': self.message.id + 1000})
+        response = self.client.post(url, {'emoji': '👍'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Reaction.objects.exists())
+
+
+@patch('apps.notifications.utils.notify_user')
+class ConcurrentReactionTests(TransactionTestCase):
+    threads = 12
+
+    def setUp(self):
+        patcher = patch.object(ratelimit, '_local', LocalBuckets())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.message = create_message()
+        self.url = reverse('add-reaction', kwargs={'message_id': self.message.id})
+
+    def hammer(self, users, emojis):
+        barrier = threading.Barrier(len(users))
+        statuses = []
+
+        def react(user, emoji):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            try:
+                barrier.wait()
+                statuses.append(client.post(self.url, {'emoji': emoji}).status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=react, args=args) for args in zip(users, emojis)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return statuses
+
+    def test_many_users_on_one_message(self, mock_notify):
+        users = [
+            User.objects.create_user(email=f'user{i}@example.com', password='pass1234')
+            for i in range(self.threads)
+        ]
+        statuses = self.hammer(users, ['👍', '🎉'] * (self.threads // 2))
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * self.threads)
+        self.assertEqual(Reaction.objects.filter(message=self.message).count(), self.threads)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.reaction_counts, {'👍': self.threads // 2, '🎉': self.threads // 2})
+
+    def test_one_user_many_requests(self, mock_notify):
+        user = self.message.receiver
+        emojis = ['👍', '🎉', '❤️'] * (self.threads // 3)
+        statuses = self.hammer([user] * self.threads, emojis)
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * self.threads)
+        reaction = Reaction.objects.get(message=self.message)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.reaction_counts, {reaction.emoji: 1})
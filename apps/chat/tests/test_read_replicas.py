@@ -0,0 +1,90 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITransactionTestCase
+
+from apps.chat.models import Conversation, Message
+from config.routers import PIN_COOKIE, ReplicaPinningMiddleware, ReplicaRouter, is_pinned, pin_to_primary
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_middleware(self, request, status=200):
+        seen = {}
+
+        def get_response(request):
+            seen['pinned'] = is_pinned()
+            return HttpResponse(status=status)
+
+        response = ReplicaPinningMiddleware(get_response)(request)
+        return response, seen['pinned']
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        self.assertEqual(self.router.db_for_read(Message), 'replica_0')
+        self.assertEqual(self.router.db_for_write(Message), 'default')
+
+    def test_pinned_reads_go_to_primary(self):
+        with pin_to_primary():
+            self.assertEqual(self.router.db_for_read(Message), 'default')
+        self.assertEqual(self.router.db_for_read(Message), 'replica_0')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_default(self):
+        self.assertEqual(self.router.db_for_read(Message), 'default')
+
+    def test_write_request_is_pinned_and_sets_cookie(self):
+        response, pinned = self.run_middleware(self.factory.post('/messages/send/'))
+        self.assertTrue(pinned)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+
+    def test_failed_write_does_not_set_cookie(self):
+        response, _ = self.run_middleware(self.factory.post('/messages/send/'), status=400)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_read_after_write_is_pinned(self):
+        request = self.factory.get('/conversations/1/')
+        _, pinned = self.run_middleware(request)
+        self.assertFalse(pinned)
+
+        request.COOKIES[PIN_COOKIE] = '1'
+        _, pinned = self.run_middleware(request)
+        self.assertTrue(pinned)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "Set DB_REPLICA_HOSTS to run against replica aliases")
+class ReplicaReadTests(APITransactionTestCase):
+    # replica aliases use their own connection, so test data must be committed
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='user1@example.com', password='password')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set([self.user])
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('conversation-detail', kwargs={'pk': self.conversation.pk})
+
+    def replica_queries(self, **extra):
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+        with override_settings(DATABASE_REPLICAS=[replica.alias]), CaptureQueriesContext(replica) as ctx:
+            response = self.client.get(self.url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_detail_reads_from_replica(self):
+        self.assertGreater(self.replica_queries(), 0)
+
+    def test_pinned_client_reads_from_primary(self):
+        self.client.cookies[PIN_COOKIE] = '1'
+        self.assertEqual(self.replica_queries(), 0)
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.chat.models import Conversation, Message, Reaction
+from apps.notifications.models import Notification
+
+User = get_user_model()
+
+
+@patch('apps.notifications.utils.notify_user')
+class SoftDeleteTests(APITestCase):
+    def setUp(self):
+        self.sender = User.objects.create_user(email='sender@example.com', password='pass1234')
+        self.receiver = User.objects.create_user(email='receiver@example.com', password='pass1234')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set([self.sender, self.receiver])
+        with patch('apps.chat.signals.notify_user'):
+            self.message = Message.objects.create(
+                conversation=self.conversation, sender=self.sender, receiver=self.receiver, content='secret'
+            )
+        Reaction.objects.create(message=self.message, user=self.receiver, emoji='👍')
+
+    def delete_message(self):
+        self.client.force_authenticate(user=self.sender)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.delete(reverse('message-delete', kwargs={'pk': self.message.id}))
+
+    def test_delete_leaves_redacted_tombstone(self, mock_notify):
+        response = self.delete_message()
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertFalse(Message.objects.filter(pk=self.message.pk).exists())
+        tombstone = Message.all_objects.get(pk=self.message.pk)
+        self.assertIsNotNone(tombstone.deleted_at)
+        self.assertEqual(tombstone.content, '')
+        self.assertTrue(Reaction.objects.filter(message_id=self.message.pk).exists())
+
+    def test_delete_is_broadcast_to_the_conversation(self, mock_notify):
+        with patch('apps.chat.views.notify_conversation') as notify_conversation:
+            self.delete_message()
+        notify_conversation.assert_called_once()
+        conversation_id, event_type, data = notify_conversation.call_args.args
+        self.assertEqual((conversation_id, event_type), (self.conversation.id, 'message_deleted'))
+        self.assertEqual(data['message_id'], self.message.id)
+
+    def test_deleted_messages_are_hidden(self, mock_notify):
+        self.delete_message()
+
+        self.client.force_authenticate(user=self.receiver)
+        response = self.client.get(reverse('conversation-detail', kwargs={'pk': self.conversation.id}))
+        self.assertEqual(response.data['messages'], [])
+
+        response = self.client.get(reverse('notification-list'))
+        self.assertEqual(response.data, [])
+
+        url = reverse('add-reaction', kwargs={'message_id': self.message.id})
+        self.assertEqual(self.client.post(url, {'emoji': '🎉'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_purge_removes_old_tombstones_only(self, mock_notify):
+        self.delete_message()
+        with patch('apps.chat.signals.notify_user'):
+            recent = Message.objects.create(
+                conversation=self.conversation, sender=self.sender, receiver=self.receiver, content='later'
+            )
+        Message.objects.filter(pk=recent.pk).update(deleted_at=timezone.now())
+        Message.all_objects.filter(pk=self.message.pk).update(deleted_at=timezone.now() - timedelta(days=8))
+
+        call_command('purge_deleted_messages', '--older-than-days', '7', '--batch-size', '1', stdout=StringIO())
+
+        self.assertFalse(Message.all_objects.filter(pk=self.message.pk).exists())
+        self.assertTrue(Message.all_objects.filter(pk=recent.pk).exists())
+        self.assertFalse(Reaction.objects.filter(message_id=self.message.pk).exists())
+        self.assertFalse(Notification.objects.filter(message_id=self.message.pk).exists())
@@ -0,0 +1,52 @@
+from rest_framework.throttling import BaseThrottle
+
+from .ratelimit import consume_all
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Checks the request against several token buckets (see
+    settings.RATE_LIMITS); any empty bucket rejects it, and a rejected
+    request takes no token from the others.
+    """
+
+    def get_buckets(self, request, view):
+        """
+        Return (scope, ident) pairs for this request.
+        """
+        return [('ip', self.get_ident(request))]
+
+    def allow_request(self, request, view):
+        allowed, retry_after = consume_all(self.get_buckets(request, view))
+        self.retry_after = None if allowed else retry_after
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class MessageSendThrottle(TokenBucketThrottle):
+    def get_buckets(self, request, view):
+        buckets = super().get_buckets(request, view)
+        if not request.user.is_authenticated:
+            return buckets
+        buckets.append(('message_send', request.user.id))
+        receiver_id = request.data.get('receiver')
+        if receiver_id:
+            # a 1:1 conversation is identified by its participant pair
+            pair = sorted([str(request.user.id), str(receiver_id)])
+            buckets.append(('message_send_conversation', '-'.join(pair)))
+        return buckets
+
+
+class ReactionThrottle(TokenBucketThrottle):
+    def get_buckets(self, request, view):
+        buckets = super().get_buckets(request, view)
+        if not request.user.is_authenticated:
+            return buckets
+        buckets.append(('reaction', request.user.id))
+        # keyed on the URL so the throttle needs no query
+        message_id = view.kwargs.get('message_id')
+        if message_id:
+            buckets.append(('reaction_message', message_id))
+        return buckets
@@ -3,19 +3,34 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from .models import Message, Conversation, Reaction
-from .serializers import MessageSerializer, ConversationDetailSerializer, ConversationSerializer, ReactionSerializer
+from .models import Message, Conversation, Reaction, Attachment, MessageRevision
+from .serializers import (
+    MessageSerializer, ConversationDetailSerializer, ConversationSerializer, ReactionSerializer, AttachmentSerializer
+)
+from .reactions import upsert_reaction
+from .revisions import reverse_diff, versions
 from .services import GetStreamService
+from .throttles import MessageSendThrottle, ReactionThrottle
+from .storage import get_attachment_storage
 from apps.users.models import CustomUser
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
-from django.db import transaction
-from apps.notifications.utils import notify_user
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from apps.notifications.utils import notify_conversation, notify_reaction
 from uuid import uuid4
+import hashlib
+import re
+import threading
 import uuid
+from collections import OrderedDict
 
 
 
@@ -26,12 +41,14 @@ class MessageCreateView(generics.CreateAPIView):
 
     Requires:
     - receiver: ID of the user to send the message to
-    - content: The message text
+    - content: The message text (optional when attachment_ids is given)
+    - attachment_ids: IDs of completed uploads to attach (optional)
 
     This will create a new channel if one does not exist or send a message to the existing one.
     """
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    throttle_classes = [MessageSendThrottle]
 
     @swagger_auto_schema(
         operation_description="Send a message to another user using GetStream.io.",
@@ -41,6 +58,11 @@ class MessageCreateView(generics.CreateAPIView):
             properties={
                 "receiver": openapi.Schema(type=openapi.TYPE_INTEGER, description="ID of the receiver user"),
                 "content": openapi.Schema(type=openapi.TYPE_STRING, description="Message content"),
+                "attachment_ids": openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                    description="IDs of completed attachment uploads"
+                ),
             },
         ),
         responses={
@@ -57,12 +79,20 @@ class MessageCreateView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         sender = self.request.user
-        receiver_id = self.request.data.get('receiver')
-        content = self.request.data.get('content')
+        data = self.request.data
+        receiver_id = data.get('receiver')
+        content = data.get('content')
+        attachment_ids = serializer.validated_data.pop('attachment_ids', [])
 
-        if not receiver_id or not content:
+        if not receiver_id or not (content or attachment_ids):
             raise ValidationError({"receiver": "Receiver is required.", "content": "Content is required."})
 
+        attachments = Attachment.objects.filter(
+            id__in=attachment_ids, uploader=sender, status='complete', message__isnull=True
+        )
+        if len(attachments) != len(set(attachment_ids)):
+            raise ValidationError({"attachment_ids": "Attachments must be completed uploads that are not sent yet."})
+
         try:
             receiver = CustomUser.objects.get(id=receiver_id)
         except CustomUser.DoesNotExist:
@@ -75,27 +105,32 @@ class MessageCreateView(generics.CreateAPIView):
             conversation = Conversation.objects.create()
             conversation.participants.set([sender, receiver])
 
+        with transaction.atomic():
+            # lock the uploads and check again, before the message exists: a
+            # concurrent send may have claimed one of them since the check above
+            claimed = list(attachments.select_for_update().values_list('pk', flat=True))
+            if len(claimed) != len(set(attachment_ids)):
+                raise ValidationError({"attachment_ids": "Attachments must be completed uploads that are not sent yet."})
+            self.message_instance = serializer.save(
+                sender=sender,
+                receiver=receiver,
+                content=content or "",
+                conversation=conversation,
+                is_read=False
+            )
+            Attachment.objects.filter(pk__in=claimed).update(message=self.message_instance)
+
         stream_service = GetStreamService()
         channel = stream_service.create_or_get_channel(sender, receiver)
 
-        stream_service.send_message(channel, sender, receiver, content)
-
-        self.message_instance = serializer.save(
-            sender=sender,
-            receiver=receiver,
-            content=content,
-            conversation=conversation,
-            is_read=False
+        stream_service.send_message(
+            channel, sender, receiver, content or ", ".join(a.filename for a in attachments)
         )
 
-
         message_data = MessageSerializer(self.message_instance).data
 
-        notify_user(
-            user_id=receiver.id,
-            notification_type='new_message',
-            data=message_data  # This is now safe
-        )
+        # live update for open chats; the receiver's badge comes from the post_save signal
+        notify_conversation(conversation.id, 'new_message', message_data)
 
 
     # for HTTP response
@@ -136,22 +171,55 @@ class MessageUpdateView(APIView):
     )    
 
     def patch(self, request, *args, **kwargs):
-        try:
-            message = Message.objects.get(id=kwargs['pk'])
-        except Message.DoesNotExist:
+        content = request.data.get('content')
+
+        message = Message.objects.filter(id=kwargs['pk']).first()
+        if message is None:
             raise NotFound("Message not found.")
 
-        if message.sender != request.user:
+        if message.sender_id != request.user.id:
             raise PermissionDenied("You cannot update this message.")
 
-        content = request.data.get('content')
-        if not content:
+        if not content or not isinstance(content, str):
             raise ValidationError("Content is required.")
 
-        message.content = content
-        message.save()
-
-        message_data = MessageSerializer(message).data
+        if len(content) > settings.MESSAGE_MAX_LENGTH:
+            raise ValidationError(f"Content is longer than {settings.MESSAGE_MAX_LENGTH} characters.")
+
+        # diff before taking the row lock, so other writers of the message
+        # do not wait for it
+        previous = message.content
+        diff = reverse_diff(content, previous)
+
+        with transaction.atomic():
+            message = Message.objects.select_for_update(no_key=True).filter(id=kwargs['pk']).first()
+            if message is None:
+                raise NotFound("Message not found.")
+
+            if message.content != previous:
+                # edited in the meantime; diffs are bounded, so redo it here
+                diff = reverse_diff(content, message.content)
+
+            if content != message.content:
+                edited_at = timezone.now()
+                MessageRevision.objects.create(
+                    message=message, diff=diff, edited_at=edited_at
+                )
+                message.content = content
+                message.edited_at = edited_at
+                message.save(update_fields=['content', 'edited_at'])
+
+                event = {
+                    'message_id': message.id,
+                    'conversation_id': message.conversation_id,
+                    'content': content,
+                    'edited_at': edited_at.isoformat(),
+                }
+                transaction.on_commit(lambda: notify_conversation(
+                    message.conversation_id, 'message_edited', event
+                ), robust=True)
+
+        message_data = MessageSerializer(message, context={'request': request}).data
         return Response({
             "success": True,
             "message": "Message updated successfully.",
@@ -160,11 +228,40 @@ class MessageUpdateView(APIView):
 
 
 
+class MessageRevisionListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Edit history of a message, newest version first. "
+                              "Only participants of the conversation can see it.",
+        responses={
+            200: "List of versions with content and edited_at (null for the original).",
+            404: "Message not found.",
+        }
+    )
+    def get(self, request, pk):
+        message = Message.objects.filter(pk=pk, conversation__participants=request.user).first()
+        if message is None:
+            raise NotFound("Message not found.")
+
+        history = versions(message)
+        return Response({
+            "success": True,
+            "data": [
+                {"version": len(history) - index, **version}
+                for index, version in enumerate(history)
+            ]
+        })
+
+
+
 class MessageDeleteView(APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_description="Delete a message by ID. Only the sender or staff can delete.",
+        operation_description="Delete a message by ID. Only the sender or staff can delete. The message is "
+                              "redacted right away, participants receive a message_deleted event and the row "
+                              "is purged later.",
         responses={
             204: "Message deleted successfully.",
             403: "You are not authorized to delete this message.",
@@ -173,15 +270,30 @@ class MessageDeleteView(APIView):
     )    
 
     def delete(self, request, *args, **kwargs):
-        try:
-            message = Message.objects.get(id=kwargs['pk'])
-        except Message.DoesNotExist:
+        message = Message.objects.filter(id=kwargs['pk']).values(
+            'id', 'sender_id', 'receiver_id', 'conversation_id'
+        ).first()
+        if message is None:
             raise NotFound("Message not found.")
 
-        if message.sender != request.user and not request.user.is_staff:
+        if message['sender_id'] != request.user.id and not request.user.is_staff:
             raise PermissionDenied("You are not authorized to delete this message.")
 
-        message.delete()
+        # leave a redacted tombstone, reactions and notifications go with the purge job
+        deleted_at = timezone.now()
+        deleted = Message.objects.filter(id=message['id']).update(
+            deleted_at=deleted_at, content='', reaction_counts={}
+        )
+        if deleted:
+            transaction.on_commit(lambda: notify_conversation(
+                message['conversation_id'],
+                'message_deleted',
+                {
+                    'message_id': message['id'],
+                    'conversation_id': message['conversation_id'],
+                    'deleted_at': deleted_at.isoformat(),
+                }
+            ), robust=True)
 
         return Response({
             "success": True,
@@ -222,6 +334,7 @@ class MarkMessageReadView(APIView):
 
 class AddReactionView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [ReactionThrottle]
 
     @swagger_auto_schema(
         operation_description="Add or update a reaction (emoji) to a message. Only one reaction per user per message.",
@@ -243,36 +356,22 @@ class AddReactionView(APIView):
         emoji = request.data.get('emoji')
         user = request.user
 
-        try:
-            message = Message.objects.get(id=message_id)
-        except Message.DoesNotExist:
-            raise NotFound("Message not found.")
-
         if not emoji:
             raise ValidationError("Emoji is required.")
+        if len(emoji) > Reaction._meta.get_field('emoji').max_length:
+            raise ValidationError("Emoji is too long.")
 
-        reaction, created = Reaction.objects.get_or_create(
-            message=message, user=user, defaults={'emoji': emoji}
-        )
-
-        data = {
-            'id': str(uuid.uuid4()),
-            'message_id': message.id,
-            'emoji': emoji,
-            'reactor_data': {
-                'full_name': user.full_name,
-            }
-        }
-
-        notify_user(
-            user_id=message.sender.id,
-            notification_type='reaction',
-            data=data
-        )
-
-        if not created:
-            reaction.emoji = emoji
-            reaction.save()
+        # one INSERT ... ON CONFLICT (message, user) DO UPDATE that also checks
+        # the message exists (the foreign key is gone when chat_message is
+        # partitioned) and moves the emoji's count
+        try:
+            with transaction.atomic():
+                reaction_id, previous = upsert_reaction(message_id, user.id, emoji)
+                if previous != emoji:
+                    reaction = Reaction(id=reaction_id, message_id=message_id, user=user, emoji=emoji)
+                    transaction.on_commit(lambda: notify_reaction(reaction), robust=True)
+        except (IntegrityError, Message.DoesNotExist):
+            raise NotFound("Message not found.")
 
         return Response({"success": True, "message": "Reaction added successfully."})
 
@@ -280,6 +379,7 @@ class AddReactionView(APIView):
 
 class RemoveReactionView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [ReactionThrottle]
 
     @swagger_auto_schema(
         operation_description="Remove the current user's reaction from a message. Idempotent: returns 204 even if no reaction exists.",
@@ -297,16 +397,61 @@ class RemoveReactionView(APIView):
         except Message.DoesNotExist:
             raise NotFound("Message not found.")
 
-        # find user's reaction
-        reaction = Reaction.objects.filter(message=message, user=user).first()
-
-        if reaction:
-            reaction.delete()
+        # find user's reaction; locked so a concurrent removal of the same
+        # reaction waits and then finds nothing, instead of counting it twice
+        with transaction.atomic():
+            reaction = Reaction.objects.select_for_update().filter(message=message, user=user).first()
+            if reaction:
+                reaction.delete()
 
         return Response(status=204)
 
 
 
+class ReactionPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+
+class ReactionListView(generics.ListAPIView):
+    """
+    get:
+    List who reacted to a message, optionally only with one emoji (?emoji=👍).
+    Only participants of the message's conversation can see it.
+    """
+    serializer_class = ReactionSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ReactionPagination
+
+    def get_queryset(self):
+        message = Message.objects.filter(
+            pk=self.kwargs['message_id'], conversation__participants=self.request.user
+        ).first()
+        if message is None:
+            raise NotFound("Message not found.")
+
+        queryset = Reaction.objects.filter(message=message).select_related('user').order_by('created_at', 'id')
+        emoji = self.request.query_params.get('emoji')
+        if emoji:
+            queryset = queryset.filter(emoji=emoji)
+        return queryset
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('emoji', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False),
+        ],
+        responses={
+            200: ReactionSerializer(many=True),
+            404: "Message not found.",
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+
 class ConversationListCreateView(generics.ListCreateAPIView):
     """
     get:
@@ -376,9 +521,16 @@ class ConversationDetailView(generics.RetrieveAPIView):
         created_at_start = filter_params.get('created_at_start')
         created_at_end = filter_params.get('created_at_end')
         if created_at_start and created_at_end:
-            queryset = queryset.filter(messages__created_at__range=[created_at_start, created_at_end])
-
-        return queryset        
+            queryset = queryset.filter(messages__timestamp__range=[created_at_start, created_at_end])
+
+        return queryset.distinct().prefetch_related(
+            'messages__attachments',
+            Prefetch(
+                'messages__reactions',
+                queryset=Reaction.objects.filter(user=self.request.user),
+                to_attr='my_reactions'
+            ),
+        )
 
     @swagger_auto_schema(
         operation_description="Retrieve a specific conversation by ID. The current user must be a participant.",
@@ -410,3 +562,336 @@ def get_conversation_with(request, user_email):
     if conversation:
         return Response({'id': conversation.id})
     return Response({'id': None})
+
+
+
+ATTACHMENT_BLOCK_SIZE = 64 * 1024
+
+
+def get_attachment_for(user, pk):
+    """
+    Return the attachment if `user` uploaded it or takes part in the
+    conversation it was sent to.
+    """
+    attachment = Attachment.objects.filter(pk=pk).first()
+    if attachment is None:
+        raise NotFound("Attachment not found.")
+    if attachment.uploader_id == user.id:
+        return attachment
+    if attachment.message_id and Conversation.objects.filter(
+        messages__id=attachment.message_id, messages__deleted_at__isnull=True, participants=user
+    ).exists():
+        return attachment
+    raise NotFound("Attachment not found.")
+
+
+def read_body(stream, length):
+    """
+    Yield the request body in blocks instead of loading it in memory.
+    """
+    remaining = length
+    while remaining > 0:
+        block = stream.read(min(ATTACHMENT_BLOCK_SIZE, remaining))
+        if not block:
+            break
+        remaining -= len(block)
+        yield block
+
+
+def hash_stored(digest, storage, key, start, end):
+    """
+    Feed bytes `start` to `end` of a stored file to `digest`.
+    """
+    if end > start:
+        with storage.open(key) as fh:
+            fh.seek(start)
+            for block in read_body(fh, end - start):
+                digest.update(block)
+    return digest
+
+
+def hashed(chunks, digest):
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+class UploadDigests:
+    """
+    Running SHA-256 of in-progress uploads by the bytes received so far, so
+    each chunk only hashes itself. Kept per process; an upload whose chunks
+    arrive at another process (or after a restart) rebuilds its digest from
+    the stored bytes once. The least recently used entries are evicted past
+    `max_uploads`.
+    """
+
+    def __init__(self, max_uploads=1000):
+        self.max_uploads = max_uploads
+        self.digests = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, pk, received):
+        with self.lock:
+            entry = self.digests.get(pk)
+            if entry is None or entry[0] != received:
+                return None
+            self.digests.move_to_end(pk)
+            return entry[1].copy()
+
+    def put(self, pk, received, digest):
+        with self.lock:
+            self.digests[pk] = (received, digest)
+            self.digests.move_to_end(pk)
+            while len(self.digests) > self.max_uploads:
+                self.digests.popitem(last=False)
+
+    def discard(self, pk):
+        with self.lock:
+            self.digests.pop(pk, None)
+
+
+upload_digests = UploadDigests()
+
+
+def parse_range(header, size):
+    """
+    Parse a single `bytes=start-end` range into inclusive offsets, or return
+    None when it cannot be satisfied.
+    """
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+    if not match or not (match[1] or match[2]):
+        return None
+    if not match[1]:
+        start, end = max(size - int(match[2]), 0), size - 1
+    else:
+        start = int(match[1])
+        end = min(int(match[2]), size - 1) if match[2] else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def stream_range(fh, start, end):
+    try:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = fh.read(min(ATTACHMENT_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        fh.close()
+
+
+
+class AttachmentCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Start a resumable attachment upload. Send the file afterwards in chunks "
+                              "with PATCH to the returned attachment.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=["filename", "size", "sha256"],
+            properties={
+                "filename": openapi.Schema(type=openapi.TYPE_STRING),
+                "content_type": openapi.Schema(type=openapi.TYPE_STRING),
+                "size": openapi.Schema(type=openapi.TYPE_INTEGER, description="File size in bytes"),
+                "sha256": openapi.Schema(type=openapi.TYPE_STRING, description="Hex SHA-256 of the whole file"),
+            },
+        ),
+        responses={
+            201: openapi.Response("Upload created", AttachmentSerializer),
+            400: "Bad Request",
+        }
+    )
+    def post(self, request):
+        serializer = AttachmentSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+
+        size = serializer.validated_data['size']
+        if not 0 < size <= settings.ATTACHMENT_MAX_SIZE:
+            raise ValidationError({"size": f"Size must be between 1 and {settings.ATTACHMENT_MAX_SIZE} bytes."})
+        sha256 = serializer.validated_data['sha256'].lower()
+        if not re.fullmatch(r'[0-9a-f]{64}', sha256):
+            raise ValidationError({"sha256": "Expected a hex encoded SHA-256 digest."})
+
+        serializer.save(uploader=request.user, sha256=sha256, storage_key=Attachment.new_storage_key())
+        return Response({
+            "success": True,
+            "data": serializer.data
+        }, status=status.HTTP_201_CREATED)
+
+
+
+class AttachmentUploadView(APIView):
+    """
+    get:
+    Attachment metadata; the Upload-Offset header tells a client where to resume.
+
+    patch:
+    Append a chunk. The raw body is written to a part file as it is read and
+    hashed on the way, then appended to the upload at the offset given in the
+    Upload-Offset header (which must match the bytes received so far). The
+    checksum is verified once the last chunk arrives.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        attachment = get_attachment_for(request.user, pk)
+        data = AttachmentSerializer(attachment, context={'request': request}).data
+        return Response(data, headers={'Upload-Offset': str(attachment.received)})
+
+    @swagger_auto_schema(
+        operation_description="Upload the next chunk of an attachment as the raw request body.",
+        manual_parameters=[
+            openapi.Parameter('Upload-Offset', openapi.IN_HEADER, type=openapi.TYPE_INTEGER, required=True),
+        ],
+        responses={
+            200: "Chunk stored.",
+            400: "Bad Request",
+            404: "Attachment not found.",
+            409: "Offset does not match the bytes received so far.",
+            422: "Checksum mismatch, the upload has to start over.",
+        }
+    )
+    def patch(self, request, pk):
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            raise ValidationError("Upload-Offset header is required.")
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if not 0 < length <= settings.ATTACHMENT_MAX_CHUNK_SIZE:
+            raise ValidationError(f"Chunks must be between 1 and {settings.ATTACHMENT_MAX_CHUNK_SIZE} bytes.")
+
+        storage = get_attachment_storage()
+        upload = Attachment.objects.filter(pk=pk, uploader=request.user).values_list(
+            'received', 'storage_key', 'status', 'size'
+        ).first()
+        if upload is None:
+            raise NotFound("Attachment not found.")
+        hashed_up_to, key, upload_status, size = upload
+        if upload_status == 'complete' or offset != hashed_up_to:
+            return self.offset_conflict(hashed_up_to)
+        if offset + length > size:
+            raise ValidationError("Chunk exceeds the declared file size.")
+        # digest of the bytes received so far; they no longer change, so a
+        # digest this process does not have is rebuilt before taking the lock
+        digest = upload_digests.get(pk, hashed_up_to)
+        if digest is None:
+            digest = hash_stored(hashlib.sha256(), storage, key, 0, hashed_up_to)
+
+        # the body is read into a part file first, so a slow client does not
+        # hold the row lock; the lock is only taken to move it into place
+        part = f"{key}.{uuid4().hex}.part"
+        try:
+            chunk_digest = digest.copy()
+            if storage.append(part, hashed(read_body(request.stream, length), chunk_digest)) != length:
+                raise ValidationError("Incomplete chunk, retry from the same offset.")
+
+            with transaction.atomic():
+                attachment = Attachment.objects.select_for_update().filter(pk=pk, uploader=request.user).first()
+                if attachment is None:
+                    raise NotFound("Attachment not found.")
+                if attachment.status == 'complete' or offset != attachment.received:
+                    return self.offset_conflict(attachment.received)
+
+                if attachment.received == hashed_up_to:
+                    digest = chunk_digest
+                else:
+                    # the upload restarted since the digest was taken
+                    digest = hash_stored(hashlib.sha256(), storage, key, 0, attachment.received)
+                    hash_stored(digest, storage, part, 0, length)
+
+                # drop the tail of a chunk that was interrupted earlier
+                if storage.size(key) != attachment.received:
+                    storage.truncate(key, attachment.received)
+
+                with storage.open(part) as fh:
+                    received = storage.append(key, read_body(fh, length))
+                if received != offset + length:
+                    storage.truncate(key, attachment.received)
+                    raise ValidationError("Incomplete chunk, retry from the same offset.")
+
+                attachment.received = received
+                if received == attachment.size:
+                    upload_digests.discard(pk)
+                    if digest.hexdigest() != attachment.sha256:
+                        storage.delete(key)
+                        attachment.received = 0
+                        attachment.save(update_fields=['received'])
+                        return Response({
+                            "success": False,
+                            "message": "Checksum mismatch, the upload has to start over.",
+                            "offset": 0
+                        }, status=status.HTTP_422_UNPROCESSABLE_ENTITY, headers={'Upload-Offset': '0'})
+                    attachment.status = 'complete'
+                else:
+                    transaction.on_commit(lambda: upload_digests.put(pk, received, digest))
+                attachment.save(update_fields=['received', 'status'])
+        finally:
+            storage.delete(part)
+
+        return Response({
+            "success": True,
+            "offset": attachment.received,
+            "status": attachment.status
+        }, headers={'Upload-Offset': str(attachment.received)})
+
+    @staticmethod
+    def offset_conflict(received):
+        return Response({
+            "success": False,
+            "message": "Offset does not match the bytes received so far.",
+            "offset": received
+        }, status=status.HTTP_409_CONFLICT, headers={'Upload-Offset': str(received)})
+
+
+
+class AttachmentDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Download an attachment. Supports single byte ranges via the Range header.",
+        responses={
+            200: "File content.",
+            206: "Partial content.",
+            404: "Attachment not found.",
+            416: "Range not satisfiable.",
+        }
+    )
+    def get(self, request, pk):
+        attachment = get_attachment_for(request.user, pk)
+        if attachment.status != 'complete':
+            raise NotFound("Attachment upload is not complete.")
+
+        fh = get_attachment_storage().open(attachment.storage_key)
+        range_header = request.headers.get('Range')
+        if not range_header:
+            response = FileResponse(
+                fh, as_attachment=True, filename=attachment.filename, content_type=attachment.content_type
+            )
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+        byte_range = parse_range(range_header, attachment.size)
+        if byte_range is None:
+            fh.close()
+            return HttpResponse(
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={'Content-Range': f'bytes */{attachment.size}'}
+            )
+
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            stream_range(fh, start, end),
+            status=status.HTTP_206_PARTIAL_CONTENT,
+            content_type=attachment.content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{attachment.size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+        response['Content-Disposition'] = content_disposition_header(True, attachment.filename)
+        return response
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import RequestProfile
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'method', 'view', 'status_code', 'duration_ms', 'user', 'created_at')
+    list_filter = ('kind', 'view', 'created_at')
+    search_fields = ('path', 'view')
+    date_hierarchy = 'created_at'
+    readonly_fields = [field.name for field in RequestProfile._meta.fields]
@@ -0,0 +1,51 @@
+from django.db import connections
+
+from .metrics import Counter, Gauge
+
+# psycopg pool stats that are current levels; the other numeric stats are
+# running totals since the pool opened
+POOL_GAUGES = {'pool_min', 'pool_max', 'pool_size', 'pool_available', 'requests_waiting', 'avg_wait_ms'}
+
+
+def pool_stats():
+    """
+    Return the psycopg pool counters for every database alias whose pool is
+    already open. `requests_wait_ms` is the total time spent waiting for a
+    connection checkout; `avg_wait_ms` is that time per checkout.
+    """
+    stats = {}
+    for connection in connections.all(initialized_only=True):
+        # connection.pool would create (and later open) a pool for an alias
+        # this process never used
+        pool = getattr(connection, '_connection_pools', {}).get(connection.alias)
+        if pool is None:
+            continue
+        pool_data = pool.get_stats()
+        requests = pool_data.get('requests_num', 0)
+        pool_data['avg_wait_ms'] = pool_data.get('requests_wait_ms', 0) / requests if requests else 0
+        stats[connection.alias] = pool_data
+    return stats
+
+
+def pool_metrics():
+    """
+    Scrape-time metrics for pool_stats(), labelled by alias: gauges for
+    current levels, counters (db_pool_<name>_total) for running totals.
+    """
+    metrics = {}
+    for alias, stats in pool_stats().items():
+        for name, value in stats.items():
+            if not isinstance(value, (int, float)):
+                continue
+            if name not in metrics:
+                if name in POOL_GAUGES:
+                    metrics[name] = Gauge(f"db_pool_{name}", f"psycopg pool {name}", ['alias'], registry=None)
+                else:
+                    metrics[name] = Counter(
+                        f"db_pool_{name}_total", f"psycopg pool {name} since the pool opened", ['alias'], registry=None
+                    )
+            if name in POOL_GAUGES:
+                metrics[name].set(value, alias=alias)
+            else:
+                metrics[name].inc(value, alias=alias)
+    return list(metrics.values())
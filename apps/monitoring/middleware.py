@@ -0,0 +1,97 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .metrics import Counter, Histogram
+from .tracing import extract, tracer
+
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', "HTTP requests served", ['view', 'method', 'status']
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', "HTTP request latency", ['view', 'method']
+)
+HTTP_REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', "Database queries per HTTP request", ['view', 'method'], buckets=QUERY_BUCKETS
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_duration_seconds', "Time spent in database queries per HTTP request", ['view', 'method']
+)
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting queries and the time spent in them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def view_label(request):
+    """
+    The URL name of the matched view, so label values stay bounded no matter
+    which paths clients request.
+    """
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, status and database query count/time per view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view, method = view_label(request), request.method
+        HTTP_REQUESTS.inc(view=view, method=method, status=response.status_code)
+        HTTP_REQUEST_SECONDS.observe(duration, view=view, method=method)
+        HTTP_REQUEST_QUERIES.observe(queries.count, view=view, method=method)
+        HTTP_REQUEST_DB_SECONDS.observe(queries.duration, view=view, method=method)
+        return response
+
+
+class TracingMiddleware:
+    """
+    Run each request in a span that continues the trace from an incoming
+    `traceparent` header, and return the span's traceparent to the client.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        context = extract({'traceparent': request.headers.get('traceparent')})
+        with tracer.start_as_current_span(
+            f"HTTP {request.method}", context=context, attributes={'http.method': request.method}
+        ) as span:
+            response = self.get_response(request)
+            span.update_name(f"HTTP {request.method} {view_label(request)}")
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.set_status('ERROR')
+        response['traceparent'] = span.get_span_context().to_traceparent()
+        return response
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    KIND_CHOICES = [
+        ("cprofile", "cProfile (requested)"),
+        ("slow", "Stack samples (slow request)"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view = models.CharField(max_length=200)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    # pstats report for cprofile, "frame;frame;frame count" folded stacks for slow
+    report = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms, {self.kind})"
@@ -0,0 +1,175 @@
+"""
+Opt-in request profiling, stored as RequestProfile rows (browse them in the
+admin).
+
+- A request with `X-Profile: <PROFILING_TOKEN>`, or `?profile=1` from a
+  staff user, runs under cProfile; the pstats report is stored and its id
+  returned in the `X-Profile-Id` response header.
+- With SLOW_REQUEST_THRESHOLD_MS set, a watchdog thread samples the stack of
+  every request that runs past the threshold each
+  SLOW_REQUEST_SAMPLE_INTERVAL_MS, and the request's samples are stored as
+  folded stacks ("frame;frame;frame count", flamegraph/speedscope input).
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as Tally
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .metrics import Counter
+from .middleware import view_label
+from .models import RequestProfile
+
+REQUEST_PROFILES = Counter('request_profiles_total', "Request profiles stored", ['kind'])
+
+REPORT_LINES = 60
+
+
+def fold(frame):
+    """
+    One folded-stack line for `frame`, outermost call first.
+    """
+    return ';'.join(
+        f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+        for entry in traceback.extract_stack(frame)
+    )
+
+
+def format_folded(stacks):
+    return '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+
+class SlowRequestSampler:
+    """
+    Samples the stacks of request threads that have been running for longer
+    than `threshold` seconds, every `interval` seconds.
+    """
+
+    def __init__(self, threshold, interval):
+        self.threshold = threshold
+        self.interval = interval
+        self.active = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def begin(self):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name='slow-request-sampler', daemon=True)
+                    self.thread.start()
+        with self.lock:
+            self.active[threading.get_ident()] = (time.perf_counter(), Tally())
+
+    def end(self):
+        """
+        Stop sampling the calling thread and return its samples.
+        """
+        with self.lock:
+            return self.active.pop(threading.get_ident(), (None, Tally()))[1]
+
+    def sample(self):
+        now = time.perf_counter()
+        with self.lock:
+            overdue = [ident for ident, (start, _) in self.active.items() if now - start >= self.threshold]
+        if not overdue:
+            return
+        frames = sys._current_frames()
+        for ident in overdue:
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            stack = fold(frame)
+            with self.lock:
+                if ident in self.active:
+                    self.active[ident][1][stack] += 1
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.sample()
+
+
+def is_staff(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    # DRF views authenticate later, so check the JWT here
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return bool(result and result[0].is_staff)
+
+
+def profiling_requested(request):
+    token = settings.PROFILING_TOKEN
+    if token and constant_time_compare(request.headers.get('X-Profile', ''), token):
+        return True
+    return 'profile' in request.GET and is_staff(request)
+
+
+def store_profile(request, response, kind, duration, report):
+    user = getattr(request, 'user', None)
+    REQUEST_PROFILES.inc(kind=kind)
+    return RequestProfile.objects.create(
+        kind=kind,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        view=view_label(request)[:200],
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        user=user if user is not None and user.is_authenticated else None,
+        report=report,
+    )
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        self.sampler = SlowRequestSampler(
+            threshold / 1000, settings.SLOW_REQUEST_SAMPLE_INTERVAL_MS / 1000
+        ) if threshold else None
+
+    def __call__(self, request):
+        if profiling_requested(request):
+            return self.profile(request)
+        if self.sampler is None:
+            return self.get_response(request)
+
+        self.sampler.begin()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = self.sampler.end()
+        duration = time.perf_counter() - start
+        if stacks and duration >= self.sampler.threshold:
+            store_profile(request, response, 'slow', duration, format_folded(stacks))
+        return response
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - start
+
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(REPORT_LINES)
+        profile = store_profile(request, response, 'cprofile', duration, report.getvalue())
+        response['X-Profile-Id'] = str(profile.id)
+        return response
@@ -0,0 +1,268 @@
+import json
+import logging
+import time
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.monitoring.db import pool_metrics, pool_stats
+from config.logs import LOG_RECORDS_DROPPED, JSONFormatter, NonBlockingQueueHandler, SamplingFilter
+from apps.monitoring.metrics import Counter, Histogram, Registry, timed
+from apps.monitoring.middleware import HTTP_REQUEST_QUERIES, HTTP_REQUESTS
+from apps.monitoring.models import RequestProfile
+from apps.monitoring.tracing import SpanContext, get_exporter, parse_traceparent, tracer
+
+User = get_user_model()
+
+
+class DatabasePoolStatsTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass1234', is_staff=True)
+        self.user = User.objects.create_user(email='user@example.com', password='pass1234')
+        self.url = reverse('db-pool-stats')
+
+    def pooled_connections(self):
+        pool = MagicMock()
+        pool.get_stats.return_value = {'pool_size': 4, 'requests_num': 4, 'requests_wait_ms': 10}
+        # both aliases share the backend's pool registry; replica_0 has no pool yet
+        pools = {'default': pool}
+        return [
+            MagicMock(alias='default', _connection_pools=pools),
+            MagicMock(alias='replica_0', _connection_pools=pools),
+        ]
+
+    def test_pool_stats_include_average_checkout_wait(self):
+        with patch('apps.monitoring.db.connections') as connections:
+            connections.all.return_value = self.pooled_connections()
+            stats = pool_stats()
+
+        self.assertEqual(list(stats), ['default'])
+        self.assertEqual(stats['default']['avg_wait_ms'], 2.5)
+        connections.all.assert_called_once_with(initialized_only=True)
+
+    def test_pool_totals_are_exported_as_counters(self):
+        with patch('apps.monitoring.db.connections') as connections:
+            connections.all.return_value = self.pooled_connections()
+            rendered = ''.join(metric.render() for metric in pool_metrics())
+
+        self.assertIn('# TYPE db_pool_pool_size gauge', rendered)
+        self.assertIn('# TYPE db_pool_requests_wait_ms_total counter', rendered)
+        self.assertIn('db_pool_requests_wait_ms_total{alias="default"} 10', rendered)
+
+    def test_staff_can_read_pool_stats(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('pools', response.data)
+
+    def test_non_staff_cannot_read_pool_stats(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_renders_labelled_series(self):
+        counter = Counter('jobs_total', "Jobs run", ['queue'], registry=self.registry)
+        counter.inc(queue='default')
+        counter.inc(2, queue='mail "urgent"')
+
+        text = self.registry.render()
+        self.assertIn('# TYPE jobs_total counter', text)
+        self.assertIn('jobs_total{queue="default"} 1', text)
+        self.assertIn('jobs_total{queue="mail \\"urgent\\""} 2', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('latency_seconds', "Latency", buckets=(0.1, 1), registry=self.registry)
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+
+        text = self.registry.render()
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count 3', text)
+
+    def test_unlabelled_series_start_at_zero(self):
+        Counter('idle_total', "Never incremented", registry=self.registry)
+        self.assertIn('idle_total 0', self.registry.render())
+
+    def test_timed_counts_errors(self):
+        histogram = Histogram('call_seconds', "Calls", ['method'], registry=self.registry)
+        errors = Counter('call_errors_total', "Failed calls", ['method'], registry=self.registry)
+
+        @timed(histogram, errors=errors, method='boom')
+        def boom():
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            boom()
+        self.assertEqual(histogram.count(method='boom'), 1)
+        self.assertEqual(errors.value(method='boom'), 1)
+
+    def test_labels_must_match(self):
+        counter = Counter('strict_total', "Strict", ['view'], registry=self.registry)
+        with self.assertRaises(ValueError):
+            counter.inc(path='/x')
+
+
+@override_settings(METRICS_TOKEN='scrape-me')
+class MetricsEndpointTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass1234', is_staff=True)
+        self.user = User.objects.create_user(email='user@example.com', password='pass1234')
+        self.url = reverse('metrics')
+
+    def test_requests_are_recorded_per_view(self):
+        before = HTTP_REQUESTS.value(view='db-pool-stats', method='GET', status=200)
+        self.client.force_authenticate(user=self.staff)
+        self.client.get(reverse('db-pool-stats'))
+
+        self.assertEqual(HTTP_REQUESTS.value(view='db-pool-stats', method='GET', status=200), before + 1)
+        self.assertGreater(HTTP_REQUEST_QUERIES.count(view='db-pool-stats', method='GET'), 0)
+
+    def test_staff_can_scrape(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'# TYPE http_request_duration_seconds histogram', response.content)
+        self.assertIn(b'log_records_dropped_total 0', response.content)
+
+    def test_scraper_token(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_regular_users_cannot_scrape(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class StructuredLoggingTests(SimpleTestCase):
+    def record(self, msg='Event', level=logging.INFO, **extra):
+        record = logging.LogRecord('apps.chat', level, __file__, 1, msg, (), None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_lines_carry_extra_fields(self):
+        entry = json.loads(JSONFormatter().format(self.record('Sent %s', message_id=7)))
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['message_id'], 7)
+
+    def test_sampling_keeps_one_in_n_and_all_warnings(self):
+        sampler = SamplingFilter(rate=0.25)
+        kept = [sampler.filter(self.record(sample=True)) for _ in range(8)]
+        self.assertEqual(kept.count(True), 2)
+        self.assertTrue(sampler.filter(self.record(level=logging.WARNING, sample=True)))
+        self.assertTrue(sampler.filter(self.record()))
+
+    def test_queue_handler_writes_from_listener(self):
+        stream = StringIO()
+        handler = NonBlockingQueueHandler(stream=stream)
+        handler.setFormatter(JSONFormatter())
+        handler.handle(self.record('Hello'))
+        handler.close()
+        self.assertEqual(json.loads(stream.getvalue())['message'], 'Hello')
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = NonBlockingQueueHandler(stream=StringIO(), maxsize=1)
+        handler.listener.stop()
+        before = LOG_RECORDS_DROPPED.value()
+        handler.handle(self.record())
+        handler.handle(self.record())
+        self.assertEqual(LOG_RECORDS_DROPPED.value(), before + 1)
+        handler.close()
+
+
+@override_settings(TRACING_EXPORTER='apps.monitoring.tracing.InMemoryExporter', TRACING_SAMPLE_RATE=1.0)
+class TracingTests(APITestCase):
+    def setUp(self):
+        self.exporter = get_exporter()
+        self.exporter.clear()
+
+    def test_traceparent_round_trip(self):
+        context = SpanContext('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7')
+        self.assertEqual(parse_traceparent(context.to_traceparent()), context)
+        self.assertIsNone(parse_traceparent('00-00000000000000000000000000000000-00f067aa0ba902b7-01'))
+        self.assertIsNone(parse_traceparent('garbage'))
+
+    def test_nested_spans_share_the_trace(self):
+        with tracer.start_as_current_span('outer') as outer:
+            with tracer.start_as_current_span('inner') as inner:
+                pass
+        self.assertEqual(inner.context.trace_id, outer.context.trace_id)
+        self.assertEqual(inner.parent_id, outer.context.span_id)
+        self.assertEqual([s.name for s in self.exporter.get_finished_spans()], ['inner', 'outer'])
+
+    def test_unsampled_traces_are_not_exported(self):
+        with self.settings(TRACING_SAMPLE_RATE=0):
+            with tracer.start_as_current_span('dropped'):
+                pass
+        self.assertEqual(self.exporter.get_finished_spans(), [])
+
+    def test_request_continues_incoming_trace(self):
+        staff = User.objects.create_user(email='staff@example.com', password='pass1234', is_staff=True)
+        self.client.force_authenticate(user=staff)
+        incoming = '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'
+        response = self.client.get(reverse('db-pool-stats'), HTTP_TRACEPARENT=incoming)
+
+        span = self.exporter.get_finished_spans()[-1]
+        self.assertEqual(span.name, 'HTTP GET db-pool-stats')
+        self.assertEqual(span.parent_id, '00f067aa0ba902b7')
+        self.assertEqual(parse_traceparent(response['traceparent']), span.context)
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='pass1234', is_staff=True)
+        self.user = User.objects.create_user(email='user@example.com', password='pass1234')
+        self.url = reverse('db-pool-stats')
+
+    def get_as(self, user, url):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_staff_can_profile_a_request(self):
+        response = self.get_as(self.staff, f'{self.url}?profile=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        profile = RequestProfile.objects.get(id=response['X-Profile-Id'])
+        self.assertEqual(profile.kind, 'cprofile')
+        self.assertEqual(profile.view, 'db-pool-stats')
+        self.assertEqual(profile.user, self.staff)
+        self.assertIn('monitoring/views.py', profile.report)
+
+    def test_profile_flag_is_ignored_for_regular_users(self):
+        response = self.get_as(self.user, f'{self.url}?profile=1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILING_TOKEN='secret')
+    def test_profiling_token_header(self):
+        self.client.get(self.url, HTTP_X_PROFILE='secret')
+        self.assertEqual(RequestProfile.objects.get().status_code, 401)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=20, SLOW_REQUEST_SAMPLE_INTERVAL_MS=2)
+    def test_slow_requests_are_sampled(self):
+        def slow_stats():
+            time.sleep(0.1)
+            return {}
+
+        self.client.force_authenticate(user=self.staff)
+        with patch('apps.monitoring.views.pool_stats', side_effect=slow_stats):
+            self.client.get(self.url)
+        self.client.get(reverse('metrics'))
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.kind, 'slow')
+        self.assertGreaterEqual(profile.duration_ms, 100)
+        self.assertIn('slow_stats (tests.py', profile.report)
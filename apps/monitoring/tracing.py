@@ -0,0 +1,235 @@
+"""
+Minimal tracing with an OpenTelemetry-shaped API.
+
+A trace follows one message from the HTTP request through the post_save
+signal, GetStream calls and the channel layer into the consumer that writes
+it to the socket. Context crosses process boundaries as a W3C `traceparent`
+value: in HTTP headers, and in channel layer events next to a `published_at`
+timestamp so the consumer can measure end-to-end delivery.
+
+    with tracer.start_as_current_span('getstream.send_message', attributes={'user_id': 1}):
+        ...
+
+Finished, sampled spans go to the exporter named by settings.TRACING_EXPORTER
+(NoopExporter by default, InMemoryExporter in tests, LoggingExporter to emit
+one log record per span).
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = 'traceparent'
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    def to_traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value):
+    """
+    Return the SpanContext encoded in a traceparent value, or None if it is
+    missing or malformed.
+    """
+    try:
+        version, trace_id, span_id, flags = value.strip().split('-')
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except (AttributeError, ValueError):
+        return None
+    if version != '00' or len(trace_id) != 32 or len(span_id) != 16 or not int(trace_id, 16):
+        return None
+    return SpanContext(trace_id, span_id, sampled)
+
+
+class Span:
+    def __init__(self, name, context, parent_id=None, attributes=None, start_time=None):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_time = start_time or time.time_ns()
+        self.end_time = None
+        self.status = 'UNSET'
+        self.events = []
+
+    def get_span_context(self):
+        return self.context
+
+    def is_recording(self):
+        return self.end_time is None and self.context.sampled
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        self.attributes.update(attributes)
+
+    def set_status(self, status, description=None):
+        self.status = status
+        if description:
+            self.attributes['status_description'] = description
+
+    def record_exception(self, exception):
+        self.events.append({'name': 'exception', 'type': type(exception).__name__, 'message': str(exception)})
+
+    def update_name(self, name):
+        self.name = name
+
+    @property
+    def duration(self):
+        """
+        Seconds between start and end.
+        """
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+    def end(self, end_time=None):
+        if self.end_time is not None:
+            return
+        self.end_time = end_time or time.time_ns()
+        if self.context.sampled:
+            get_exporter().export([self])
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.context.trace_id,
+            'span_id': self.context.span_id,
+            'parent_id': self.parent_id,
+            'start_time': self.start_time,
+            'duration_ms': round(self.duration * 1000, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+            'events': self.events,
+        }
+
+
+_current_span = ContextVar('current_span', default=None)
+
+
+def get_current_span():
+    return _current_span.get()
+
+
+def new_id(bits):
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Tracer:
+    def start_span(self, name, context=None, attributes=None, start_time=None):
+        """
+        Start a span under `context` (a SpanContext, e.g. from extract()) or
+        under the current span; without either it starts a new trace.
+        """
+        parent = context
+        if parent is None and get_current_span() is not None:
+            parent = get_current_span().get_span_context()
+        if parent is None:
+            span_context = SpanContext(new_id(128), new_id(64), random.random() < settings.TRACING_SAMPLE_RATE)
+            return Span(name, span_context, None, attributes, start_time)
+        span_context = SpanContext(parent.trace_id, new_id(64), parent.sampled)
+        return Span(name, span_context, parent.span_id, attributes, start_time)
+
+    @contextmanager
+    def start_as_current_span(self, name, context=None, attributes=None, start_time=None):
+        span = self.start_span(name, context, attributes, start_time)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as exc:
+            span.record_exception(exc)
+            span.set_status('ERROR', str(exc))
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+
+tracer = Tracer()
+
+
+def traced(name, **attributes):
+    """
+    Decorator running the function inside a span.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name, attributes=attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inject(carrier):
+    """
+    Write the current span's traceparent into the `carrier` dict.
+    """
+    span = get_current_span()
+    if span is not None:
+        carrier[TRACEPARENT] = span.get_span_context().to_traceparent()
+    return carrier
+
+
+def extract(carrier):
+    return parse_traceparent(carrier.get(TRACEPARENT)) if carrier else None
+
+
+class NoopExporter:
+    def export(self, spans):
+        pass
+
+
+class InMemoryExporter:
+    """
+    Keeps finished spans in a list, for tests.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def export(self, spans):
+        with self.lock:
+            self.spans.extend(spans)
+
+    def get_finished_spans(self):
+        with self.lock:
+            return list(self.spans)
+
+    def clear(self):
+        with self.lock:
+            self.spans.clear()
+
+
+class LoggingExporter:
+    def export(self, spans):
+        for span in spans:
+            logger.info("span %s", span.name, extra={'span': span.to_dict()})
+
+
+_exporters = {}
+
+
+def get_exporter():
+    """
+    The exporter instance for settings.TRACING_EXPORTER, created once per path.
+    """
+    path = settings.TRACING_EXPORTER
+    if path not in _exporters:
+        _exporters[path] = import_string(path)()
+    return _exporters[path]
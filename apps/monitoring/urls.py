@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import DatabasePoolStatsView, MetricsView
+
+urlpatterns = [
+    path('monitoring/db-pool/', DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+]
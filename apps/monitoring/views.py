@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils.crypto import constant_time_compare
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.permissions import BasePermission, IsAdminUser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+
+from .db import pool_stats
+from .metrics import REGISTRY
+
+
+class DatabasePoolStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description="Connection pool usage per database alias (staff only).",
+        responses={200: "Pool statistics", 403: "Forbidden"}
+    )
+    def get(self, request):
+        return Response({'pools': pool_stats()})
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        # error responses (e.g. 403) are dicts
+        return '\n'.join(f"# {key}: {value}" for key, value in data.items()).encode(self.charset)
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """
+    Lets scrapers authenticate with `Authorization: Bearer <METRICS_TOKEN>`
+    instead of a user JWT.
+    """
+
+    def authenticate(self, request):
+        token = settings.METRICS_TOKEN
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if token and constant_time_compare(header, f"Bearer {token}"):
+            return AnonymousUser(), 'metrics'
+        return None
+
+
+class IsMetricsScraper(BasePermission):
+    def has_permission(self, request, view):
+        return request.auth == 'metrics' or bool(request.user and request.user.is_staff)
+
+
+class MetricsView(APIView):
+    authentication_classes = [MetricsTokenAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    permission_classes = [IsMetricsScraper]
+    renderer_classes = [PrometheusRenderer]
+
+    @swagger_auto_schema(
+        operation_description="Metrics in the Prometheus text format (staff or METRICS_TOKEN only).",
+        responses={200: "Metrics", 403: "Forbidden"}
+    )
+    def get(self, request):
+        return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,78 @@
+"""
+Circuit breaker for channel layer publishes.
+
+After `failure_threshold` consecutive failures (errors or timeouts) the
+breaker opens and publishes are skipped without touching the layer, so a
+stalled Redis costs a request nothing. After `reset_timeout` seconds one
+publish is let through as a probe: success closes the breaker, failure opens
+it again. A probe that never reports back (e.g. its task was cancelled) does
+not hold the breaker half open: another probe is let through after
+`reset_timeout`. Each process has its own breaker.
+"""
+import logging
+import threading
+import time
+
+from apps.monitoring.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+# gauge values, so alerts can use e.g. circuit_breaker_state > 0
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = Gauge('circuit_breaker_state', "Circuit breaker state (0 closed, 1 half open, 2 open)", ['name'])
+BREAKER_REJECTED = Counter('circuit_breaker_rejected_total', "Calls skipped while the breaker was open", ['name'])
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+        BREAKER_STATE.set(STATE_VALUES[CLOSED], name=name)
+
+    def set_state(self, state):
+        if state != self.state:
+            logger.warning("Circuit breaker %s is %s", self.name, state, extra={'breaker': self.name, 'state': state})
+        self.state = state
+        BREAKER_STATE.set(STATE_VALUES[state], name=self.name)
+
+    def allow(self):
+        """
+        Whether a call may go ahead. While half open only the probe call is
+        allowed, or a new probe once the last one is `reset_timeout` old.
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                # opened_at doubles as the time the probe was let through
+                self.opened_at = now
+                self.set_state(HALF_OPEN)
+                return True
+        BREAKER_REJECTED.inc(name=self.name)
+        return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self.set_state(CLOSED)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.set_state(OPEN)
+
+    def reset(self):
+        with self.lock:
+            self.failures = 0
+            self.set_state(CLOSED)
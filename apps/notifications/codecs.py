@@ -0,0 +1,118 @@
+"""
+Wire formats for NotificationConsumer.
+
+JSON (no subprotocol) is the default: one event per text frame, unchanged
+keys. Batching codecs put a list of up to WS_BATCH_SIZE queued events in
+each frame: `letschat.json-batch.v1` as a JSON array, `letschat.msgpack.v1`
+as binary MessagePack with well-known keys shortened (see SHORT_KEYS).
+Messages the client sends are decoded the same way, so a msgpack client can
+use either short or long keys.
+"""
+import json
+
+import msgpack
+
+SHORT_KEYS = {
+    'type': 't',
+    'id': 'i',
+    'action': 'a',
+    'message_id': 'm',
+    'notification_id': 'n',
+    'notification_ids': 'ns',
+    'notifications': 'nl',
+    'conversation_id': 'c',
+    'user_id': 'u',
+    'sender_id': 'si',
+    'sender': 's',
+    'receiver': 'r',
+    'sender_data': 'sd',
+    'reactor_data': 'rd',
+    'name': 'nm',
+    'full_name': 'fn',
+    'userName': 'un',
+    'content': 'x',
+    'timestamp': 'ts',
+    'timeAgo': 'ta',
+    'edited_at': 'ea',
+    'deleted_at': 'da',
+    'is_read': 'ir',
+    'unread': 'ur',
+    'unread_count': 'uc',
+    'emoji': 'e',
+    'actor_count': 'ac',
+    'actorCount': 'aC',
+    'messageId': 'mI',
+    'reaction_counts': 'rc',
+    'my_reaction': 'mr',
+    'attachments': 'at',
+    'count': 'k',
+    'code': 'cd',
+    'retry_after': 'ra',
+}
+LONG_KEYS = {short_key: long_key for long_key, short_key in SHORT_KEYS.items()}
+
+# keys whose values are free-form maps (e.g. emoji -> count) and keep their keys
+OPAQUE_KEYS = {'reaction_counts'}
+
+
+def rename_keys(value, mapping, opaque=OPAQUE_KEYS):
+    if type(value) is list:
+        return [rename_keys(item, mapping, opaque) for item in value]
+    # most values are scalars, skip the call for them
+    return {
+        mapping.get(key, key): (
+            rename_keys(item, mapping, opaque) if type(item) in (dict, list) and key not in opaque else item
+        )
+        for key, item in value.items()
+    } if type(value) is dict else value
+
+
+class JSONCodec:
+    subprotocol = None
+    binary = False
+    batching = False
+
+    def encode(self, batch):
+        """
+        Return the frames for `batch`, as (text_data, bytes_data) pairs.
+        """
+        return [(json.dumps(payload), None) for payload in batch]
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class JSONBatchCodec(JSONCodec):
+    subprotocol = 'letschat.json-batch.v1'
+    batching = True
+
+    def encode(self, batch):
+        return [(json.dumps(batch), None)]
+
+
+class MsgpackCodec:
+    subprotocol = 'letschat.msgpack.v1'
+    binary = True
+    batching = True
+
+    def encode(self, batch):
+        return [(None, msgpack.packb(rename_keys(batch, SHORT_KEYS)))]
+
+    def decode(self, data):
+        # client messages use short keys too; the opaque maps are already long here
+        return rename_keys(msgpack.unpackb(data), LONG_KEYS, opaque={SHORT_KEYS[key] for key in OPAQUE_KEYS})
+
+
+CODECS = [MsgpackCodec(), JSONBatchCodec()]
+
+
+def negotiate(subprotocols):
+    """
+    Pick the codec for the subprotocols the client offered, in its order of
+    preference; JSON when none is supported.
+    """
+    for subprotocol in subprotocols:
+        for codec in CODECS:
+            if codec.subprotocol == subprotocol:
+                return codec
+    return JSONCodec()
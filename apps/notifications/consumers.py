@@ -1,8 +1,40 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.utils import timezone
+from apps.chat.models import Conversation
+from apps.chat.ratelimit import consume
+from apps.monitoring.metrics import Counter, Gauge, Histogram
+from apps.monitoring.tracing import extract, tracer
+from apps.notifications.codecs import negotiate
 from apps.notifications.models import Notification
-from apps.notifications.utils import mark_notifications_as_seen
+from apps.notifications.outbound import OutboundQueue
+from apps.notifications.utils import apublish, channel_event, conversation_group, mark_notifications_as_seen
+
+logger = logging.getLogger(__name__)
+
+# payload key carrying an event's trace context through the outbound queue,
+# removed before the payload is sent
+TRACE_KEY = '_trace'
+
+# actions clients may send; anything else is counted as 'unknown'
+ACTIONS = ('mark_seen', 'subscribe', 'unsubscribe', 'typing')
+
+WS_CONNECTIONS = Counter('ws_connections_total', "WebSocket connection attempts", ['outcome'])
+WS_OPEN = Gauge('ws_open_connections', "Currently open WebSocket connections")
+WS_CONNECT_SECONDS = Histogram('ws_connect_duration_seconds', "Time to accept a socket and queue its initial state")
+WS_RECEIVED = Counter('ws_messages_received_total', "WebSocket messages received", ['action', 'outcome'])
+WS_SENT = Counter('ws_messages_sent_total', "Events written to WebSocket clients")
+WS_FRAMES = Counter('ws_frames_sent_total', "WebSocket frames written (one can batch several events)")
+WS_SEND_FAILED = Counter('ws_messages_failed_total', "Events dropped because encoding or writing them failed")
+WS_DELIVERY_SECONDS = Histogram(
+    'ws_delivery_seconds', "Time from channel layer publish to the socket write", ['type']
+)
 
 
 class NotificationConsumer(AsyncJsonWebsocketConsumer):
@@ -12,23 +44,36 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         - Add user to their notification group
         - Send initial unread notification count
         """
+        start = time.perf_counter()
         user = self.scope["user"]
         if user.is_authenticated:
             self.user_id = user.id
             self.group_name = f"user_{user.id}"
+            # conversation ids whose conv_{id} group this socket joined
+            self.conversations = set()
             
             # Add to user's notification group
             await self.channel_layer.group_add(self.group_name, self.channel_name)
-            await self.accept()
+            self.codec = negotiate(self.scope.get("subprotocols", []))
+            await self.accept(subprotocol=self.codec.subprotocol)
+
+            # Outgoing events are buffered and written by a single task, so a
+            # slow client backs up its own queue instead of the channel layer
+            self.outbound = OutboundQueue(settings.WS_SEND_QUEUE_SIZE)
+            self.writer = asyncio.create_task(self.drain_outbound())
+            WS_OPEN.inc()
             
             # Send unread notifications and count
             unread_notifications = await self.get_unread_notifications(user.id)
-            await self.send_json({
+            self.queue_json({
                 "type": "initial_notifications",
                 "unread_count": len(unread_notifications),
                 "notifications": unread_notifications
             })
+            WS_CONNECTIONS.inc(outcome='accepted')
+            WS_CONNECT_SECONDS.observe(time.perf_counter() - start)
         else:
+            WS_CONNECTIONS.inc(outcome='rejected')
             await self.close()
 
     async def disconnect(self, close_code):
@@ -37,35 +82,169 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         """
         if hasattr(self, 'group_name'):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            for conversation_id in self.conversations:
+                await self.channel_layer.group_discard(conversation_group(conversation_id), self.channel_name)
+        if hasattr(self, 'writer'):
+            self.writer.cancel()
+            WS_OPEN.dec()
 
     async def receive_json(self, content):
         """
         Handle incoming WebSocket messages
         """
         action = content.get("action")
-        
+        label = action if action in ACTIONS else 'unknown'
+        # not thread sensitive: the bucket check touches no database, so sockets
+        # need not queue for the single sync thread behind it
+        allowed, retry_after = await sync_to_async(consume, thread_sensitive=False)('ws_action', self.user_id)
+        if not allowed:
+            WS_RECEIVED.inc(action=label, outcome='rate_limited')
+            self.queue_json({
+                "type": "error",
+                "code": "rate_limited",
+                "retry_after": round(retry_after, 1)
+            })
+            return
+        WS_RECEIVED.inc(action=label, outcome='accepted')
+
         if action == "mark_seen":
             notification_ids = content.get("notification_ids", [])
             await self.mark_notifications_seen(notification_ids)
+        elif action in ("subscribe", "unsubscribe", "typing"):
+            conversation_id = content.get("conversation_id")
+            if type(conversation_id) is not int:
+                self.queue_error("invalid_conversation")
+                return
+            handler = {"subscribe": self.subscribe, "unsubscribe": self.unsubscribe, "typing": self.send_typing}
+            await handler[action](conversation_id)
+
+    def queue_error(self, code, **extra):
+        self.queue_json({"type": "error", "code": code, **extra})
+
+    async def subscribe(self, conversation_id):
+        """
+        Join the conversation's group to get its live events (new messages,
+        edits, deletes, typing) while the chat is open.
+        """
+        if conversation_id in self.conversations:
+            return
+        if len(self.conversations) >= settings.WS_MAX_SUBSCRIPTIONS:
+            self.queue_error("too_many_subscriptions", limit=settings.WS_MAX_SUBSCRIPTIONS)
+            return
+        if not await self.is_participant(conversation_id):
+            self.queue_error("forbidden", conversation_id=conversation_id)
+            return
+        await self.channel_layer.group_add(conversation_group(conversation_id), self.channel_name)
+        self.conversations.add(conversation_id)
+        self.queue_json({"type": "subscribed", "conversation_id": conversation_id})
+
+    async def unsubscribe(self, conversation_id):
+        if conversation_id not in self.conversations:
+            return
+        self.conversations.discard(conversation_id)
+        await self.channel_layer.group_discard(conversation_group(conversation_id), self.channel_name)
+        self.queue_json({"type": "unsubscribed", "conversation_id": conversation_id})
+
+    async def send_typing(self, conversation_id):
+        # only subscribers can type, which saves a membership query per event
+        if conversation_id not in self.conversations:
+            self.queue_error("not_subscribed", conversation_id=conversation_id)
+            return
+        await apublish(conversation_group(conversation_id), channel_event("typing", {
+            "type": "typing",
+            "conversation_id": conversation_id,
+            "user_id": self.user_id,
+        }))
+
+    def queue_json(self, payload, event=None):
+        if event and "published_at" in event:
+            payload = {**payload, TRACE_KEY: {
+                "traceparent": event.get("traceparent"),
+                "published_at": event["published_at"],
+            }}
+        self.outbound.put(payload)
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        if bytes_data is not None and self.codec.binary:
+            await self.receive_json(self.codec.decode(bytes_data))
+        else:
+            await super().receive(text_data, bytes_data, **kwargs)
+
+    async def drain_outbound(self):
+        while True:
+            if self.codec.batching:
+                batch = await self.outbound.get_batch(
+                    settings.WS_BATCH_SIZE, linger=settings.WS_FLUSH_INTERVAL_MS / 1000
+                )
+            else:
+                batch = [await self.outbound.get()]
+            try:
+                await self.send_batch(batch)
+            except Exception:
+                # drop the batch but keep the writer alive for the next one
+                WS_SEND_FAILED.inc(len(batch))
+                logger.exception("Failed to send events", extra={'user_id': self.user_id, 'events': len(batch)})
+
+    async def send_batch(self, batch):
+        traced = []
+        for payload in batch:
+            trace = payload.pop(TRACE_KEY, None)
+            if trace is not None:
+                traced.append((payload.get("type", "unknown"), trace))
+
+        # delivery spans start when the event was published, so their
+        # duration is the end-to-end delivery time
+        spans = [
+            tracer.start_span(
+                f"ws.deliver {kind}",
+                context=extract(trace),
+                attributes={"user_id": self.user_id},
+                start_time=int(trace["published_at"] * 1e9),
+            ) for kind, trace in traced
+        ]
+        try:
+            frames = self.codec.encode(batch)
+            for text_data, bytes_data in frames:
+                await self.send(text_data=text_data, bytes_data=bytes_data)
+        finally:
+            for span in spans:
+                span.end()
+        WS_SENT.inc(len(batch))
+        WS_FRAMES.inc(len(frames))
+
+        now = time.time()
+        for kind, trace in traced:
+            WS_DELIVERY_SECONDS.observe(max(now - trace["published_at"], 0), type=kind)
 
     # Channel layer event handlers
     async def new_message(self, event):
-        await self.send_json(event["data"])
+        self.queue_json(event["data"], event)
     
     async def reaction(self, event):
-        await self.send_json(event["data"])
+        self.queue_json(event["data"], event)
 
     async def reaction_added(self, event):
         """
         Specific handler for reaction added events
         """
-        await self.send_json(event["data"])
+        self.queue_json(event["data"], event)
     
     async def reaction_removed(self, event):
         """
         Specific handler for reaction removed events
         """
-        await self.send_json(event["data"])
+        self.queue_json(event["data"], event)
+
+    async def message_deleted(self, event):
+        self.queue_json(event["data"], event)
+
+    async def message_edited(self, event):
+        self.queue_json(event["data"], event)
+
+    async def typing(self, event):
+        # the typist's own sockets are in the group too
+        if event["data"].get("user_id") != self.user_id:
+            self.queue_json(event["data"], event)
 
 
 
@@ -74,29 +253,46 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         notification_ids = event["data"].get("notification_ids", [])
         
         # update frontend UI (removing or marking notifications as seen)
-        await self.send_json({
+        self.queue_json({
             "type": "notifications_seen", 
             "notification_ids": notification_ids
-        })
+        }, event)
 
 
     
+    @database_sync_to_async
+    def is_participant(self, conversation_id):
+        return Conversation.objects.filter(id=conversation_id, participants=self.user_id).exists()
+
+    @staticmethod
+    def actor_name(notif):
+        """
+        Who the notification is from: the latest reactor of a reaction
+        notification, otherwise the message sender.
+        """
+        if notif.notification_type == 'reaction':
+            if notif.reaction:
+                return notif.reaction.user.full_name
+            if notif.message:
+                # the reaction was removed; it came from the other participant
+                message = notif.message
+                return (message.receiver if message.sender_id == notif.user_id else message.sender).full_name
+        return notif.message.sender.full_name if notif.message else "System"
+
     @database_sync_to_async
     def get_unread_notifications(self, user_id):
         notifications = Notification.objects.filter(
             user_id=user_id, 
             is_seen=False
-        ).order_by('-created_at')[:10]
+        ).exclude(message__deleted_at__isnull=False).order_by('-created_at')[:10]
 
         return [
             {
                 "id": str(notif.id),
                 "type": notif.notification_type,
-                "userName": (
-                    notif.reaction.user.full_name if notif.notification_type == 'reaction' and notif.reaction
-                    else notif.message.sender.full_name if notif.message else "System"
-                ),
-                "timeAgo": self.format_time_ago(notif.created_at),
+                "userName": self.actor_name(notif),
+                "actorCount": notif.actor_count,
+                "timeAgo": self.format_time_ago(notif.updated_at),
                 "unread": True,
                 "content": notif.message.content if notif.message else None,
                 "messageId": notif.message.id if notif.message else None,
@@ -0,0 +1,304 @@
+"""
+Channel layer backends, picked by settings.CHANNEL_LAYER_BACKEND.
+
+ShardedRedisChannelLayer spreads groups and channels over several Redis
+servers (CHANNEL_REDIS_HOSTS) with a consistent hash ring, so adding a shard
+only moves the keys that land on it (about 1/N of them) instead of
+reshuffling almost every group as channels_redis' range split does.
+
+MemoryChannelLayer keeps everything in the process, for single-process
+deployments, tests and benchmarks.
+"""
+import asyncio
+import hashlib
+import logging
+import secrets
+import threading
+import time
+from bisect import bisect
+from collections import deque
+
+import msgpack
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from channels_redis.core import RedisChannelLayer
+
+logger = logging.getLogger(__name__)
+
+# points per host on the ring; more points give a more even spread
+VIRTUAL_NODES = 160
+
+
+def ring_hash(value):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return int.from_bytes(hashlib.md5(value, usedforsecurity=False).digest()[:8], 'big')
+
+
+def host_name(host):
+    """
+    A stable name for a decoded channels_redis host entry, so a shard keeps
+    its place on the ring wherever it appears in the host list.
+    """
+    if 'address' in host:
+        return str(host['address'])
+    return f"{host.get('host', 'localhost')}:{host.get('port', 6379)}/{host.get('db', 0)}"
+
+
+class HashRing:
+    """
+    Maps keys to node indexes by consistent hashing with virtual nodes.
+    """
+
+    def __init__(self, names, virtual_nodes=VIRTUAL_NODES):
+        if len(set(names)) != len(names):
+            raise ValueError("Ring nodes must have distinct names")
+        points = sorted(
+            (ring_hash(f"{name}#{replica}"), index)
+            for index, name in enumerate(names)
+            for replica in range(virtual_nodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.nodes = [index for _, index in points]
+
+    def get(self, key):
+        position = bisect(self.hashes, ring_hash(key))
+        return self.nodes[position % len(self.nodes)]
+
+
+class ShardedRedisChannelLayer(RedisChannelLayer):
+    """
+    RedisChannelLayer placing group memberships and channel queues on the
+    host picked by a consistent hash ring.
+    """
+
+    def __init__(self, *args, virtual_nodes=VIRTUAL_NODES, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ring = HashRing([host_name(host) for host in self.hosts], virtual_nodes)
+
+    def consistent_hash(self, value):
+        if self.ring_size == 1:
+            return 0
+        return self.ring.get(value)
+
+
+class MemoryChannel:
+    __slots__ = ('capacity', 'messages', 'waiters')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # (expires at, packed message), oldest first
+        self.messages = deque()
+        # futures of receivers waiting for a message
+        self.waiters = deque()
+
+    def expire(self, now):
+        while self.messages and self.messages[0][0] <= now:
+            self.messages.popleft()
+
+    @property
+    def idle(self):
+        return not self.messages and not self.waiters
+
+
+class MemoryChannelLayer(BaseChannelLayer):
+    """
+    In-process channel layer with the Redis layer's semantics: messages are
+    serialized with msgpack (receivers get their own copy, and a message
+    Redis could not carry fails here too), expire after `expiry` seconds,
+    sends to a channel holding `capacity` messages raise ChannelFull (and
+    are skipped by group_send), and group memberships expire after
+    `group_expiry` seconds. `group_capacity` optionally caps the channels
+    in one group.
+
+    Unlike channels' InMemoryChannelLayer, a send hands the message straight
+    to a waiting receiver, a group send serializes the message once, and
+    expired entries are swept once per `expiry` rather than on every call.
+    Only sockets served by the same process can be reached.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None, group_capacity=None):
+        super().__init__(expiry=expiry, capacity=capacity)
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.group_expiry = group_expiry
+        self.group_capacity = group_capacity
+        self.channels = {}
+        # group -> {channel: time joined}
+        self.groups = {}
+        # the layer is shared by every event loop of the process (async_to_sync
+        # from a plain thread runs its own loop)
+        self.lock = threading.Lock()
+        self.next_sweep = time.monotonic() + expiry
+
+    def serialize(self, message):
+        assert isinstance(message, dict), "message is not a dict"
+        return msgpack.packb(message, use_bin_type=True)
+
+    def get_channel(self, name):
+        channel = self.channels.get(name)
+        if channel is None:
+            channel = self.channels[name] = MemoryChannel(self.get_capacity(name))
+        return channel
+
+    def put(self, name, data, now):
+        """
+        Queue packed `data` on channel `name`, or hand it to a receiver
+        waiting there. Call with the lock held.
+        """
+        channel = self.get_channel(name)
+        while channel.waiters:
+            waiter = channel.waiters.popleft()
+            if not waiter.done():
+                self.resolve(waiter, name, data)
+                return
+        channel.expire(now)
+        if len(channel.messages) >= channel.capacity:
+            raise ChannelFull(name)
+        channel.messages.append((now + self.expiry, data))
+
+    def resolve(self, waiter, name, data):
+        loop = waiter.get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is running:
+            waiter.set_result(data)
+        else:
+            loop.call_soon_threadsafe(self.resolve_threadsafe, waiter, name, data)
+
+    def resolve_threadsafe(self, waiter, name, data):
+        if not waiter.done():
+            waiter.set_result(data)
+            return
+        # the receiver went away in the meantime
+        with self.lock:
+            try:
+                self.put(name, data, time.monotonic())
+            except ChannelFull:
+                pass
+
+    def requeue(self, name, data):
+        """
+        Put a message its receiver was cancelled before reading back at the
+        front of the channel.
+        """
+        with self.lock:
+            self.get_channel(name).messages.appendleft((time.monotonic() + self.expiry, data))
+
+    def sweep(self, now):
+        """
+        Drop expired messages, idle channels and expired group memberships.
+        Call with the lock held.
+        """
+        self.next_sweep = now + self.expiry
+        for name, channel in list(self.channels.items()):
+            channel.expire(now)
+            if channel.idle:
+                del self.channels[name]
+        cutoff = time.time() - self.group_expiry
+        for group, members in list(self.groups.items()):
+            for name, joined in list(members.items()):
+                if joined < cutoff:
+                    del members[name]
+            if not members:
+                del self.groups[group]
+
+    async def send(self, channel, message):
+        self.require_valid_channel_name(channel)
+        data = self.serialize(message)
+        now = time.monotonic()
+        with self.lock:
+            if now >= self.next_sweep:
+                self.sweep(now)
+            self.put(channel, data, now)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        with self.lock:
+            queue = self.get_channel(channel)
+            queue.expire(time.monotonic())
+            if queue.messages:
+                data = queue.messages.popleft()[1]
+                waiter = None
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                queue.waiters.append(waiter)
+        if waiter is not None:
+            try:
+                data = await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self.requeue(channel, waiter.result())
+                raise
+            finally:
+                with self.lock:
+                    if waiter in queue.waiters:
+                        queue.waiters.remove(waiter)
+        with self.lock:
+            if queue.idle and self.channels.get(channel) is queue:
+                del self.channels[channel]
+        return msgpack.unpackb(data, raw=False)
+
+    async def new_channel(self, prefix='specific.'):
+        return f"{prefix}memory!{secrets.token_hex(6)}"
+
+    async def flush(self):
+        with self.lock:
+            # pending receivers keep waiting, as they would on Redis
+            self.channels = {name: channel for name, channel in self.channels.items() if channel.waiters}
+            for channel in self.channels.values():
+                channel.messages.clear()
+            self.groups = {}
+
+    async def close(self):
+        pass
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        with self.lock:
+            members = self.groups.setdefault(group, {})
+            if self.group_capacity and channel not in members and len(members) >= self.group_capacity:
+                self.sweep(time.monotonic())
+                if len(self.groups.setdefault(group, members)) >= self.group_capacity:
+                    raise ChannelFull(group)
+            members[channel] = time.time()
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        with self.lock:
+            members = self.groups.get(group)
+            if members:
+                members.pop(channel, None)
+                if not members:
+                    del self.groups[group]
+
+    async def group_send(self, group, message):
+        self.require_valid_group_name(group)
+        data = self.serialize(message)
+        now = time.monotonic()
+        cutoff = time.time() - self.group_expiry
+        full = 0
+        with self.lock:
+            if now >= self.next_sweep:
+                self.sweep(now)
+            members = self.groups.get(group)
+            if not members:
+                return
+            for channel, joined in list(members.items()):
+                if joined < cutoff:
+                    del members[channel]
+                    continue
+                try:
+                    self.put(channel, data, now)
+                except ChannelFull:
+                    full += 1
+            size = len(members)
+            if not members:
+                del self.groups[group]
+        if full:
+            logger.info("%s of %s channels over capacity in group %s", full, size, group)
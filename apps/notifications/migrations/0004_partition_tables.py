@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import migrations
+
+from apps.chat.partitioning import PARTITIONED_TABLES, convert_to_partitioned, is_partitioned
+
+
+def partition_tables(apps, schema_editor):
+    """
+    Opt-in: only runs on PostgreSQL when MESSAGE_PARTITIONING is enabled.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or not getattr(settings, 'MESSAGE_PARTITIONING', False):
+        return
+    for table, column in PARTITIONED_TABLES.items():
+        if not is_partitioned(table, connection.alias):
+            convert_to_partitioned(
+                table, column,
+                months_ahead=settings.PARTITION_PREMAKE_MONTHS,
+                using=connection.alias,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_reaction_created_at'),
+        ('notifications', '0003_notification_reaction'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2 on 2026-10-19 15:14
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+from apps.chat.partitioning import is_partitioned
+
+
+def retire_duplicates(apps, schema_editor):
+    """
+    Keep only the latest unseen reaction notification per recipient and
+    message; the older ones are superseded by it, so mark them seen.
+    """
+    Notification = apps.get_model('notifications', 'Notification')
+    unseen = Notification.objects.using(schema_editor.connection.alias).filter(
+        notification_type='reaction', is_seen=False,
+    )
+    duplicates = (
+        unseen.values('user_id', 'message_id')
+        .annotate(latest=Max('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        unseen.filter(user_id=row['user_id'], message_id=row['message_id'], id__lt=row['latest']).update(is_seen=True)
+
+
+class AddConstraintUnlessPartitioned(migrations.AddConstraint):
+    """
+    A unique index on a partitioned table has to include the partition key,
+    so the constraint only exists in the database while the notification
+    table is not partitioned.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not is_partitioned(model._meta.db_table, schema_editor.connection.alias):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not is_partitioned(model._meta.db_table, schema_editor.connection.alias):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_message_revisions'),
+        ('notifications', '0005_reaction_aggregation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(retire_duplicates, migrations.RunPython.noop),
+        AddConstraintUnlessPartitioned(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_seen', False), ('notification_type', 'reaction')), fields=('user', 'message'), name='unique_unseen_reaction_notification'),
+        ),
+    ]
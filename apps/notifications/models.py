@@ -12,10 +12,22 @@ class Notification(models.Model):
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE) # to be notified
     message = models.ForeignKey(Message, on_delete=models.CASCADE, null=True, blank=True)
-    reaction = models.ForeignKey(Reaction, on_delete=models.CASCADE, null=True, blank=True)
+    # latest reaction of an aggregated reaction notification; removing it keeps the notification
+    reaction = models.ForeignKey(Reaction, on_delete=models.SET_NULL, null=True, blank=True)
     notification_type = models.CharField(max_length=20, choices=NOTIF_TYPE_CHOICES)
+    # number of people a reaction notification stands for ("5 people reacted")
+    actor_count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     is_seen = models.BooleanField(default=False)
 
     class Meta:
         ordering = ["-created_at"]
+        constraints = [
+            # reactions on a message fold into one unseen notification per recipient
+            models.UniqueConstraint(
+                fields=['user', 'message'],
+                condition=models.Q(notification_type='reaction', is_seen=False),
+                name='unique_unseen_reaction_notification',
+            ),
+        ]
@@ -0,0 +1,117 @@
+"""
+Per-socket outbound buffering with backpressure.
+
+Consumers queue events here instead of writing them straight to the socket,
+and a single writer task drains the queue. When a client reads slower than
+events arrive the queue fills up: events that only carry the latest state of
+something (a user's reaction on a message, seen markers, the latest edit or
+the deletion of a message) replace their queued predecessor, and once the
+queue is full the oldest events are dropped. The client is then told how many
+events it missed so it can refetch.
+
+Batching consumers can also linger briefly after the first event so a burst
+goes out as one frame (see get_batch).
+"""
+import asyncio
+import itertools
+from collections import OrderedDict
+
+from apps.monitoring.metrics import Counter
+
+REACTION_EVENTS = ('reaction', 'reaction_added', 'reaction_removed')
+
+DROPPED = Counter('ws_outbound_dropped_total', "Events dropped from full WebSocket send queues")
+COALESCED = Counter('ws_outbound_coalesced_total', "Events merged into a queued event they superseded")
+
+
+def coalesce_key(payload):
+    """
+    Key under which a newer event supersedes a queued one, or None when the
+    event has to be delivered on its own.
+    """
+    kind = payload.get('type')
+    if kind in REACTION_EVENTS and payload.get('message_id') and payload.get('user_id'):
+        return ('reaction', payload['message_id'], payload['user_id'])
+    if kind in ('message_edited', 'message_deleted') and payload.get('message_id'):
+        # only the latest content matters, and a deletion supersedes edits
+        return ('message_state', payload['message_id'])
+    if kind == 'typing' and payload.get('conversation_id') and payload.get('user_id'):
+        return ('typing', payload['conversation_id'], payload['user_id'])
+    if kind == 'notifications_seen':
+        return ('notifications_seen',)
+    return None
+
+
+def merge(queued, payload):
+    if payload.get('type') == 'notifications_seen':
+        ids = list(dict.fromkeys([*queued.get('notification_ids', []), *payload.get('notification_ids', [])]))
+        return {**payload, 'notification_ids': ids}
+    return payload
+
+
+class OutboundQueue:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.keys = itertools.count()
+        self.ready = asyncio.Event()
+        # set once `flush_size` events are queued, ends a linger early
+        self.filled = asyncio.Event()
+        self.flush_size = None
+        # dropped since the client was last told, and running totals
+        self.dropped = 0
+        self.dropped_total = 0
+        self.coalesced_total = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, payload):
+        key = coalesce_key(payload)
+        if key is not None and key in self.items:
+            self.items[key] = merge(self.items[key], payload)
+            self.coalesced_total += 1
+            COALESCED.inc()
+            return
+
+        if len(self.items) >= self.maxsize:
+            self.items.popitem(last=False)
+            self.dropped += 1
+            self.dropped_total += 1
+            DROPPED.inc()
+        self.items[next(self.keys) if key is None else key] = payload
+        self.ready.set()
+        if self.flush_size and len(self.items) >= self.flush_size:
+            self.filled.set()
+
+    async def get(self):
+        while not self.items:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.pop()
+
+    async def get_batch(self, limit, linger=0):
+        """
+        Wait for an event, then return it with whatever else is queued, up
+        to `limit` events. With `linger` (seconds) it first waits that long
+        for more events to arrive, unless `limit` are queued sooner.
+        """
+        batch = [await self.get()]
+        if linger and len(self.items) + 1 < limit:
+            self.flush_size = limit - 1
+            self.filled.clear()
+            try:
+                await asyncio.wait_for(self.filled.wait(), linger)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.flush_size = None
+        while self.items and len(batch) < limit:
+            batch.append(self.pop())
+        return batch
+
+    def pop(self):
+        if self.dropped:
+            count, self.dropped = self.dropped, 0
+            return {"type": "events_dropped", "count": count}
+        return self.items.popitem(last=False)[1]
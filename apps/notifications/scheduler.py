@@ -0,0 +1,57 @@
+"""
+Delayed calls on a single background thread.
+
+Used for work that has to happen a little later, such as the trailing push
+of a reaction notification, without starting a thread per call. Calls run
+one after another with fresh database connections, reading from the
+primary so they see the writes that scheduled them.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from django.db import close_old_connections
+
+from config.routers import pin_to_primary
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    def __init__(self, name):
+        self.name = name
+        # (due, sequence, func, args), earliest first
+        self.calls = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def call_later(self, delay, func, *args):
+        with self.condition:
+            heapq.heappush(self.calls, (time.monotonic() + delay, next(self.sequence), func, args))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def next_call(self):
+        with self.condition:
+            while True:
+                wait = self.calls[0][0] - time.monotonic() if self.calls else None
+                if wait is not None and wait <= 0:
+                    return heapq.heappop(self.calls)
+                self.condition.wait(wait)
+
+    def run(self):
+        while True:
+            _, _, func, args = self.next_call()
+            close_old_connections()
+            try:
+                with pin_to_primary():
+                    func(*args)
+            except Exception:
+                logger.exception("Scheduled call failed", extra={'scheduler': self.name})
+            finally:
+                close_old_connections()
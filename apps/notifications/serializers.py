@@ -3,16 +3,18 @@ from .models import Notification
 from apps.chat.serializers import MessageSerializer
 from django.contrib.auth import get_user_model
 from apps.chat.models import Reaction
+from apps.users.serializers import ProfilePhotoVariantsField
 
 User = get_user_model()
 
 class UserMinimalSerializer(serializers.ModelSerializer):
     profile_photo = serializers.SerializerMethodField()
     full_name = serializers.SerializerMethodField()
+    profile_photo_variants = ProfilePhotoVariantsField()
     
     class Meta:
         model = User
-        fields = ['id', 'full_name', 'profile_photo']
+        fields = ['id', 'full_name', 'profile_photo', 'profile_photo_variants']
     
     def get_profile_photo(self, obj):
         if obj.profile_photo:
@@ -28,7 +30,7 @@ class NotificationSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Notification
-        fields = ['id', 'user', 'message', 'notification_type', 'created_at', 'is_seen', 'related_user']
+        fields = ['id', 'user', 'message', 'notification_type', 'actor_count', 'created_at', 'updated_at', 'is_seen', 'related_user']
     
     def get_related_user(self, obj):
         """
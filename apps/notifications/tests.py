@@ -1,3 +1,654 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+import msgpack
+import redis
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apps.chat import ratelimit
+from apps.chat.models import Conversation, Message, Reaction
+from apps.chat.ratelimit import LocalBuckets
+from apps.monitoring.tracing import get_exporter, tracer
+from apps.notifications.breaker import BREAKER_REJECTED, BREAKER_STATE, CircuitBreaker
+from apps.notifications.codecs import JSONCodec, MsgpackCodec, negotiate
+from apps.notifications.consumers import WS_DELIVERY_SECONDS, NotificationConsumer
+from apps.notifications.layers import HashRing, MemoryChannelLayer, ShardedRedisChannelLayer, host_name
+from apps.notifications.models import Notification
+from apps.notifications.outbound import OutboundQueue
+from apps.notifications.scheduler import Scheduler
+from apps.notifications.utils import (
+    CHANNEL_PUBLISH_FAILURES, apublish, channel_event, notify_conversation, notify_user, publish,
+)
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {"default": {"BACKEND": "apps.notifications.layers.MemoryChannelLayer"}}
+
+
+class OutboundQueueTests(SimpleTestCase):
+    async def test_reactions_from_same_user_coalesce(self):
+        queue = OutboundQueue(maxsize=10)
+        queue.put({'type': 'reaction', 'message_id': 1, 'user_id': 2, 'emoji': '👍'})
+        queue.put({'type': 'new_message', 'message_id': 3})
+        queue.put({'type': 'reaction', 'message_id': 1, 'user_id': 2, 'emoji': '❤️'})
+
+        self.assertEqual(len(queue), 2)
+        self.assertEqual((await queue.get())['emoji'], '❤️')
+        self.assertEqual((await queue.get())['type'], 'new_message')
+
+    async def test_only_latest_edit_is_sent(self):
+        queue = OutboundQueue(maxsize=10)
+        queue.put({'type': 'message_edited', 'message_id': 1, 'content': 'a'})
+        queue.put({'type': 'message_edited', 'message_id': 1, 'content': 'b'})
+        self.assertEqual(len(queue), 1)
+        self.assertEqual((await queue.get())['content'], 'b')
+
+    async def test_typing_coalesces_per_user(self):
+        queue = OutboundQueue(maxsize=10)
+        for _ in range(3):
+            queue.put({'type': 'typing', 'conversation_id': 1, 'user_id': 2})
+        self.assertEqual(len(queue), 1)
+
+    async def test_deletion_supersedes_queued_edit(self):
+        queue = OutboundQueue(maxsize=10)
+        queue.put({'type': 'message_edited', 'message_id': 1, 'content': 'a'})
+        queue.put({'type': 'message_deleted', 'message_id': 1})
+        self.assertEqual(len(queue), 1)
+        self.assertEqual((await queue.get())['type'], 'message_deleted')
+
+    async def test_linger_collects_a_burst(self):
+        queue = OutboundQueue(maxsize=10)
+        queue.put({'type': 'new_message', 'message_id': 0})
+
+        async def burst():
+            await asyncio.sleep(0.01)
+            queue.put({'type': 'new_message', 'message_id': 1})
+            queue.put({'type': 'new_message', 'message_id': 2})
+
+        task = asyncio.create_task(burst())
+        batch = await queue.get_batch(10, linger=0.1)
+        await task
+        self.assertEqual([event['message_id'] for event in batch], [0, 1, 2])
+
+    async def test_linger_ends_when_batch_is_full(self):
+        queue = OutboundQueue(maxsize=10)
+        queue.put({'type': 'new_message', 'message_id': 0})
+        asyncio.get_running_loop().call_later(0.01, queue.put, {'type': 'new_message', 'message_id': 1})
+
+        batch = await asyncio.wait_for(queue.get_batch(2, linger=30), timeout=1)
+        self.assertEqual(len(batch), 2)
+
+    async def test_seen_markers_merge(self):
+        queue = OutboundQueue(maxsize=10)
+        queue.put({'type': 'notifications_seen', 'notification_ids': [1, 2]})
+        queue.put({'type': 'notifications_seen', 'notification_ids': [2, 3]})
+        self.assertEqual((await queue.get())['notification_ids'], [1, 2, 3])
+
+    async def test_overflow_drops_oldest_and_reports(self):
+        queue = OutboundQueue(maxsize=2)
+        for i in range(5):
+            queue.put({'type': 'new_message', 'message_id': i})
+
+        self.assertEqual(await queue.get(), {'type': 'events_dropped', 'count': 3})
+        self.assertEqual((await queue.get())['message_id'], 3)
+        self.assertEqual((await queue.get())['message_id'], 4)
+        self.assertEqual(queue.dropped_total, 3)
+
+
+class SchedulerTests(SimpleTestCase):
+    def test_calls_run_in_due_order_on_one_thread(self):
+        scheduler = Scheduler('test-scheduler')
+        done = threading.Event()
+        calls = []
+
+        def record(name):
+            calls.append((name, threading.current_thread().name))
+            if len(calls) == 3:
+                done.set()
+
+        scheduler.call_later(0.2, record, 'late')
+        scheduler.call_later(0, record, 'now')
+        scheduler.call_later(0.1, record, 'soon')
+        self.assertTrue(done.wait(5))
+        self.assertEqual(calls, [(name, 'test-scheduler') for name in ('now', 'soon', 'late')])
+
+    def test_failing_call_does_not_stop_the_thread(self):
+        scheduler = Scheduler('test-scheduler')
+        done = threading.Event()
+        with self.assertLogs('apps.notifications.scheduler', 'ERROR'):
+            scheduler.call_later(0, lambda: 1 / 0)
+            scheduler.call_later(0.05, done.set)
+            self.assertTrue(done.wait(5))
+
+
+class CodecTests(SimpleTestCase):
+    def test_negotiation_defaults_to_json(self):
+        self.assertIsInstance(negotiate([]), JSONCodec)
+        self.assertIsInstance(negotiate(['graphql-ws', 'letschat.msgpack.v1']), MsgpackCodec)
+
+    def test_msgpack_frames_are_smaller_and_round_trip(self):
+        batch = [
+            {'type': 'reaction', 'message_id': 7, 'user_id': 3, 'emoji': '👍', 'actor_count': 2,
+             'reactor_data': {'id': 3, 'name': 'Amina Kamau'}, 'reaction_counts': {'👍': 2}},
+        ] * 5
+        codec = MsgpackCodec()
+        [(text_data, frame)] = codec.encode(batch)
+        self.assertIsNone(text_data)
+        self.assertLess(len(frame), sum(len(text) for text, _ in JSONCodec().encode(batch)) / 2)
+
+        decoded = codec.decode(frame)
+        self.assertEqual(decoded, batch)
+        self.assertEqual(msgpack.unpackb(frame)[0]['rc'], {'👍': 2})
+
+    async def test_batches_take_what_is_queued(self):
+        queue = OutboundQueue(maxsize=10)
+        for i in range(3):
+            queue.put({'type': 'new_message', 'message_id': i})
+        self.assertEqual(len(await queue.get_batch(2)), 2)
+        self.assertEqual(len(await queue.get_batch(2)), 1)
+
+
+# two logical databases of the local server stand in for two shards
+SHARD_URLS = ['redis://127.0.0.1:6379/13', 'redis://127.0.0.1:6379/14']
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(SHARD_URLS[0], socket_connect_timeout=0.2).ping()
+    except redis.RedisError:
+        return False
+
+
+class ShardedLayerTests(SimpleTestCase):
+    def test_ring_spreads_groups_evenly(self):
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        counts = [0] * 4
+        for user_id in range(20000):
+            counts[ring.get(f"user_{user_id}")] += 1
+        self.assertLess(max(counts) / min(counts), 1.5)
+
+    def test_adding_a_shard_moves_only_its_share(self):
+        groups = [f"conv_{i}" for i in range(20000)]
+        before, after = ['a', 'b', 'c'], ['d', 'a', 'b', 'c']
+        # the new host is listed first; existing hosts keep their points
+        old_ring, new_ring = HashRing(before), HashRing(after)
+        moved = sum(after[new_ring.get(group)] != before[old_ring.get(group)] for group in groups)
+        self.assertLess(moved / len(groups), 0.3)
+
+    def test_host_entries_are_named_by_address(self):
+        layer = ShardedRedisChannelLayer(hosts=[('10.0.0.1', 6379), 'redis://10.0.0.2:6379'])
+        self.assertEqual([host_name(host) for host in layer.hosts], ['10.0.0.1:6379/0', 'redis://10.0.0.2:6379'])
+        self.assertIn(layer.consistent_hash('user_1'), (0, 1))
+
+    @skipUnless(redis_available(), "Redis is not running")
+    async def test_group_send_reaches_channels_on_every_shard(self):
+        layer = ShardedRedisChannelLayer(hosts=SHARD_URLS, prefix='test-shards')
+        try:
+            channels = [await layer.new_channel() for _ in range(20)]
+            groups = [f"user_{i}" for i in range(20)]
+            self.assertEqual({layer.consistent_hash(group) for group in groups}, {0, 1})
+            for group, channel in zip(groups, channels):
+                await layer.group_add(group, channel)
+            for index, group in enumerate(groups):
+                await layer.group_send(group, {'type': 'new_message', 'message_id': index})
+            received = [await asyncio.wait_for(layer.receive(channel), 2) for channel in channels]
+            self.assertEqual([event['message_id'] for event in received], list(range(20)))
+        finally:
+            await layer.flush()
+            await layer.close_pools()
+
+
+class LayerParityTests:
+    """
+    The channel layer behaviour the consumer relies on, checked against each
+    backend so the memory layer stays a faithful stand-in for Redis.
+    """
+
+    def make_layer(self, **config):
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def layer(self, **config):
+        layer = self.make_layer(**config)
+        try:
+            yield layer
+        finally:
+            await layer.flush()
+            if isinstance(layer, ShardedRedisChannelLayer):
+                await layer.close_pools()
+
+    async def receive(self, layer, channel):
+        return await asyncio.wait_for(layer.receive(channel), 2)
+
+    async def assertNothingReceived(self, layer, channel):
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(layer.receive(channel), 0.2)
+
+    async def test_messages_arrive_as_serialized_copies(self):
+        async with self.layer() as layer:
+            channel = await layer.new_channel()
+            message = {'type': 'new_message', 'data': {'ids': (1, 2)}}
+            await layer.send(channel, message)
+            self.assertEqual(await self.receive(layer, channel), {'type': 'new_message', 'data': {'ids': [1, 2]}})
+            with self.assertRaises(TypeError):
+                await layer.send(channel, {'type': 'new_message', 'data': object()})
+
+    async def test_group_send_reaches_members_only(self):
+        async with self.layer() as layer:
+            member, left, outsider = [await layer.new_channel() for _ in range(3)]
+            await layer.group_add('user_1', member)
+            await layer.group_add('user_1', left)
+            await layer.group_discard('user_1', left)
+            await layer.group_send('user_1', {'type': 'new_message', 'message_id': 1})
+
+            self.assertEqual((await self.receive(layer, member))['message_id'], 1)
+            await self.assertNothingReceived(layer, left)
+            await self.assertNothingReceived(layer, outsider)
+
+    async def test_full_channels_reject_sends_and_are_skipped_by_groups(self):
+        async with self.layer(capacity=1) as layer:
+            # Redis counts the capacity of all process-local channels together
+            full, free = 'test.full', 'test.free'
+            await layer.send(full, {'type': 'first'})
+            with self.assertRaises(ChannelFull):
+                await layer.send(full, {'type': 'second'})
+
+            await layer.group_add('conv_1', full)
+            await layer.group_add('conv_1', free)
+            await layer.group_send('conv_1', {'type': 'group'})
+            self.assertEqual((await self.receive(layer, full))['type'], 'first')
+            self.assertEqual((await self.receive(layer, free))['type'], 'group')
+            await self.assertNothingReceived(layer, full)
+
+    async def test_messages_expire(self):
+        async with self.layer(expiry=1) as layer:
+            channel = await layer.new_channel()
+            await layer.send(channel, {'type': 'stale'})
+            await asyncio.sleep(1.5)
+            await layer.send(channel, {'type': 'fresh'})
+            self.assertEqual((await self.receive(layer, channel))['type'], 'fresh')
+
+
+class MemoryLayerTests(LayerParityTests, SimpleTestCase):
+    def make_layer(self, **config):
+        return MemoryChannelLayer(**config)
+
+    async def test_waiting_receiver_gets_message_from_another_event_loop(self):
+        async with self.layer() as layer:
+            channel = await layer.new_channel()
+            receiving = asyncio.ensure_future(layer.receive(channel))
+            await asyncio.sleep(0)
+            # as notify_user does when called outside the server's event loop
+            await asyncio.to_thread(asyncio.run, layer.send(channel, {'type': 'new_message'}))
+            self.assertEqual((await asyncio.wait_for(receiving, 1))['type'], 'new_message')
+
+    async def test_group_capacity(self):
+        async with self.layer(group_capacity=2) as layer:
+            for name in ('a', 'b'):
+                await layer.group_add('conv_1', f'specific.memory!{name}')
+            with self.assertRaises(ChannelFull):
+                await layer.group_add('conv_1', 'specific.memory!c')
+            await layer.group_add('conv_1', 'specific.memory!a')
+
+
+@skipUnless(redis_available(), "Redis is not running")
+class RedisLayerTests(LayerParityTests, SimpleTestCase):
+    def make_layer(self, **config):
+        # one shard: sends to general channels rotate over shards
+        return ShardedRedisChannelLayer(hosts=SHARD_URLS[:1], prefix='test-parity', **config)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, RATE_LIMITS={'ws_action': '2/min'})
+class NotificationConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='pass1234')
+        patcher = patch.object(ratelimit, '_local', LocalBuckets())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def connect(self, user=None):
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), "/ws/notifications/")
+        communicator.scope['user'] = user or self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        initial = await communicator.receive_json_from()
+        self.assertEqual(initial['type'], 'initial_notifications')
+        return communicator
+
+    async def test_actions_are_rate_limited(self):
+        communicator = await self.connect()
+        for _ in range(2):
+            await communicator.send_json_to({'action': 'mark_seen', 'notification_ids': []})
+        await communicator.send_json_to({'action': 'mark_seen', 'notification_ids': []})
+
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'error')
+        self.assertEqual(response['code'], 'rate_limited')
+        await communicator.disconnect()
+
+    async def test_group_events_are_delivered_through_the_queue(self):
+        communicator = await self.connect()
+        await get_channel_layer().group_send(
+            f"user_{self.user.id}", {'type': 'new_message', 'data': {'type': 'new_message', 'message_id': 1}}
+        )
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'new_message', 'message_id': 1})
+        await communicator.disconnect()
+
+    async def test_writer_survives_a_failed_batch(self):
+        communicator = await self.connect()
+        layer, group = get_channel_layer(), f"user_{self.user.id}"
+        with self.assertLogs('apps.notifications.consumers', 'ERROR'), \
+                patch.object(JSONCodec, 'encode', side_effect=TypeError("not serializable")):
+            await layer.group_send(group, {'type': 'new_message', 'data': {'type': 'new_message', 'message_id': 1}})
+            self.assertTrue(await communicator.receive_nothing(0.1))
+        await layer.group_send(group, {'type': 'new_message', 'data': {'type': 'new_message', 'message_id': 2}})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'new_message', 'message_id': 2})
+        await communicator.disconnect()
+
+    @override_settings(RATE_LIMITS={})
+    async def test_msgpack_subprotocol(self):
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(), "/ws/notifications/", subprotocols=['letschat.msgpack.v1']
+        )
+        communicator.scope['user'] = self.user
+        connected, subprotocol = await communicator.connect()
+        self.assertEqual(subprotocol, 'letschat.msgpack.v1')
+        [initial] = msgpack.unpackb((await communicator.receive_output())['bytes'])
+        self.assertEqual(initial['t'], 'initial_notifications')
+
+        for i in range(3):
+            await get_channel_layer().group_send(
+                f"user_{self.user.id}", {'type': 'new_message', 'data': {'type': 'new_message', 'message_id': i}}
+            )
+        received = []
+        while len(received) < 3:
+            received.extend(msgpack.unpackb((await communicator.receive_output())['bytes']))
+        self.assertEqual([event['m'] for event in received], [0, 1, 2])
+
+        # client frames use the same short keys
+        await communicator.send_to(bytes_data=msgpack.packb({'a': 'subscribe', 'c': 999}))
+        [error] = msgpack.unpackb((await communicator.receive_output())['bytes'])
+        self.assertEqual(error['cd'], 'forbidden')
+        await communicator.disconnect()
+
+    @override_settings(WS_FLUSH_INTERVAL_MS=50)
+    async def test_json_batch_subprotocol_merges_bursts(self):
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(), "/ws/notifications/", subprotocols=['letschat.json-batch.v1']
+        )
+        communicator.scope['user'] = self.user
+        connected, subprotocol = await communicator.connect()
+        self.assertEqual(subprotocol, 'letschat.json-batch.v1')
+        [initial] = json.loads(await communicator.receive_from())
+        self.assertEqual(initial['type'], 'initial_notifications')
+
+        for i in range(3):
+            await get_channel_layer().group_send(
+                f"user_{self.user.id}", {'type': 'new_message', 'data': {'type': 'new_message', 'message_id': i}}
+            )
+        frame = json.loads(await communicator.receive_from())
+        self.assertEqual([event['message_id'] for event in frame], [0, 1, 2])
+        await communicator.disconnect()
+
+    async def subscribe(self, communicator, conversation_id):
+        await communicator.send_json_to({'action': 'subscribe', 'conversation_id': conversation_id})
+        return await communicator.receive_json_from()
+
+    @override_settings(RATE_LIMITS={})
+    async def test_conversation_subscription_and_typing(self):
+        other = await sync_to_async(User.objects.create_user)(email='other@example.com', password='pass1234')
+        conversation = await sync_to_async(Conversation.objects.create)()
+        await sync_to_async(conversation.participants.set)([self.user, other])
+
+        mine, theirs = await self.connect(), await self.connect(other)
+        self.assertEqual(await self.subscribe(mine, conversation.id),
+                         {'type': 'subscribed', 'conversation_id': conversation.id})
+        await self.subscribe(theirs, conversation.id)
+
+        await mine.send_json_to({'action': 'typing', 'conversation_id': conversation.id})
+        self.assertEqual(await theirs.receive_json_from(),
+                         {'type': 'typing', 'conversation_id': conversation.id, 'user_id': self.user.id})
+        self.assertTrue(await mine.receive_nothing())
+
+        await sync_to_async(notify_conversation)(conversation.id, 'message_edited', {'message_id': 5})
+        for communicator in (mine, theirs):
+            self.assertEqual((await communicator.receive_json_from())['message_id'], 5)
+
+        await mine.send_json_to({'action': 'unsubscribe', 'conversation_id': conversation.id})
+        self.assertEqual((await mine.receive_json_from())['type'], 'unsubscribed')
+        await sync_to_async(notify_conversation)(conversation.id, 'message_deleted', {'message_id': 5})
+        self.assertEqual((await theirs.receive_json_from())['type'], 'message_deleted')
+        self.assertTrue(await mine.receive_nothing())
+        await mine.disconnect()
+        await theirs.disconnect()
+
+    @override_settings(RATE_LIMITS={})
+    async def test_only_participants_can_subscribe(self):
+        conversation = await sync_to_async(Conversation.objects.create)()
+        communicator = await self.connect()
+
+        response = await self.subscribe(communicator, conversation.id)
+        self.assertEqual(response['code'], 'forbidden')
+        response = await self.subscribe(communicator, [conversation.id])
+        self.assertEqual(response['code'], 'invalid_conversation')
+        await communicator.send_json_to({'action': 'typing', 'conversation_id': conversation.id})
+        self.assertEqual((await communicator.receive_json_from())['code'], 'not_subscribed')
+        await communicator.disconnect()
+
+    @override_settings(TRACING_EXPORTER='apps.monitoring.tracing.InMemoryExporter')
+    async def test_delivery_continues_the_publishers_trace(self):
+        exporter = get_exporter()
+        exporter.clear()
+        delivered_before = WS_DELIVERY_SECONDS.count(type='message_deleted')
+        communicator = await self.connect()
+
+        def publish():
+            with tracer.start_as_current_span('test.publish') as span:
+                notify_user(self.user.id, 'message_deleted', {'message_id': 1})
+            return span
+
+        span = await sync_to_async(publish)()
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'message_deleted', 'message_id': 1})
+        await communicator.disconnect()
+
+        spans = {s.name: s for s in exporter.get_finished_spans()}
+        delivery = spans['ws.deliver message_deleted']
+        self.assertEqual(delivery.context.trace_id, span.context.trace_id)
+        self.assertEqual(delivery.parent_id, spans['notify_user'].context.span_id)
+        self.assertGreaterEqual(delivery.start_time, span.start_time)
+        self.assertEqual(WS_DELIVERY_SECONDS.count(type='message_deleted'), delivered_before + 1)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_consecutive_failures_and_probes_after_timeout(self):
+        breaker = CircuitBreaker('test-breaker', failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+
+        with patch('apps.notifications.breaker.time.monotonic', return_value=100.0):
+            breaker.record_failure()
+        self.assertEqual(BREAKER_STATE.value(name='test-breaker'), 2)
+        with patch('apps.notifications.breaker.time.monotonic', return_value=129.0):
+            self.assertFalse(breaker.allow())
+        self.assertEqual(BREAKER_REJECTED.value(name='test-breaker'), 1)
+
+        with patch('apps.notifications.breaker.time.monotonic', return_value=130.0):
+            # a single probe while half open
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, 'open')
+        with patch('apps.notifications.breaker.time.monotonic', return_value=160.0):
+            self.assertTrue(breaker.allow())
+            breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(BREAKER_STATE.value(name='test-breaker'), 0)
+
+    def test_probe_that_never_reports_back_is_replaced(self):
+        breaker = CircuitBreaker('test-lost-probe', failure_threshold=1, reset_timeout=30)
+        with patch('apps.notifications.breaker.time.monotonic', return_value=100.0):
+            breaker.record_failure()
+        with patch('apps.notifications.breaker.time.monotonic', return_value=130.0):
+            self.assertTrue(breaker.allow())
+        with patch('apps.notifications.breaker.time.monotonic', return_value=159.0):
+            self.assertFalse(breaker.allow())
+        with patch('apps.notifications.breaker.time.monotonic', return_value=160.0):
+            self.assertTrue(breaker.allow())
+
+
+async def stalled_group_send(self, group, message):
+    await asyncio.sleep(10)
+
+
+@override_settings(CHANNEL_PUBLISH_TIMEOUT=0.05)
+class PublishTests(SimpleTestCase):
+    def setUp(self):
+        breaker = patch('apps.notifications.utils.publish_breaker', CircuitBreaker('test-publish', 2, 60))
+        self.breaker = breaker.start()
+        self.addCleanup(breaker.stop)
+
+    @patch.object(MemoryChannelLayer, 'group_send', stalled_group_send)
+    def test_stalled_layer_costs_at_most_the_timeout_then_is_skipped(self):
+        start = time.perf_counter()
+        self.assertFalse(publish('user_1', channel_event('new_message', {})))
+        self.assertFalse(publish('user_1', channel_event('new_message', {})))
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(CHANNEL_PUBLISH_FAILURES.value(type='new_message', reason='timeout'), 2)
+        self.assertEqual(self.breaker.state, 'open')
+
+        start = time.perf_counter()
+        self.assertFalse(publish('user_1', channel_event('new_message', {})))
+        self.assertLess(time.perf_counter() - start, 0.05)
+
+    @override_settings(CHANNEL_PUBLISH_TIMEOUT=5)
+    @patch.object(MemoryChannelLayer, 'group_send', stalled_group_send)
+    async def test_cancelled_probe_reopens_the_breaker(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.opened_at -= 60
+
+        probe = asyncio.ensure_future(apublish('user_1', channel_event('new_message', {})))
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.breaker.state, 'half_open')
+        probe.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probe
+        self.assertEqual(self.breaker.state, 'open')
+
+    @override_settings(CHANNEL_PUBLISH_TIMEOUT=5)
+    @patch.object(MemoryChannelLayer, 'group_send', stalled_group_send)
+    async def test_cancelled_publish_is_not_a_failure(self):
+        for _ in range(3):
+            publish = asyncio.ensure_future(apublish('user_1', channel_event('typing', {})))
+            await asyncio.sleep(0.01)
+            publish.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await publish
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_breaker_closes_when_the_layer_is_back(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.opened_at -= 60
+        self.assertTrue(publish('user_1', channel_event('new_message', {})))
+        self.assertEqual(self.breaker.state, 'closed')
+
+
+@override_settings(REACTION_NOTIFICATION_WINDOW=300, REACTION_PUSH_INTERVAL=60)
+@patch('apps.notifications.utils.notify_user')
+class ReactionNotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_later = patch('apps.notifications.utils.trailing_pushes.call_later')
+        self.call_later = call_later.start()
+        self.addCleanup(call_later.stop)
+        self.sender = User.objects.create_user(email='sender@example.com', password='pass1234')
+        self.receiver = User.objects.create_user(email='receiver@example.com', password='pass1234')
+        conversation = Conversation.objects.create()
+        conversation.participants.set([self.sender, self.receiver])
+        with patch('apps.chat.signals.notify_user'):
+            self.message = Message.objects.create(
+                conversation=conversation, sender=self.sender, receiver=self.receiver, content='hello'
+            )
+
+    def react(self, email, emoji='👍'):
+        user = User.objects.get_or_create(email=email)[0]
+        return Reaction.objects.update_or_create(message=self.message, user=user, defaults={'emoji': emoji})[0]
+
+    def reaction_notifications(self):
+        return Notification.objects.filter(notification_type='reaction')
+
+    def test_reactions_are_aggregated_into_one_notification(self, mock_notify):
+        for email in ('a@example.com', 'b@example.com', 'c@example.com'):
+            self.react(email)
+        self.react('a@example.com', '❤️')
+
+        notification = self.reaction_notifications().get()
+        self.assertEqual(notification.user, self.sender)
+        self.assertEqual(notification.actor_count, 3)
+        self.assertEqual(notification.reaction.emoji, '❤️')
+        mock_notify.assert_called_once()
+        # one trailing push for the rest of the interval
+        self.call_later.assert_called_once()
+        delay, send, notification_id = self.call_later.call_args[0]
+        self.assertLessEqual(delay, 60)
+
+        send(notification_id)
+        self.assertEqual(mock_notify.call_count, 2)
+        self.assertEqual(mock_notify.call_args[0][2]['actor_count'], 3)
+        self.assertEqual(mock_notify.call_args[0][2]['emoji'], '❤️')
+
+        self.react('b@example.com', '🎉')
+        self.assertEqual(self.call_later.call_count, 2)
+
+    def test_new_notification_after_seen_or_window(self, mock_notify):
+        self.react('a@example.com')
+        self.reaction_notifications().update(is_seen=True)
+        self.react('b@example.com')
+        self.assertEqual(self.reaction_notifications().count(), 2)
+
+        # past the window the unseen notification comes back to the top
+        stale = timezone.now() - timedelta(seconds=301)
+        self.reaction_notifications().update(created_at=stale, updated_at=stale)
+        self.react('c@example.com')
+        self.assertEqual(self.reaction_notifications().count(), 2)
+        self.assertGreater(self.reaction_notifications().get(is_seen=False).created_at, stale)
+
+    def test_one_unseen_reaction_notification_per_message(self, mock_notify):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Notification._meta.db_table)
+        if 'unique_unseen_reaction_notification' not in constraints:
+            self.skipTest("the constraint is not created on a partitioned table")
+        self.react('a@example.com')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Notification.objects.create(user=self.sender, message=self.message, notification_type='reaction')
+
+    def test_removed_reaction_is_attributed_to_the_reactor(self, mock_notify):
+        self.receiver.full_name = 'Receiver'
+        self.receiver.save()
+        Reaction.objects.create(message=self.message, user=self.receiver, emoji='👍').delete()
+
+        notification = self.reaction_notifications().get()
+        self.assertIsNone(notification.reaction)
+        self.assertEqual(NotificationConsumer.actor_name(notification), 'Receiver')
+
+    def test_removing_a_reaction_keeps_the_notification(self, mock_notify):
+        self.react('a@example.com').delete()
+        self.assertIsNone(self.reaction_notifications().get().reaction)
@@ -1,12 +1,87 @@
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+import asyncio
 import json
+import logging
+import time
+from datetime import timedelta
+from apps.chat.models import Message, Reaction
+from apps.monitoring.metrics import Counter, Histogram, timed
+from apps.monitoring.tracing import inject, traced
+from apps.notifications.breaker import CLOSED, CircuitBreaker
 from apps.notifications.models import Notification
+from apps.notifications.scheduler import Scheduler
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
 
+NOTIFY_USER_SECONDS = Histogram('notify_user_duration_seconds', "notify_user latency, lookups included")
+CHANNEL_PUBLISH_SECONDS = Histogram('channel_layer_publish_seconds', "Channel layer group_send latency", ['type'])
+CHANNEL_PUBLISH_FAILURES = Counter(
+    'channel_layer_publish_failures_total', "Channel layer publishes that failed or timed out", ['type', 'reason']
+)
+
+logger = logging.getLogger(__name__)
+
+# one breaker for every publish of the process: when the layer is down, it is
+# down for all groups
+publish_breaker = CircuitBreaker(
+    'channel_layer', settings.CHANNEL_BREAKER_FAILURES, settings.CHANNEL_BREAKER_RESET_SECONDS
+)
+
+# trailing reaction pushes, one thread for the process
+trailing_pushes = Scheduler('trailing-pushes')
+
+def channel_event(event_type, data):
+    """
+    Build a channel layer event carrying the current trace context and its
+    publish time, so the consumer can continue the trace and measure delivery.
+    """
+    return inject({"type": event_type, "data": data, "published_at": time.time()})
+
+async def apublish(group, event):
+    """
+    group_send behind the publish breaker, giving up after
+    CHANNEL_PUBLISH_TIMEOUT seconds. Returns whether the event was published;
+    events that were not are only missed live, clients catch up from the
+    Notification rows when they reconnect.
+    """
+    event_type = event["type"]
+    if not publish_breaker.allow():
+        return False
+    probe = publish_breaker.state != CLOSED
+    try:
+        with CHANNEL_PUBLISH_SECONDS.timer(type=event_type):
+            await asyncio.wait_for(
+                get_channel_layer().group_send(group, event), settings.CHANNEL_PUBLISH_TIMEOUT
+            )
+    except Exception as exc:
+        reason = "timeout" if isinstance(exc, asyncio.TimeoutError) else "error"
+        CHANNEL_PUBLISH_FAILURES.inc(type=event_type, reason=reason)
+        publish_breaker.record_failure()
+        logger.warning(
+            "Channel layer publish failed",
+            exc_info=reason == "error",
+            extra={'group': group, 'event_type': event_type, 'reason': reason},
+        )
+        return False
+    except BaseException:
+        # cancelled (e.g. the client went away): says nothing about the layer,
+        # except that a cancelled probe must not leave the breaker half open
+        if probe:
+            publish_breaker.record_failure()
+        raise
+    publish_breaker.record_success()
+    return True
+
+def publish(group, event):
+    return async_to_sync(apublish)(group, event)
+
+@traced('notify_user')
+@timed(NOTIFY_USER_SECONDS)
 def notify_user(user_id, notification_type, data):
-    channel_layer = get_channel_layer()
-    
     # Add type field to data for frontend processing
     data['type'] = notification_type
     
@@ -36,14 +111,102 @@ def notify_user(user_id, notification_type, data):
         except User.DoesNotExist:
             pass
     
-    async_to_sync(channel_layer.group_send)(
-        f"user_{user_id}",
+    publish(f"user_{user_id}", channel_event(notification_type, data))
+
+def conversation_group(conversation_id):
+    return f"conv_{conversation_id}"
+
+def notify_conversation(conversation_id, event_type, data):
+    """
+    Publish a live event once to the sockets subscribed to the conversation,
+    instead of once per participant. Only clients with the chat open get it;
+    badges and notifications stay on the per-user groups.
+    """
+    data['type'] = event_type
+    publish(conversation_group(conversation_id), channel_event(event_type, data))
+
+def notify_reaction(reaction):
+    """
+    Fold a reaction into the recipient's unseen reaction notification for the
+    message instead of creating a row per reaction, and push it at most once
+    every REACTION_PUSH_INTERVAL seconds: the first update of an interval is
+    pushed at once and the latest state once more when the interval ends.
+
+    The message row is locked while the notification is looked up, so
+    concurrent first reactions fold into the same row (the partial unique
+    constraint backs this up where the table is not partitioned). A
+    notification last updated more than REACTION_NOTIFICATION_WINDOW
+    seconds ago is brought back to the top as if it were new.
+    """
+    message = reaction.message
+    # notify the other participant, not the reactor
+    recipient_id = message.sender_id if message.sender_id != reaction.user_id else message.receiver_id
+    now = timezone.now()
+    since = now - timedelta(seconds=settings.REACTION_NOTIFICATION_WINDOW)
+    actor_count = max(Reaction.objects.filter(message=message).exclude(user_id=recipient_id).count(), 1)
+
+    with transaction.atomic():
+        # serializes notify_reaction per message; the constraint alone is missing on partitioned tables
+        Message.all_objects.select_for_update(no_key=True).only('pk').get(pk=message.pk)
+        notification = Notification.objects.filter(
+            user_id=recipient_id, message=message, notification_type='reaction', is_seen=False,
+        ).order_by('-id').first()
+        if notification is None:
+            notification = Notification.objects.create(
+                user_id=recipient_id,
+                message=message,
+                reaction=reaction,
+                notification_type='reaction',
+                actor_count=actor_count,
+            )
+        else:
+            notification.reaction = reaction
+            notification.actor_count = actor_count
+            update_fields = ['reaction', 'actor_count', 'updated_at']
+            if notification.updated_at < since:
+                notification.created_at = now
+                update_fields.append('created_at')
+            notification.save(update_fields=update_fields)
+
+    push_key = f"reaction_push:{notification.id}"
+    if cache.add(push_key, time.time(), timeout=settings.REACTION_PUSH_INTERVAL):
+        push_reaction_notification(notification, message, reaction)
+    elif cache.add(f"reaction_push_pending:{notification.id}", 1, timeout=settings.REACTION_PUSH_INTERVAL * 2):
+        # later updates in the interval get one trailing push when it ends
+        opened = cache.get(push_key) or time.time()
+        trailing_pushes.call_later(
+            max(opened + settings.REACTION_PUSH_INTERVAL - time.time(), 0),
+            send_trailing_reaction_push, notification.id,
+        )
+    return notification
+
+def push_reaction_notification(notification, message, reaction):
+    notify_user(
+        notification.user_id,
+        "reaction",
         {
-            "type": notification_type,
-            "data": data
+            "notification_id": notification.id,
+            "message_id": message.id,
+            "user_id": reaction.user_id if reaction else None,  # Who reacted last
+            "emoji": reaction.emoji if reaction else None,
+            "actor_count": notification.actor_count,
+            "timestamp": str(message.timestamp)
         }
     )
 
+def send_trailing_reaction_push(notification_id):
+    """
+    Push the latest state of a reaction notification at the end of a push
+    interval, starting a new interval. Runs on the trailing_pushes thread.
+    """
+    cache.delete(f"reaction_push_pending:{notification_id}")
+    notification = Notification.objects.select_related('message', 'reaction').filter(
+        id=notification_id, is_seen=False,
+    ).first()
+    if notification and notification.message:
+        cache.set(f"reaction_push:{notification_id}", time.time(), timeout=settings.REACTION_PUSH_INTERVAL)
+        push_reaction_notification(notification, notification.message, notification.reaction)
+
 def mark_notifications_as_seen(user_id, notification_ids=None):
     """
     Mark notifications as seen for a user
@@ -60,16 +223,12 @@ def mark_notifications_as_seen(user_id, notification_ids=None):
     
     # Notify client about seen status update
     if count > 0:
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"user_{user_id}",
-            {
+            channel_event("notifications_seen", {
                 "type": "notifications_seen",
-                "data": {
-                    "type": "notifications_seen",
-                    "notification_ids": list(notifications.values_list('id', flat=True))
-                }
-            }
+                "notification_ids": list(notifications.values_list('id', flat=True))
+            })
         )
     
     return count
\ No newline at end of file
@@ -14,7 +14,8 @@ class NotificationListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user)
+        # hide notifications about deleted messages until they are purged
+        return Notification.objects.filter(user=self.request.user).exclude(message__deleted_at__isnull=False)
     
     @swagger_auto_schema(
         operation_description="List all notifications for the authenticated user",
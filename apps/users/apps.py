@@ -5,4 +5,6 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
 
-
+    def ready(self):
+        import apps.users.checks
+        import apps.users.signals
@@ -0,0 +1,46 @@
+"""
+Versioned cache for serialized user data.
+
+Every cache key embeds a global users version, so bumping the version on
+any user create/update/delete invalidates all cached pages at once.
+
+The version lives in the cache itself, so only a cache shared by every
+worker (Redis, via REDIS_URL) invalidates pages across processes; with the
+in-process fallback a bump only reaches the process that made it (see the
+users.W001 deploy check). Cached pages hold absolute URLs, so keys also
+include the origin the request was made to.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+VERSION_KEY = 'users:version'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # time based, so an evicted version never comes back with stale pages
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def make_key(name, params=None, origin=''):
+    """
+    Return (cache_key, etag) for `name`, the request parameters and the
+    origin (scheme and host) absolute URLs in the page are built from.
+    """
+    version = get_version()
+    query = urlencode(sorted((params or {}).items()))
+    digest = hashlib.md5(f"{origin}/{name}?{query}".encode()).hexdigest()
+    return f"users:{name}:{version}:{digest}", f'"{version}-{digest}"'
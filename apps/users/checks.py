@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Cached user pages are invalidated by bumping a version stored in the
+    cache, which only reaches other worker processes through a shared cache.
+    """
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+        return [Warning(
+            "The default cache is process-local, so cached user pages are only "
+            "invalidated in the process that changed a user.",
+            hint="Set REDIS_URL so every worker shares the cache.",
+            id='users.W001',
+        )]
+    return []
@@ -0,0 +1,21 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from apps.users.models import CustomUser
+from apps.users.thumbnails import _generate_in_worker, get_executor, needs_variants
+
+
+class Command(BaseCommand):
+    help = "Generate missing or outdated profile photo variants for existing users."
+
+    def handle(self, *args, **options):
+        user_ids = [
+            user.pk for user in CustomUser.objects.exclude(profile_photo='').exclude(profile_photo=None).iterator()
+            if needs_variants(user)
+        ]
+        futures = [get_executor().submit(_generate_in_worker, user_id) for user_id in user_ids]
+        for done, _ in enumerate(as_completed(futures), start=1):
+            if done % 100 == 0:
+                self.stdout.write(f"{done}/{len(futures)} users processed")
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {len(futures)} users"))
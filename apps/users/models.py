@@ -1,7 +1,9 @@
 from django.db import models
 
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.contrib.postgres.indexes import OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 class CustomUserManager(BaseUserManager):
@@ -23,6 +25,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
     full_name = models.CharField(max_length=255)
     profile_photo = models.ImageField(upload_to="avatars/", null=True, blank=True)
+    # resized copies of profile_photo, see apps/users/thumbnails.py
+    profile_photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
@@ -33,6 +37,14 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = ["full_name"]
 
     username = None
+
+    class Meta:
+        indexes = [
+            # prefix search in UserListView (istartswith compares UPPER(column))
+            models.Index(OpClass(Upper('email'), name='text_pattern_ops'), name='user_email_prefix_idx'),
+            models.Index(OpClass(Upper('full_name'), name='text_pattern_ops'), name='user_full_name_prefix_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
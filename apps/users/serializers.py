@@ -1,11 +1,35 @@
 from rest_framework import serializers
 from .models import CustomUser
 from django.contrib.auth import authenticate
+from .thumbnails import variant_urls
+
+
+class ProfilePhotoVariantsField(serializers.Field):
+    """
+    Read-only {size: {format: url}} map of the user's resized profile photos.
+    """
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, user):
+        urls = variant_urls(user)
+        request = self.context.get('request')
+        if urls and request is not None:
+            urls = {
+                size: {fmt: request.build_absolute_uri(url) for fmt, url in formats.items()}
+                for size, formats in urls.items()
+            }
+        return urls
+
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_photo_variants = ProfilePhotoVariantsField()
+
     class Meta:
         model = CustomUser
-        fields = ['id', 'email', 'full_name', 'profile_photo']
+        fields = ['id', 'email', 'full_name', 'profile_photo', 'profile_photo_variants']
         read_only_fields = ['id']
 
 class RegisterSerializer(serializers.ModelSerializer):
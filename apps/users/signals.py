@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+
+from apps.users.cache import bump_version
+from apps.users.models import CustomUser
+from apps.users.thumbnails import needs_variants, schedule_variants
+
+
+def invalidate_user_cache(sender, instance, update_fields=None, **kwargs):
+    # logins only touch last_login, which is never serialized
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_version()
+
+
+def handle_profile_photo(sender, instance, **kwargs):
+    if needs_variants(instance):
+        schedule_variants(instance)
+
+
+post_save.connect(invalidate_user_cache, sender=CustomUser)
+post_save.connect(handle_profile_photo, sender=CustomUser)
+post_delete.connect(invalidate_user_cache, sender=CustomUser)
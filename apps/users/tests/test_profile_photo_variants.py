@@ -0,0 +1,83 @@
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from apps.users.models import CustomUser
+from apps.users.thumbnails import generate_variants, needs_variants
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings):
+    with tempfile.TemporaryDirectory() as path:
+        settings.MEDIA_ROOT = path
+        yield path
+
+
+def make_photo(color='red', size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@pytest.fixture
+def user():
+    return CustomUser.objects.create_user(
+        email='photo@example.com', full_name='Photo User', password='pass1234', profile_photo=make_photo()
+    )
+
+
+def test_generate_variants_writes_each_size_and_format(user, settings):
+    variants = generate_variants(user)
+
+    assert variants['source'] == user.profile_photo.name
+    assert set(variants['sizes']) == {str(size) for size in settings.AVATAR_VARIANT_SIZES}
+    name = variants['sizes']['48']['webp']
+    with user.profile_photo.storage.open(name) as fh:
+        image = Image.open(fh)
+        assert image.format == 'WEBP'
+        assert image.size == (48, 48)
+    user.refresh_from_db()
+    assert not needs_variants(user)
+
+
+def test_variant_names_are_content_hashed(user):
+    other = CustomUser.objects.create_user(
+        email='other@example.com', full_name='Other', password='pass1234', profile_photo=make_photo()
+    )
+    blue = CustomUser.objects.create_user(
+        email='blue@example.com', full_name='Blue', password='pass1234', profile_photo=make_photo('blue')
+    )
+    same = generate_variants(user)['sizes']['96']['jpeg']
+    assert generate_variants(other)['sizes']['96']['jpeg'] == same
+    assert generate_variants(blue)['sizes']['96']['jpeg'] != same
+
+
+def test_upload_schedules_variants_after_commit(django_capture_on_commit_callbacks):
+    with patch('apps.users.thumbnails.get_executor') as get_executor:
+        with django_capture_on_commit_callbacks(execute=True):
+            user = CustomUser.objects.create_user(
+                email='new@example.com', full_name='New', password='pass1234', profile_photo=make_photo()
+            )
+    get_executor.return_value.submit.assert_called_once()
+    assert get_executor.return_value.submit.call_args.args[1] == user.pk
+
+
+def test_serializer_exposes_variant_urls(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    response = client.get(reverse('user-detail'))
+    assert response.json()['profile_photo_variants'] is None
+
+    generate_variants(user)
+    response = client.get(reverse('user-detail'))
+    variants = response.json()['profile_photo_variants']
+    assert variants['256']['webp'].startswith('http://testserver/media/avatars/variants/')
@@ -9,6 +9,14 @@ import pytest
 pytestmark = pytest.mark.django_db
 
 
+@pytest.fixture(autouse=True)
+def media_root(settings):
+    # uploaded avatars go to a throwaway directory, not the project's media/
+    with tempfile.TemporaryDirectory() as path:
+        settings.MEDIA_ROOT = path
+        yield path
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -0,0 +1,92 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.users.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def users():
+    return [
+        CustomUser.objects.create_user(email='alice@example.com', full_name='Alice Smith', password='pass1234'),
+        CustomUser.objects.create_user(email='bob@example.com', full_name='Bob Jones', password='pass1234'),
+        CustomUser.objects.create_user(email='carol@example.com', full_name='Alina Brown', password='pass1234'),
+    ]
+
+
+def test_user_list_is_paginated(api_client, users):
+    response = api_client.get(reverse('user-list'), {'page_size': 2})
+    assert response.status_code == 200
+    assert response.data['count'] == 3
+    assert len(response.data['results']) == 2
+    assert response.data['next'] is not None
+
+
+def test_user_list_prefix_search(api_client, users):
+    response = api_client.get(reverse('user-list'), {'search': 'ali'})
+    emails = {user['email'] for user in response.data['results']}
+    assert emails == {'alice@example.com', 'carol@example.com'}
+
+
+def test_user_list_served_from_cache(api_client, users, django_assert_num_queries):
+    api_client.get(reverse('user-list'))
+    with django_assert_num_queries(0):
+        response = api_client.get(reverse('user-list'))
+    assert response.data['count'] == 3
+
+
+def test_user_change_invalidates_cache(api_client, users):
+    api_client.get(reverse('user-list'))
+    CustomUser.objects.create_user(email='dave@example.com', full_name='Dave', password='pass1234')
+    response = api_client.get(reverse('user-list'))
+    assert response.data['count'] == 4
+
+    users[0].full_name = 'Alice Cooper'
+    users[0].save()
+    response = api_client.get(reverse('user-list'), {'search': 'alice'})
+    assert response.data['results'][0]['full_name'] == 'Alice Cooper'
+
+
+def test_user_list_etag_not_modified(api_client, users):
+    response = api_client.get(reverse('user-list'))
+    etag = response['ETag']
+
+    response = api_client.get(reverse('user-list'), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    users[1].delete()
+    response = api_client.get(reverse('user-list'), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def test_cached_pages_are_kept_per_host(api_client, users, settings):
+    settings.ALLOWED_HOSTS = ['testserver', 'example.com']
+    response = api_client.get(reverse('user-list'), {'page_size': 2}, HTTP_HOST='testserver')
+    assert response.data['next'].startswith('http://testserver/')
+
+    response = api_client.get(reverse('user-list'), {'page_size': 2}, HTTP_HOST='example.com')
+    assert response.data['next'].startswith('http://example.com/')
+
+
+def test_process_local_cache_is_reported(settings):
+    from apps.users.checks import check_shared_cache
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    assert [warning.id for warning in check_shared_cache(None)] == ['users.W001']
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+    assert check_shared_cache(None) == []
@@ -0,0 +1,111 @@
+"""
+Fixed-size profile photo variants.
+
+Variants are generated off the request path in a small thread pool once the
+upload is committed. File names are derived from the source image hash, so
+a URL always points at the same bytes and can be cached indefinitely by a
+CDN.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from apps.users.cache import bump_version
+from apps.users.models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.AVATAR_WORKERS, thread_name_prefix='avatar-variants'
+        )
+    return _executor
+
+
+def needs_variants(user):
+    return bool(user.profile_photo) and user.profile_photo_variants.get('source') != user.profile_photo.name
+
+
+def schedule_variants(user):
+    """
+    Generate variants for `user` in the worker pool after the current
+    transaction commits.
+    """
+    user_id = user.pk
+    transaction.on_commit(lambda: get_executor().submit(_generate_in_worker, user_id))
+
+
+def _generate_in_worker(user_id):
+    close_old_connections()
+    try:
+        user = CustomUser.objects.filter(pk=user_id).first()
+        if user and needs_variants(user):
+            generate_variants(user)
+    except Exception:
+        logger.exception("Generating profile photo variants failed for user %s", user_id)
+    finally:
+        close_old_connections()
+
+
+def _render(image, size, image_format):
+    variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, format=image_format, quality=settings.AVATAR_VARIANT_QUALITY)
+    return buffer.getvalue()
+
+
+def generate_variants(user):
+    """
+    Write every size/format variant of the user's current photo and record
+    their storage names on the user.
+    """
+    photo = user.profile_photo
+    storage = photo.storage
+    with photo.open('rb') as fh:
+        source = fh.read()
+    digest = hashlib.sha256(source).hexdigest()[:16]
+
+    with Image.open(BytesIO(source)) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        sizes = {}
+        for size in settings.AVATAR_VARIANT_SIZES:
+            sizes[str(size)] = {}
+            for extension, image_format in FORMATS.items():
+                name = f"avatars/variants/{digest}_{size}.{extension}"
+                if not storage.exists(name):
+                    name = storage.save(name, ContentFile(_render(image, size, image_format)))
+                sizes[str(size)][extension] = name
+
+    variants = {'source': photo.name, 'sizes': sizes}
+    # only apply if the photo was not replaced while we were working
+    if CustomUser.objects.filter(pk=user.pk, profile_photo=photo.name).update(profile_photo_variants=variants):
+        user.profile_photo_variants = variants
+        bump_version()
+    return variants
+
+
+def variant_urls(user):
+    """
+    Return {size: {format: url}} for the user's current photo, or None if
+    the variants are missing or belong to a previous photo.
+    """
+    if not user.profile_photo or needs_variants(user):
+        return None
+    storage = user.profile_photo.storage
+    return {
+        size: {extension: storage.url(name) for extension, name in formats.items()}
+        for size, formats in user.profile_photo_variants.get('sizes', {}).items()
+    }
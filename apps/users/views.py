@@ -13,6 +13,11 @@ from rest_framework.permissions import AllowAny
 from django.contrib.auth import get_user_model
 from django.http import JsonResponse
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from .cache import make_key
 
 
 def get_tokens_for_user(user, response=None):
@@ -149,7 +154,9 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     @swagger_auto_schema(operation_description="Get current user's profile.")
     def get(self, request, *args, **kwargs):
-        return self.retrieve(request, *args, **kwargs)
+        return cached_response(
+            request, f'profile:{request.user.pk}', lambda: self.retrieve(request, *args, **kwargs).data
+        )
 
     @swagger_auto_schema(operation_description="Update current user's profile.")
     def put(self, request, *args, **kwargs):
@@ -172,18 +179,57 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 
+class UserPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+def cached_response(request, name, build):
+    """
+    Serve `build()` from the versioned user cache, answering with 304 when
+    the client's If-None-Match matches the current ETag.
+    """
+    # pages hold absolute URLs (photos, pagination links) for the requested host
+    key, etag = make_key(name, request.query_params.dict(), request.build_absolute_uri('/'))
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.USER_CACHE_TIMEOUT)
+    return Response(data, headers={'ETag': etag})
+
+
 class UserListView(generics.ListAPIView):
-    queryset = get_user_model().objects.all()
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
+    pagination_class = UserPagination
+
+    def get_queryset(self):
+        queryset = get_user_model().objects.order_by('id')
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = queryset.filter(Q(email__istartswith=search) | Q(full_name__istartswith=search))
+        return queryset
 
     @swagger_auto_schema(
-        operation_description="Retrieve a list of all users.",
+        operation_description="Retrieve a paginated list of users, optionally filtered by an email or name prefix.",
         operation_summary="Get all users",
-        responses={200: UserSerializer(many=True)}
+        manual_parameters=[
+            openapi.Parameter(
+                'search',
+                openapi.IN_QUERY,
+                description="Email or full name prefix",
+                type=openapi.TYPE_STRING,
+                required=False
+            )
+        ],
+        responses={200: UserSerializer(many=True), 304: "Not modified"}
     )
     def get(self, request, *args, **kwargs):
         """
         Retrieve a list of all users.
         """
-        return super().get(request, *args, **kwargs)
\ No newline at end of file
+        return cached_response(request, 'list', lambda: self.list(request, *args, **kwargs).data)
@@ -0,0 +1,88 @@
+"""
+HTTP hot paths, called in-process through the DRF test client.
+"""
+import os
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.chat.bulk import muted_signals
+from apps.chat.models import Conversation, Message
+from apps.notifications.models import Notification
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+CONVERSATION_SIZES = [
+    int(size) for size in os.environ.get('BENCH_CONVERSATION_SIZES', '10,1000,100000').split(',')
+]
+
+
+@pytest.fixture
+def users():
+    return (
+        User.objects.create_user(email='sender@bench.local', password='pass1234', full_name='Sender'),
+        User.objects.create_user(email='receiver@bench.local', password='pass1234', full_name='Receiver'),
+    )
+
+
+@pytest.fixture
+def client(users):
+    client = APIClient()
+    client.force_authenticate(user=users[0])
+    return client
+
+
+def create_conversation(sender, receiver, size):
+    conversation = Conversation.objects.create()
+    conversation.participants.set([sender, receiver])
+    with muted_signals():
+        Message.objects.bulk_create(
+            (
+                Message(
+                    conversation=conversation,
+                    sender=sender if i % 2 else receiver,
+                    receiver=receiver if i % 2 else sender,
+                    content=f"benchmark message {i}",
+                )
+                for i in range(size)
+            ),
+            batch_size=5000,
+        )
+    return conversation
+
+
+def test_message_create(bench_settings, benchmark, client, users):
+    url = reverse('message-send')
+    payload = {'receiver': users[1].id, 'content': 'hello'}
+
+    with patch('apps.chat.views.GetStreamService'):
+        response = benchmark(client.post, url, payload, rounds=50)
+    assert response.status_code == 201
+
+
+@pytest.mark.parametrize('size', CONVERSATION_SIZES)
+def test_conversation_detail(bench_settings, benchmark, client, users, size):
+    conversation = create_conversation(*users, size)
+    url = reverse('conversation-detail', kwargs={'pk': conversation.pk})
+
+    benchmark.extra['messages'] = size
+    response = benchmark(client.get, url, rounds=20 if size <= 1000 else 3, warmup=1)
+    assert response.status_code == 200
+
+
+def test_notification_list(bench_settings, benchmark, client, users):
+    conversation = create_conversation(users[1], users[0], 200)
+    Notification.objects.bulk_create(
+        Notification(user=users[0], message=message, notification_type='new_message')
+        for message in conversation.messages.all()
+    )
+    url = reverse('notification-list')
+
+    benchmark.extra['notifications'] = 200
+    response = benchmark(client.get, url, rounds=20)
+    assert response.status_code == 200
@@ -0,0 +1,159 @@
+"""
+NotificationConsumer connect and group fan-out on the in-memory channel layer,
+and the in-process channel layers on their own.
+"""
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.utils.module_loading import import_string
+
+from apps.notifications.codecs import JSONCodec, MsgpackCodec
+from apps.notifications.consumers import NotificationConsumer
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(email='socket@bench.local', password='pass1234')
+
+
+async def connect(user):
+    communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), "/ws/notifications/")
+    communicator.scope['user'] = user
+    connected, _ = await communicator.connect()
+    assert connected
+    await communicator.receive_json_from()  # initial notifications
+    return communicator
+
+
+def test_connect(bench_settings, benchmark, user):
+    async def connect_and_close():
+        communicator = await connect(user)
+        await communicator.disconnect()
+
+    benchmark(connect_and_close, rounds=30)
+
+
+@pytest.mark.parametrize('sockets', [1, 10, 100])
+def test_fan_out(bench_settings, benchmark, user, sockets):
+    """
+    One group_send to a user with `sockets` open connections, until every
+    socket received the event.
+    """
+    async def fan_out():
+        communicators = [await connect(user) for _ in range(sockets)]
+        layer = get_channel_layer()
+        event = {'type': 'new_message', 'data': {'type': 'new_message', 'message_id': 1}}
+
+        loop = asyncio.get_running_loop()
+        samples = []
+        for _ in range(20):
+            start = loop.time()
+            await layer.group_send(f"user_{user.id}", event)
+            await asyncio.gather(*(c.receive_json_from() for c in communicators))
+            samples.append(loop.time() - start)
+
+        for communicator in communicators:
+            await communicator.disconnect()
+        return samples
+
+    benchmark.extra['sockets'] = sockets
+    benchmark.record(async_to_sync(fan_out)())
+
+
+@pytest.mark.parametrize('subprotocol,flush_ms', [
+    (None, 0), ('letschat.json-batch.v1', 0), ('letschat.json-batch.v1', 5),
+], ids=['json', 'json-batch', 'json-batch-linger'])
+def test_burst(bench_settings, benchmark, user, subprotocol, flush_ms):
+    """
+    A burst of 20 events to one socket, until all of them arrived; frames
+    per burst in extra.
+    """
+    bench_settings.WS_FLUSH_INTERVAL_MS = flush_ms
+
+    async def bursts():
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(), "/ws/notifications/", subprotocols=[subprotocol] if subprotocol else []
+        )
+        communicator.scope['user'] = user
+        await communicator.connect()
+        await communicator.receive_from()
+        layer = get_channel_layer()
+
+        loop = asyncio.get_running_loop()
+        samples, frames = [], 0
+        for _ in range(20):
+            start = loop.time()
+            for i in range(20):
+                await layer.group_send(
+                    f"user_{user.id}", {'type': 'new_message', 'data': {'type': 'new_message', 'message_id': i}}
+                )
+            received = 0
+            while received < 20:
+                frame = json.loads(await communicator.receive_from())
+                received += len(frame) if isinstance(frame, list) else 1
+                frames += 1
+            samples.append(loop.time() - start)
+
+        await communicator.disconnect()
+        return samples, frames / 20
+
+    samples, benchmark.extra['frames_per_burst'] = async_to_sync(bursts)()
+    benchmark.record(samples)
+
+
+@pytest.mark.parametrize('codec', [JSONCodec(), MsgpackCodec()], ids=['json', 'msgpack'])
+def test_encode(benchmark, codec):
+    """
+    Serializing 50 queued reaction/message events, frame bytes in extra.
+    """
+    batch = [
+        {'type': 'reaction', 'notification_id': i, 'message_id': i, 'user_id': 3, 'emoji': '👍',
+         'actor_count': 2, 'reactor_data': {'id': 3, 'name': 'Amina Kamau'}, 'timestamp': '2025-01-01 10:00:00+00:00'}
+        if i % 2 else
+        {'type': 'new_message', 'notification_id': i, 'message_id': i, 'sender_id': 4, 'content': 'See you at lunch',
+         'sender_data': {'id': 4, 'name': 'Brian Okafor'}, 'conversation_id': 9, 'timestamp': '2025-01-01 10:00:00+00:00'}
+        for i in range(50)
+    ]
+
+    def encode():
+        frames = []
+        size = 50 if codec.batching else 1
+        for start in range(0, len(batch), size):
+            frames.extend(codec.encode(batch[start:start + size]))
+        return frames
+
+    frames = encode()
+    benchmark.extra['frames'] = len(frames)
+    benchmark.extra['bytes'] = sum(len(text.encode() if text else data) for text, data in frames)
+    benchmark(encode, rounds=200)
+
+
+@pytest.mark.parametrize('backend', [
+    'channels.layers.InMemoryChannelLayer', 'apps.notifications.layers.MemoryChannelLayer',
+], ids=['channels-inmemory', 'memory'])
+def test_layer_group_send(benchmark, backend):
+    """
+    One group_send to 100 waiting channels, until all of them received it,
+    on the in-process layers alone.
+    """
+    layer = import_string(backend)()
+
+    async def group_send():
+        channels = [await layer.new_channel() for _ in range(100)]
+        for channel in channels:
+            await layer.group_add('conv_1', channel)
+        event = {'type': 'new_message', 'data': {'type': 'new_message', 'message_id': 1, 'content': 'hi'}}
+        await layer.group_send('conv_1', event)
+        await asyncio.gather(*(layer.receive(channel) for channel in channels))
+        await layer.flush()
+
+    benchmark(group_send, rounds=100)
@@ -0,0 +1,44 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+    python benchmarks/compare.py old.json new.json [--threshold 0.1]
+
+Exits with status 1 when a benchmark's median got slower by more than the
+threshold (a fraction, default 10%).
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding='utf-8') as fh:
+        return {bench['name']: bench for bench in json.load(fh)['benchmarks'] if 'median' in bench}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    regressions = 0
+    print(f"{'benchmark':60} {'old ms':>10} {'new ms':>10} {'change':>8}")
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name]['median'] * 1000, new[name]['median'] * 1000
+        change = (after - before) / before if before else 0.0
+        flag = ''
+        if change > args.threshold:
+            regressions += 1
+            flag = '  REGRESSION'
+        print(f"{name[:60]:60} {before:10.2f} {after:10.2f} {change:+8.1%}{flag}")
+    for name in sorted(new.keys() - old.keys()):
+        print(f"{name[:60]:60} {'-':>10} {new[name]['median'] * 1000:10.2f}      new")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark fixtures.
+
+Benchmarks live in bench_*.py files, which the regular test run does not
+collect. Run them explicitly:
+
+    pytest benchmarks/bench_*.py
+
+Every call of the `benchmark` fixture is timed over several rounds and the
+statistics of the whole session are written as JSON to BENCH_JSON (default
+benchmarks/results/<timestamp>.json). Compare two runs with
+`python benchmarks/compare.py old.json new.json`.
+"""
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+RESULTS = []
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    mean = statistics.fmean(ordered)
+    return {
+        'rounds': len(ordered),
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': mean,
+        'median': statistics.median(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'stddev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'ops': 1 / mean if mean else 0.0,
+    }
+
+
+class Benchmark:
+    """
+    Times a callable (or coroutine function) and records its statistics,
+    plus the number of queries a single call runs.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.extra = {}
+
+    def __call__(self, func, *args, rounds=20, warmup=2, **kwargs):
+        if inspect.iscoroutinefunction(func):
+            func = async_to_sync(func)
+        for _ in range(warmup):
+            func(*args, **kwargs)
+
+        with CaptureQueriesContext(connection) as queries:
+            func(*args, **kwargs)
+        self.extra.setdefault('queries', len(queries))
+
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            samples.append(time.perf_counter() - start)
+
+        self.record(samples)
+        return result
+
+    def record(self, samples):
+        """
+        Record samples timed by the benchmark itself, e.g. inside one event loop.
+        """
+        RESULTS.append({'name': self.name, **summarize(samples), 'extra': self.extra})
+
+
+@pytest.fixture
+def benchmark(request):
+    return Benchmark(request.node.nodeid.split('::', 1)[-1])
+
+
+@pytest.fixture
+def bench_settings(settings):
+    """
+    Keep benchmarks self-contained: in-memory channel layer and no rate limits.
+    """
+    settings.CHANNEL_LAYERS = {"default": {"BACKEND": "apps.notifications.layers.MemoryChannelLayer"}}
+    settings.RATE_LIMITS = {}
+    return settings
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not RESULTS:
+        return
+    default = Path(__file__).parent / 'results' / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path = Path(os.environ.get('BENCH_JSON', default))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'benchmarks': RESULTS,
+    }, indent=2))
+    print(f"\nBenchmark results written to {path}")
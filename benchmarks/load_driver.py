@@ -0,0 +1,151 @@
+"""
+Standalone load driver for a running server (daphne/uvicorn), e.g.
+
+    python benchmarks/load_driver.py --base-url http://localhost:8000 \\
+        --email alice@example.com --password secret \\
+        --scenario send --receiver 2 --concurrency 20 --duration 30
+
+Scenarios:
+  send           POST /messages/send/ to --receiver
+  conversation   GET /conversations/<--conversation>/
+  notifications  GET /notifications/
+  websocket      keep --concurrency sockets open on /ws/notifications/ and
+                 count the events they receive (drive traffic with another
+                 instance running `send`)
+
+Prints latency percentiles and throughput and writes them as JSON (--output)
+in the same shape as the pytest benchmarks, so compare.py works on both.
+Note that sending is subject to the server's RATE_LIMITS.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+async def login(session, args):
+    async with session.post(f"{args.base_url}/auth/login/", json={
+        'email': args.email, 'password': args.password,
+    }) as response:
+        response.raise_for_status()
+        return (await response.json())['access']
+
+
+def build_request(args):
+    if args.scenario == 'send':
+        return 'POST', '/messages/send/', {'receiver': args.receiver, 'content': 'load test'}
+    if args.scenario == 'conversation':
+        return 'GET', f'/conversations/{args.conversation}/', None
+    return 'GET', '/notifications/', None
+
+
+async def http_worker(session, args, deadline, latencies, errors):
+    method, path, body = build_request(args)
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            async with session.request(method, f"{args.base_url}{path}", json=body) as response:
+                await response.read()
+                if response.status >= 400:
+                    errors[response.status] = errors.get(response.status, 0) + 1
+                    continue
+        except aiohttp.ClientError as exc:
+            errors[type(exc).__name__] = errors.get(type(exc).__name__, 0) + 1
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def socket_worker(session, args, token, deadline, counts):
+    url = f"{args.base_url.replace('http', 'ws', 1)}/ws/notifications/?token={token}"
+    # AllowedHostsOriginValidator rejects handshakes without an allowed Origin
+    async with session.ws_connect(url, origin=args.base_url) as socket:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                message = await socket.receive(timeout=remaining)
+            except asyncio.TimeoutError:
+                return
+            if message.type != aiohttp.WSMsgType.TEXT:
+                return
+            counts['events'] += 1
+
+
+async def run(args):
+    async with aiohttp.ClientSession() as anonymous:
+        token = args.token or await login(anonymous, args)
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    headers = {'Authorization': f'Bearer {token}'}
+    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+        deadline = time.monotonic() + args.duration
+        started = time.perf_counter()
+
+        if args.scenario == 'websocket':
+            counts = {'events': 0}
+            await asyncio.gather(*(
+                socket_worker(session, args, token, deadline, counts) for _ in range(args.concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+            return {'name': 'load:websocket', 'sockets': args.concurrency,
+                    'events': counts['events'], 'ops': counts['events'] / elapsed}
+
+        latencies, errors = [], {}
+        await asyncio.gather(*(
+            http_worker(session, args, deadline, latencies, errors) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        'name': f"load:{args.scenario}",
+        'rounds': len(ordered),
+        'min': ordered[0] if ordered else 0.0,
+        'max': ordered[-1] if ordered else 0.0,
+        'mean': sum(ordered) / len(ordered) if ordered else 0.0,
+        'median': percentile(ordered, 0.5),
+        'p95': percentile(ordered, 0.95),
+        'p99': percentile(ordered, 0.99),
+        'ops': len(ordered) / elapsed,
+        'errors': errors,
+        'extra': {'concurrency': args.concurrency, 'duration': args.duration},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--email')
+    parser.add_argument('--password')
+    parser.add_argument('--token', help="JWT access token (instead of --email/--password)")
+    parser.add_argument('--scenario', choices=['send', 'conversation', 'notifications', 'websocket'], default='send')
+    parser.add_argument('--receiver', type=int, help="Receiver id for the send scenario")
+    parser.add_argument('--conversation', type=int, help="Conversation id for the conversation scenario")
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--output', help="Write the result as JSON to this file")
+    args = parser.parse_args()
+
+    if not args.token and not (args.email and args.password):
+        parser.error("--token or --email and --password are required")
+    if args.scenario == 'send' and not args.receiver:
+        parser.error("--receiver is required for the send scenario")
+    if args.scenario == 'conversation' and not args.conversation:
+        parser.error("--conversation is required for the conversation scenario")
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump({'benchmarks': [result]}, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
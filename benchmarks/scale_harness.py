@@ -0,0 +1,283 @@
+"""
+Channel layer scaling harness: runs NotificationConsumer in several worker
+processes against one or more Redis shards, publishes events to the users'
+groups from this process, checks every event was delivered and reports
+throughput and delivery latency per worker count, e.g.
+
+    python benchmarks/scale_harness.py --shards 2 --workers 1,2,4 \\
+        --sockets 200 --events 20000
+
+--shards N starts N throwaway redis-server processes on free ports (the
+binary must be on PATH); --hosts redis://a:6379,redis://b:6379 uses existing
+servers instead, whose channel layer keys are flushed between runs. Sockets
+are driven in-process with channels' WebsocketCommunicator, so no HTTP server
+or database is needed (the consumer's unread notification lookup is skipped).
+
+Workers only add throughput while there are idle CPUs for them. Events to a
+worker's sockets share one channel, so raise CHANNEL_LAYER_CAPACITY when
+deliveries go missing under bursts.
+
+The JSON output (--output) has the same shape as the pytest benchmarks, with
+`median`/`p95` being delivery latency, so compare.py works on it.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# channels_redis logs every group_send to a full channel at INFO
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_redis(count):
+    """
+    Start `count` redis-server processes, returning them and their URLs.
+    """
+    if not shutil.which('redis-server'):
+        sys.exit("redis-server is not on PATH; pass --hosts instead of --shards")
+    servers, urls = [], []
+    for _ in range(count):
+        port = free_port()
+        servers.append(subprocess.Popen(
+            ['redis-server', '--port', str(port), '--save', '', '--appendonly', 'no'],
+            stdout=subprocess.DEVNULL,
+        ))
+        urls.append(f"redis://127.0.0.1:{port}")
+    import redis
+    for url in urls:
+        client = redis.Redis.from_url(url)
+        for _ in range(100):
+            try:
+                client.ping()
+                break
+            except redis.ConnectionError:
+                time.sleep(0.05)
+        else:
+            sys.exit(f"{url} did not start")
+    return servers, urls
+
+
+def harness_consumer():
+    from apps.notifications.consumers import NotificationConsumer
+
+    class HarnessConsumer(NotificationConsumer):
+        async def get_unread_notifications(self, user_id):
+            return []
+
+    return HarnessConsumer
+
+
+async def drain(communicator, expected, timeout):
+    """
+    Read `expected` events from one socket, returning their delivery latencies
+    and when the last one arrived.
+    """
+    latencies, last = [], 0.0
+    while len(latencies) < expected:
+        try:
+            event = await communicator.receive_json_from(timeout)
+        except asyncio.TimeoutError:
+            break
+        last = time.time()
+        latencies.append(last - event['sent_at'])
+    return latencies, last
+
+
+async def serve(first_user, sockets, expected, timeout, ready):
+    from channels.testing import WebsocketCommunicator
+
+    consumer = harness_consumer().as_asgi()
+    communicators = []
+    for user_id in range(first_user, first_user + sockets):
+        communicator = WebsocketCommunicator(consumer, '/ws/notifications/')
+        communicator.scope['user'] = SimpleNamespace(id=user_id, is_authenticated=True)
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise RuntimeError(f"Socket for user {user_id} was rejected")
+        await communicator.receive_json_from()  # initial_notifications
+        communicators.append(communicator)
+    ready.put(first_user)
+
+    drained = await asyncio.gather(*(drain(communicator, expected, timeout) for communicator in communicators))
+    for communicator in communicators:
+        await communicator.disconnect()
+    return [latency for latencies, _ in drained for latency in latencies], max(last for _, last in drained)
+
+
+def worker(first_user, sockets, expected, timeout, ready, results):
+    django.setup()
+    results.put(asyncio.run(serve(first_user, sockets, expected, timeout, ready)))
+
+
+async def publish(first, step, users, events, concurrency, rate, started):
+    """
+    Publish events first, first + step, ... with `concurrency` tasks, the
+    n-th event not before `started` + n / `rate`.
+    """
+    from channels.layers import get_channel_layer
+    from apps.notifications.utils import channel_event
+
+    layer = get_channel_layer()
+
+    async def task(offset):
+        for seq in range(first + offset * step, events, concurrency * step):
+            if rate:
+                await asyncio.sleep(started + seq / rate - time.time())
+            await layer.group_send(f"user_{seq % users}", channel_event('new_message', {
+                'type': 'new_message', 'message_id': seq, 'content': 'scale test', 'sent_at': time.time(),
+            }))
+
+    await asyncio.sleep(started - time.time())
+    await asyncio.gather(*(task(offset) for offset in range(concurrency)))
+    await layer.close_pools()
+
+
+def publisher(first, step, users, events, concurrency, rate, started, results):
+    django.setup()
+    asyncio.run(publish(first, step, users, events, concurrency, rate, started))
+    results.put(time.time())
+
+
+async def reset(layer):
+    await layer.flush()
+    await layer.close_pools()
+
+
+def run(args, workers, context):
+    from channels.layers import get_channel_layer
+
+    layer = get_channel_layer()
+    asyncio.run(reset(layer))
+
+    users = workers * args.sockets
+    expected = args.events // users
+    events = expected * users
+    ready, results = context.Queue(), context.Queue()
+    processes = [
+        context.Process(target=worker, args=(index * args.sockets, args.sockets, expected, args.timeout, ready, results))
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=120)
+
+    # publishers are started before the clock so their startup is not timed
+    started = time.time() + 2
+    done = context.Queue()
+    publishers = [
+        context.Process(target=publisher, args=(
+            index, args.publishers, users, events, args.concurrency, args.rate, started, done,
+        ))
+        for index in range(args.publishers)
+    ]
+    for process in publishers:
+        process.start()
+    published = max(done.get(timeout=args.timeout * expected + 60) for _ in publishers)
+    reports = [results.get(timeout=args.timeout * expected + 60) for _ in processes]
+    for process in processes + publishers:
+        process.join()
+    asyncio.run(reset(layer))
+
+    latencies = sorted(latency for report, _ in reports for latency in report)
+    elapsed = max(last for _, last in reports) - started
+    shards = [0] * layer.ring_size
+    for user_id in range(users):
+        shards[layer.consistent_hash(f"user_{user_id}")] += 1
+    return {
+        'name': f"scale:workers={workers}",
+        'rounds': len(latencies),
+        'min': latencies[0] if latencies else 0.0,
+        'max': latencies[-1] if latencies else 0.0,
+        'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+        'median': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'ops': len(latencies) / elapsed,
+        'extra': {
+            'workers': workers,
+            'sockets': users,
+            'events': events,
+            'delivered': len(latencies),
+            'missing': events - len(latencies),
+            'publish_ops': events / (published - started),
+            'cpus': os.cpu_count(),
+            'shards': layer.ring_size,
+            'groups_per_shard': shards,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, default=2, help="redis-server processes to start")
+    parser.add_argument('--hosts', help="Comma separated Redis URLs to use instead of starting servers")
+    parser.add_argument('--workers', default='1,2,4', help="Comma separated worker process counts to run")
+    parser.add_argument('--sockets', type=int, default=100, help="Sockets (users) per worker")
+    parser.add_argument('--events', type=int, default=10000, help="Events published per run")
+    parser.add_argument('--publishers', type=int, default=2, help="Publishing processes")
+    parser.add_argument('--concurrency', type=int, default=10, help="Concurrent group_send tasks per publisher")
+    parser.add_argument('--rate', type=float, default=0, help="Events per second to publish (0: as fast as possible)")
+    parser.add_argument('--timeout', type=float, default=10, help="Seconds a socket waits for its next event")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    servers = []
+    if args.hosts:
+        hosts = args.hosts
+    else:
+        servers, urls = start_redis(args.shards)
+        hosts = ','.join(urls)
+    # read by settings in this process and the spawned workers
+    os.environ['CHANNEL_REDIS_HOSTS'] = hosts
+    django.setup()
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    try:
+        for workers in (int(count) for count in args.workers.split(',')):
+            result = run(args, workers, context)
+            results.append(result)
+            extra = result['extra']
+            print(
+                f"workers={workers:<3} delivered {extra['delivered']}/{extra['events']}"
+                f"  {result['ops']:9.0f} events/s  p50 {result['median'] * 1000:7.2f} ms"
+                f"  p95 {result['p95'] * 1000:7.2f} ms  groups/shard {extra['groups_per_shard']}",
+                flush=True,
+            )
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump({'benchmarks': results}, fh, indent=2)
+    if any(result['extra']['missing'] for result in results):
+        sys.exit("Some events were not delivered")
+
+
+if __name__ == '__main__':
+    main()
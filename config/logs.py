@@ -0,0 +1,99 @@
+"""
+Structured logging.
+
+Records are handed to a background thread through a bounded queue, and
+formatted (as one JSON object per line) and written there, so logging never
+does stdout I/O on a request thread. Log with %-style arguments rather than
+f-strings so messages below LOG_LEVEL are never formatted at all, and pass
+context as `extra` fields:
+
+    logger.info("Notification created", extra={'message_id': message.id, 'sample': True})
+
+Records flagged with `sample` are high-volume events: SamplingFilter keeps
+one in every 1 / LOG_SAMPLE_RATE of them per message, warnings and errors
+always pass.
+"""
+import itertools
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone as dt_timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from apps.monitoring.metrics import Counter
+
+LOG_RECORDS_DROPPED = Counter('log_records_dropped_total', "Log records dropped because the log queue was full")
+
+# attributes every LogRecord has; anything else was passed through `extra`
+RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sample'}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, dt_timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRS)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self.counters = {}
+
+    def filter(self, record):
+        if not getattr(record, 'sample', False) or record.levelno >= logging.WARNING:
+            return True
+        if not self.every:
+            return False
+        # counted per message template, so a rare event is not starved by a frequent one
+        counter = self.counters.setdefault(record.msg, itertools.count())
+        if next(counter) % self.every:
+            return False
+        record.sample_rate = 1 / self.every
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue records for a listener thread that writes them to `stream`. A full
+    queue drops the record (counted in log_records_dropped_total) instead of
+    blocking the caller.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        # formatting happens on the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # the listener runs in this process, so the record does not need to
+        # be formatted and made picklable here
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def close(self):
+        # logging.shutdown() closes handlers at exit, flushing what is queued
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
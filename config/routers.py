@@ -0,0 +1,82 @@
+"""
+Read replica routing.
+
+Reads go to a randomly chosen alias from settings.DATABASE_REPLICAS and
+writes to 'default'. Reads inside a transaction stay on 'default'. After a
+client writes, ReplicaPinningMiddleware pins its reads to 'default' for
+REPLICA_PIN_SECONDS (via a cookie) so users always see their own writes
+despite replication lag.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+_pinned = ContextVar('db_pinned_to_primary', default=False)
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+@contextmanager
+def pin_to_primary():
+    """
+    Route every read in the block to the primary database.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        # reads inside a transaction must see that transaction's writes
+        if not replicas or is_pinned() or connections['default'].in_atomic_block:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pin reads to the primary for the rest of a write request, and for
+    REPLICA_PIN_SECONDS afterwards for the same client.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        is_write = request.method not in SAFE_METHODS
+        if not (is_write or PIN_COOKIE in request.COOKIES):
+            return self.get_response(request)
+
+        with pin_to_primary():
+            response = self.get_response(request)
+
+        if is_write and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -1,7 +1,8 @@
 from pathlib import Path
 import os
-from decouple import config
+from decouple import config, Csv
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,11 +35,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework_simplejwt',
     'channels',
     'apps.users.apps.UsersConfig',
     'apps.chat.apps.ChatConfig',
     'apps.notifications.apps.NotificationsConfig',
+    'apps.monitoring.apps.MonitoringConfig',
     'corsheaders',
     # 'debug_toolbar',
 
@@ -46,8 +49,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'apps.monitoring.middleware.TracingMiddleware',
+    'apps.monitoring.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'config.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.monitoring.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -98,6 +105,47 @@ DATABASES = {
     }
 }
 
+# Connection pooling (psycopg 3 pool, one pool per worker process). Size the pool to the
+# number of threads that run sync code in a worker (ASGI_THREADS under daphne).
+# With CONN_HEALTH_CHECKS, connections are checked before reuse (pooled ones on checkout).
+# Without the pool, connections are opened per request unless CONN_MAX_AGE is set.
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+if DB_POOL:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=config('ASGI_THREADS', default=10, cast=int), cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+            'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = config('CONN_MAX_AGE', default=0, cast=int)
+
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica-1,replica-2
+# Safe reads are spread across replicas, see config/routers.py
+DATABASE_REPLICAS = []
+for index, host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv())):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+
+# Seconds a client's reads stay on the primary after it writes
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# Optional monthly range partitioning of chat_message and notifications_notification
+# (PostgreSQL only, applied by migrations). See apps/chat/partitioning.py
+MESSAGE_PARTITIONING = config('MESSAGE_PARTITIONING', default=False, cast=bool)
+PARTITION_PREMAKE_MONTHS = config('PARTITION_PREMAKE_MONTHS', default=3, cast=int)
+PARTITION_RETENTION_MONTHS = config('PARTITION_RETENTION_MONTHS', default=0, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -178,6 +226,114 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+# profile photo variants (square, in pixels), generated by a background thread pool
+AVATAR_VARIANT_SIZES = [48, 96, 256]
+AVATAR_VARIANT_QUALITY = 82
+AVATAR_WORKERS = config('AVATAR_WORKERS', default=2, cast=int)
+
+
+# Token bucket rate limits as "<tokens>/<period>" (see apps/chat/ratelimit.py);
+# buckets are shared through Redis when REDIS_URL is set
+RATE_LIMITS = {
+    'ip': config('RATE_LIMIT_IP', default='300/min'),
+    'message_send': config('RATE_LIMIT_MESSAGE_SEND', default='30/min'),
+    'message_send_conversation': '60/min',
+    'reaction': config('RATE_LIMIT_REACTION', default='60/min'),
+    'reaction_message': '120/min',
+    'ws_action': config('RATE_LIMIT_WS_ACTION', default='30/min'),
+}
+# seconds to use the local buckets after a Redis error before trying Redis again
+RATE_LIMIT_REDIS_RETRY_SECONDS = config('RATE_LIMIT_REDIS_RETRY_SECONDS', default=5, cast=float)
+
+# Reactions on a message are folded into one unseen notification, which comes
+# back to the top when it was last updated more than the window (seconds) ago;
+# pushes for it go out at most once per interval, plus one when the interval ends
+REACTION_NOTIFICATION_WINDOW = config('REACTION_NOTIFICATION_WINDOW', default=300, cast=int)
+REACTION_PUSH_INTERVAL = config('REACTION_PUSH_INTERVAL', default=5, cast=int)
+
+# Events a WebSocket may have waiting to be sent before older ones are
+# coalesced or dropped
+WS_SEND_QUEUE_SIZE = config('WS_SEND_QUEUE_SIZE', default=100, cast=int)
+
+# Sockets using a batching subprotocol get up to WS_BATCH_SIZE events per frame;
+# after the first event the writer waits up to WS_FLUSH_INTERVAL_MS (0 sends
+# right away) for more, so bursts share a frame
+WS_BATCH_SIZE = config('WS_BATCH_SIZE', default=50, cast=int)
+WS_FLUSH_INTERVAL_MS = config('WS_FLUSH_INTERVAL_MS', default=0, cast=int)
+
+# Conversations one WebSocket can subscribe to for live events at a time
+WS_MAX_SUBSCRIPTIONS = config('WS_MAX_SUBSCRIPTIONS', default=20, cast=int)
+
+
+# Logging: JSON lines (or plain text with LOG_FORMAT=text) written from a
+# background thread. High-volume events logged with extra={'sample': True}
+# are kept at LOG_SAMPLE_RATE.
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_FORMAT = config('LOG_FORMAT', default='json')
+LOG_SAMPLE_RATE = config('LOG_SAMPLE_RATE', default=0.01, cast=float)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'config.logs.JSONFormatter'},
+        'text': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'filters': {
+        'sample': {'()': 'config.logs.SamplingFilter', 'rate': LOG_SAMPLE_RATE},
+    },
+    'handlers': {
+        'queue': {
+            '()': 'config.logs.NonBlockingQueueHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': LOG_FORMAT,
+            'filters': ['sample'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': LOG_LEVEL},
+    'loggers': {
+        # let django's records go through the queue handler instead of its own console handler
+        'django': {'handlers': [], 'level': 'INFO', 'propagate': True},
+    },
+}
+
+
+# Bearer token Prometheus scrapes /metrics with (staff users can always read it)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+
+# Tracing: finished spans go to this exporter (NoopExporter, InMemoryExporter
+# or LoggingExporter in apps.monitoring.tracing); new traces are sampled at
+# TRACING_SAMPLE_RATE
+TRACING_EXPORTER = config('TRACING_EXPORTER', default='apps.monitoring.tracing.NoopExporter')
+TRACING_SAMPLE_RATE = config('TRACING_SAMPLE_RATE', default=1.0, cast=float)
+
+
+# Profiling: requests sent with `X-Profile: <PROFILING_TOKEN>` (or ?profile=1
+# by staff) run under cProfile; requests slower than SLOW_REQUEST_THRESHOLD_MS
+# (0 disables) get their stacks sampled. Results are RequestProfile rows.
+PROFILING_TOKEN = config('PROFILING_TOKEN', default='')
+SLOW_REQUEST_THRESHOLD_MS = config('SLOW_REQUEST_THRESHOLD_MS', default=0, cast=int)
+SLOW_REQUEST_SAMPLE_INTERVAL_MS = config('SLOW_REQUEST_SAMPLE_INTERVAL_MS', default=10, cast=int)
+
+
+# Longest message content accepted when sending or editing (characters)
+MESSAGE_MAX_LENGTH = config('MESSAGE_MAX_LENGTH', default=10000, cast=int)
+
+# Deleted messages stay as redacted tombstones for this many days before
+# purge_deleted_messages removes them with their reactions and notifications
+MESSAGE_PURGE_AFTER_DAYS = config('MESSAGE_PURGE_AFTER_DAYS', default=7, cast=int)
+
+
+# message attachments (kept outside MEDIA_ROOT, served by a permission-checked view)
+ATTACHMENT_STORAGE_BACKEND = 'apps.chat.storage.LocalAttachmentStorage'
+ATTACHMENT_ROOT = config('ATTACHMENT_ROOT', default=os.path.join(BASE_DIR, 'attachments'))
+ATTACHMENT_MAX_SIZE = config('ATTACHMENT_MAX_SIZE', default=2 * 1024 ** 3, cast=int)
+ATTACHMENT_MAX_CHUNK_SIZE = 8 * 1024 ** 2
+# attachments one message may carry
+MESSAGE_MAX_ATTACHMENTS = config('MESSAGE_MAX_ATTACHMENTS', default=10, cast=int)
+
+
 SWAGGER_USE_COMPAT_RENDERERS = False
 
 
@@ -186,19 +342,70 @@ GETSTREAM_API_KEY = config('GETSTREAM_API_KEY')
 GETSTREAM_API_SECRET = config('GETSTREAM_API_SECRET')
 
 
+# Cache (Redis when REDIS_URL is set, in-process otherwise). Deployments with
+# more than one worker process need Redis: cached user pages are invalidated
+# through a version kept in the cache (see apps/users/cache.py)
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Seconds a serialized user list page or profile stays cached (entries are
+# also invalidated whenever a user changes)
+USER_CACHE_TIMEOUT = config('USER_CACHE_TIMEOUT', default=300, cast=int)
+
+
 # websockets settings
 
 ASGI_APPLICATION = "config.asgi.application"
 
-# Redis
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {
-            "hosts": [("127.0.0.1", 6379)],
+# "redis", or "memory" for a single-process deployment (the in-process layer
+# cannot reach sockets served by other processes); tests use "memory"
+CHANNEL_LAYER_BACKEND = config('CHANNEL_LAYER_BACKEND', default='redis')
+# messages a channel holds before sends to it are dropped; on Redis the
+# sockets of one worker process share a single channel
+CHANNEL_LAYER_CAPACITY = config('CHANNEL_LAYER_CAPACITY', default=100, cast=int)
+
+# Publishes give up after CHANNEL_PUBLISH_TIMEOUT seconds; after
+# CHANNEL_BREAKER_FAILURES failures in a row they are skipped (clients catch
+# up from stored notifications on reconnect) until a probe publish succeeds,
+# tried every CHANNEL_BREAKER_RESET_SECONDS
+CHANNEL_PUBLISH_TIMEOUT = config('CHANNEL_PUBLISH_TIMEOUT', default=0.5, cast=float)
+CHANNEL_BREAKER_FAILURES = config('CHANNEL_BREAKER_FAILURES', default=5, cast=int)
+CHANNEL_BREAKER_RESET_SECONDS = config('CHANNEL_BREAKER_RESET_SECONDS', default=30, cast=float)
+
+# Redis, e.g. CHANNEL_REDIS_HOSTS=redis://redis-1:6379,redis://redis-2:6379
+# With several hosts, groups and channels are sharded across them by
+# consistent hashing, see apps/notifications/layers.py
+CHANNEL_REDIS_HOSTS = config('CHANNEL_REDIS_HOSTS', default='redis://127.0.0.1:6379', cast=Csv())
+
+if CHANNEL_LAYER_BACKEND == 'memory':
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "apps.notifications.layers.MemoryChannelLayer",
+            "CONFIG": {
+                "capacity": CHANNEL_LAYER_CAPACITY,
+                # at most this many sockets per group, 0 for no limit
+                "group_capacity": config('CHANNEL_LAYER_GROUP_CAPACITY', default=0, cast=int),
+            },
         },
-    },
-}
+    }
+elif CHANNEL_LAYER_BACKEND == 'redis':
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "apps.notifications.layers.ShardedRedisChannelLayer",
+            "CONFIG": {
+                "hosts": CHANNEL_REDIS_HOSTS,
+                "capacity": CHANNEL_LAYER_CAPACITY,
+            },
+        },
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown CHANNEL_LAYER_BACKEND {CHANNEL_LAYER_BACKEND!r}")
 
 
 
@@ -41,6 +41,7 @@ urlpatterns = [
     path('', include('apps.users.urls')),
     path('', include('apps.chat.urls')),
     path('', include('apps.notifications.urls')),
+    path('', include('apps.monitoring.urls')),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),    
 ] # + debug_toolbar_urls()
@@ -0,0 +1,11 @@
+import pytest
+
+MEMORY_LAYERS = {"default": {"BACKEND": "apps.notifications.layers.MemoryChannelLayer"}}
+
+
+@pytest.fixture(autouse=True)
+def memory_channel_layer(settings):
+    """
+    Run tests on the in-process channel layer, so they do not need Redis.
+    """
+    settings.CHANNEL_LAYERS = MEMORY_LAYERS